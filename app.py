@@ -3,100 +3,422 @@ Junay 4K Downloader - Flask Web App
 Beautiful web-based YouTube downloader with real-time progress
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
-import yt_dlp
+from flask import Flask, Response, render_template, request, jsonify, send_file
 import os
+import mimetypes
+import hmac
+import json
 import threading
+import time
 from pathlib import Path
 import uuid
+from scheduler import DownloadScheduler
+from events import ChangeFeed
+from progress import ProgressAggregator, new_bytes_hook
+from info_cache import video_key
+from dedup import CompletedIndex, InFlightJobs, place_file
+from batch import expand_urls, split_urls
+from journal import JobJournal
+from registry import JobRegistry, process_memory
+from ydl_pool import YoutubeDLPool
+from workers import ProcessWorkerPool, WorkerError
+from broker import DEFAULT_LEASE_SECONDS, JobBroker
+from postprocess import PostProcessingPool, deferred_merge, run_deferred
+from bandwidth import BandwidthManager, parse_rate, parse_schedule, throttle_options
+from hosts import limiter as host_limits, parse_ceilings
+from metrics import CONTENT_TYPE, MetricsRegistry
+from profiling import JobProfile, add_phase_hook
+from delivery import attachment_header, follow_file, is_progressive
+from engine import (
+    DATA_DIR, QUALITY_MAP, DownloadJob, downloader_for, final_file_path, format_for, open_info_cache, unwrap_error
+)
+from retry import EXPIRED, classify, retry_delay
 
 app = Flask(__name__)
 
+# Behind Apache/lighttpd (or nginx translating the header), let the web server send
+# finished files itself with sendfile instead of streaming them through Python
+app.config['USE_X_SENDFILE'] = os.environ.get('JUNAY_X_SENDFILE', '') == '1'
+
+# How long finished jobs stay visible before the registry forgets them
+MAX_FINISHED_JOBS = int(os.environ.get('JUNAY_MAX_FINISHED_JOBS', 1000))
+FINISHED_JOB_MAX_AGE = int(os.environ.get('JUNAY_FINISHED_JOB_MAX_AGE', 24 * 3600))
+
 # Store active downloads and their progress
-downloads = {}
+downloads = JobRegistry(max_finished=MAX_FINISHED_JOBS, max_age=FINISHED_JOB_MAX_AGE)
+
+# Batches of downloads (playlists, URL lists) by batch_id
+batches = JobRegistry(max_finished=MAX_FINISHED_JOBS, max_age=FINISHED_JOB_MAX_AGE)
+
+# Worker pool limits (override with environment variables)
+MAX_CONCURRENT_DOWNLOADS = int(os.environ.get('JUNAY_MAX_DOWNLOADS', 3))
+MAX_DOWNLOADS_PER_HOST = int(os.environ.get('JUNAY_MAX_PER_HOST', 2))
+
+# Every download runs through this pool instead of its own thread
+scheduler = DownloadScheduler(
+    max_workers=MAX_CONCURRENT_DOWNLOADS,
+    max_per_host=MAX_DOWNLOADS_PER_HOST
+)
+
+# Merges (ffmpeg) run on their own pool, sized to the CPU rather than the network
+postprocessor = PostProcessingPool(
+    max_workers=int(os.environ.get('JUNAY_MERGE_WORKERS', 0)) or None,
+    max_queued=int(os.environ.get('JUNAY_MERGE_QUEUE', 0)) or None
+)
+
+# Warm YoutubeDL instances shared between jobs with the same options
+ydl_pool = YoutubeDLPool(max_idle=MAX_CONCURRENT_DOWNLOADS)
+
+# Optional process backend: with JUNAY_WORKER_PROCESSES set, yt-dlp runs in that many
+# worker processes (jobs shared between them) instead of on the scheduler's threads
+WORKER_PROCESSES = int(os.environ.get('JUNAY_WORKER_PROCESSES', 0))
+worker_processes = ProcessWorkerPool(WORKER_PROCESSES) if WORKER_PROCESSES > 0 else None
+
+# Download bandwidth: a global limit in bytes/second (0 = unlimited), optionally
+# varied by time of day with a JSON schedule, shared fairly between running jobs
+bandwidth = BandwidthManager(
+    global_limit=int(os.environ.get('JUNAY_BANDWIDTH_LIMIT', 0)) or None,
+    schedule=parse_schedule(json.loads(os.environ.get('JUNAY_BANDWIDTH_SCHEDULE', '[]')))
+)
+
+# Where the server keeps its own state (caches, indexes): engine.DATA_DIR, from JUNAY_DATA_DIR
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+# Extraction results reused across requests for the same video
+info_cache = open_info_cache(DATA_DIR, max_bytes=int(os.environ.get('JUNAY_INFO_CACHE_MB', 64)) * 1024 * 1024)
+
+# Finished files by video + quality, and downloads currently running
+completed_index = CompletedIndex(DATA_DIR / 'completed.db')
+in_flight = InFlightJobs()
+
+# Every job is journaled so a restart can resume it
+journal = JobJournal(DATA_DIR / 'jobs.db')
+
+# Distributed mode: jobs go into a broker for junay_worker.py processes (here or on
+# other machines) to claim over the API, instead of running in this process
+DISTRIBUTED = os.environ.get('JUNAY_DISTRIBUTED', '') == '1'
+WORKER_TOKEN = os.environ.get('JUNAY_WORKER_TOKEN')  # Shared secret workers must send
+if DISTRIBUTED and not WORKER_TOKEN:
+    # Anyone who can reach the worker API could otherwise finish jobs with files of their choosing
+    raise RuntimeError('JUNAY_DISTRIBUTED=1 needs JUNAY_WORKER_TOKEN set to a shared secret for the workers')
+broker = JobBroker(
+    DATA_DIR / 'broker.db',
+    lease_seconds=int(os.environ.get('JUNAY_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+) if DISTRIBUTED else None
+_lease_reaper = None
+_lease_reaper_lock = threading.Lock()
+
+# Bumped whenever any download's progress changes; streaming clients wait on it
+progress_feed = ChangeFeed()
+
+# Streaming (SSE) tuning
+STREAM_COALESCE_SECONDS = 0.25  # Minimum gap between events, bursts collapse into one
+STREAM_KEEPALIVE_SECONDS = 15  # Comment line sent on idle streams to keep proxies happy
+
+# Under waitress every open stream holds one of its threads for as long as the client
+# watches; past this many, streams are refused (503) so the rest of the API keeps
+# threads to answer with, and clients poll instead. The ASGI front end has no such limit
+MAX_STREAMS = int(os.environ.get('JUNAY_MAX_STREAMS', 8))
+stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+# Instrumentation for /metrics (gauges are read from the pools when scraped)
+metrics = MetricsRegistry()
+jobs_finished = metrics.counter('junay_jobs_finished_total', 'Downloads that reached a final status', ['status'])
+download_errors = metrics.counter('junay_download_errors_total', 'Failed downloads by error class', ['error'])
+download_retries = metrics.counter('junay_download_retries_total', 'Failed attempts queued again, by failure class', ['retry_class'])
+downloaded_bytes = metrics.counter('junay_downloaded_bytes_total', 'Bytes received, by quality', ['quality'])
+extraction_seconds = metrics.histogram(
+    'junay_extraction_seconds', 'Time to get video info, by whether it came from the cache', ['cached']
+)
+download_seconds = metrics.histogram(
+    'junay_download_seconds', 'Download stage duration (extraction to last byte), by quality', ['quality']
+)
+merge_seconds = metrics.histogram('junay_merge_seconds', 'ffmpeg merge duration, by audio handling', ['audio'])
+phase_seconds = metrics.histogram('junay_phase_seconds', 'Time jobs spend in each phase, queues included', ['phase'])
+add_phase_hook(lambda download_id, phase, seconds: phase_seconds.observe(seconds, phase=phase))
+
+# Statuses after which a download never changes again
+TERMINAL_STATUSES = ('completed', 'error')
+
+_MISSING = object()
 
 
 class DownloadProgress:
     """Track download progress for real-time updates"""
-    def __init__(self, download_id):
+    # Slots keep each of the (many) retained records small
+    __slots__ = (
+        'download_id', 'status', 'progress', 'speed', 'eta', 'title',
+        'error', 'file_path', 'audio', 'aggregator', 'profile', 'partial', 'finished_at',
+        'retries', 'retry_class', 'retry_at'
+    )
+
+    def __init__(self, download_id, profile=False):
         self.download_id = download_id
-        self.status = "starting"
+        self.status = "queued"  # Waiting for a free worker
         self.progress = 0
         self.speed = 0
         self.eta = 0
         self.title = ""
         self.error = None
         self.file_path = None
+        self.audio = None  # How the merge handled audio: 'copy' or 'transcode'
+        self.aggregator = ProgressAggregator()
+        self.profile = JobProfile(download_id, capture=profile)  # Phase timings (+ cProfile if asked for)
+        self.partial = None  # (part file, final file, exact size or None) of a progressive download in progress
+        self.finished_at = None  # Set once the job can't change any more
+        self.retries = 0  # Failed attempts queued again so far
+        self.retry_class = None  # How the last attempt failed (see retry.py)
+        self.retry_at = None  # When the next attempt is due while backing off
+
+    def __setattr__(self, name, value):
+        # Wake up streaming clients whenever a field actually changes
+        changed = getattr(self, name, _MISSING) != value
+        object.__setattr__(self, name, value)
+
+        if name == 'status' and value in TERMINAL_STATUSES and self.finished_at is None:
+            # Finished: start the retention clock and drop per-download bookkeeping
+            object.__setattr__(self, 'finished_at', time.time())
+            object.__setattr__(self, 'aggregator', None)
+
+        if changed:
+            progress_feed.publish()
 
     def update(self, d):
-        """Progress hook callback from yt-dlp"""
-        if d['status'] == 'downloading':
-            # Calculate progress percentage
-            # Handle cases where total_bytes might be None (livestreams, some videos)
-            total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
-            downloaded_bytes = d.get('downloaded_bytes', 0)
-
-            if total_bytes and total_bytes > 0:
-                self.progress = (downloaded_bytes / total_bytes) * 100
+        """Progress hook callback from yt-dlp (throttled and smoothed by the aggregator)"""
+        if self.aggregator is None:
+            return  # Already finished
+
+        if self.partial is None and d.get('status') == 'downloading' and is_progressive(d):
+            # Written front to back: /api/files can serve it before it's done
+            self.partial = (d['tmpfilename'], d['filename'], d.get('total_bytes'))
+
+        snapshot = self.aggregator.feed(d)
+        if snapshot is None:
+            return
+
+        if snapshot['status'] == 'downloading':
+            if snapshot['percent'] is not None:
+                self.progress = snapshot['percent']
             else:
                 # If no total size, just show that we're downloading
                 self.progress = 50  # Indeterminate progress
 
-            self.speed = d.get('speed', 0) / 1_000_000 if d.get('speed') else 0  # Convert to MB/s
-            self.eta = d.get('eta', 0)
+            self.speed = round(snapshot['speed'] / 1_000_000, 2)  # Convert to MB/s
+            self.eta = snapshot['eta'] or 0
             self.status = "downloading"
 
-        elif d['status'] == 'finished':
+        elif snapshot['status'] == 'finished':
             self.progress = 100
             self.status = "processing"
-            self.file_path = d['filename']
+            self.file_path = snapshot['filename']
 
 
-def download_video(download_id, url, quality, save_path):
+class BatchProgress:
+    """Track a batch of downloads while its playlists are expanded"""
+    __slots__ = ('batch_id', 'expanding', 'download_ids', 'error', 'finished_at')
+
+    def __init__(self, batch_id):
+        self.batch_id = batch_id
+        self.expanding = True
+        self.download_ids = []
+        self.error = None
+        self.finished_at = None  # Set when expansion ends; retention counts from here
+
+
+def download_video(download_id, url, quality, save_path, turbo=False, priority=0):
     """
     Download video in background thread
     Updates progress object in real-time
+    Turbo mode fetches fragments and the video/audio streams over parallel connections
+    Separate video/audio streams are handed to the post-processing pool to be merged
+    Failures worth another try go back in the queue after a backoff (see retry.py)
     """
     progress = downloads[download_id]
+    progress.status = "starting"
+    progress.retry_at = None
+    progress.profile.end('queued')
+    journal.set_status(download_id, "starting")
+
+    format_selector = format_for(quality)
+    content_key, flight_key = dedup_keys(url, format_selector, save_path)
+    merge_queued = False
+    requeued = False
 
     try:
-        # Map quality to yt-dlp format
-        quality_map = {
-            "2160p (4K)": "bestvideo[height<=2160]+bestaudio/best[height<=2160]",
-            "1440p (2K)": "bestvideo[height<=1440]+bestaudio/best[height<=1440]",
-            "1080p (Full HD)": "bestvideo[height<=1080]+bestaudio/best[height<=1080]",
-            "720p (HD)": "bestvideo[height<=720]+bestaudio/best[height<=720]",
-            "Best Available": "bestvideo+bestaudio/best"
-        }
-
-        format_selector = quality_map.get(quality, "bestvideo+bestaudio/best")
-
-        # Configure yt-dlp options
-        ydl_opts = {
-            'format': format_selector,
-            'outtmpl': os.path.join(save_path, '%(title)s.%(ext)s'),
-            'progress_hooks': [progress.update],
-            'merge_output_format': 'mp4',
-            'postprocessor_args': ['-c:v', 'copy', '-c:a', 'aac'],
-            'quiet': False,  # Show errors
-            'no_warnings': False,  # Show warnings
-            'socket_timeout': 30,  # Timeout for network operations
-            'retries': 3,  # Retry failed downloads
-            'fragment_retries': 3,  # Retry failed fragments
-            'http_chunk_size': 10485760,  # 10MB chunks (helps with broken pipe)
-        }
-
-        # Download the video
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
+        job = DownloadJob(
+            url, save_path, format_selector=format_selector, turbo=turbo, profile=progress.profile,
+            sinks=[progress.update, journal.part_file_hook(download_id), bandwidth.hook(download_id), bytes_hook(quality)],
+            options=throttle_options()  # Even reads, so bandwidth limits don't come in bursts
+        )
+
+        # Download the video (on a pooled YoutubeDL - no per-job setup)
+        started = time.perf_counter()
+        with progress.profile.capturing():
+            if worker_processes is not None:
+                # yt-dlp runs in a worker process; this thread runs the sinks as reports arrive
+                info = worker_processes.download(
+                    download_id, url, job.ydl_options(), turbo, job.sinks,
+                    progress.profile, info_cache, on_extracted=record_extraction
+                )
+            else:
+                info = job.download(ydl_pool, info_cache, on_extracted=record_extraction)
             progress.title = info.get('title', 'video')
-            progress.status = "completed"
-            progress.progress = 100
+        download_seconds.observe(time.perf_counter() - started, quality=quality_label(quality))
 
+        merge_info = deferred_merge(info)
+        if merge_info is not None:
+            # Free this network slot; blocks only while the merge queue is full
+            progress.profile.start('merge_queued')
+            postprocessor.submit(merge_download, args=(download_id, info, merge_info, content_key, flight_key))
+            merge_queued = True
+            return
+
+        complete_download(progress, final_file_path(info), content_key)
+
+    except Exception as e:
+        # Throttled, network trouble, expired URLs: back in the queue, without holding this worker
+        delay = retry_later(progress, e, url)
+        if delay is None:
+            fail_download(progress, e)
+        else:
+            scheduler.submit(
+                download_id,
+                download_video,
+                args=(download_id, url, quality, save_path, turbo, priority),
+                url=url,
+                priority=priority,
+                delay=delay
+            )
+            requeued = True
+
+    finally:
+        # Done with the network either way; its bandwidth share goes to the other jobs
+        # (a requeued job keeps its own limit for the next attempt)
+        bandwidth.release(download_id, keep_limit=requeued)
+        if not merge_queued and not requeued:
+            in_flight.release(flight_key, download_id)
+
+
+def merge_download(download_id, info, merge_info, content_key, flight_key):
+    """
+    Post-processing stage: merge a downloaded job's video and audio with ffmpeg
+    Runs on the post-processing pool; progress comes from ffmpeg's own reports
+    """
+    progress = downloads[download_id]
+    progress.profile.end('merge_queued')
+    progress.status = "merging"
+    progress.progress = 0
+    progress.speed = 0
+    progress.eta = 0
+    journal.set_status(download_id, "merging")
+
+    def on_progress(percent):
+        progress.progress = round(percent, 1)
+
+    try:
+        started = time.time()
+        with progress.profile.capturing(), progress.profile.phase('merge'):
+            progress.audio = run_deferred(merge_info, on_progress)
+        elapsed = time.time() - started
+        postprocessor.record_merge(progress.audio, elapsed)
+        merge_seconds.observe(elapsed, audio=progress.audio)
+        complete_download(progress, final_file_path(info), content_key)
     except Exception as e:
-        # Handle any errors
-        progress.status = "error"
-        progress.error = str(e)
+        fail_download(progress, e)
+    finally:
+        in_flight.release(flight_key, download_id)
+
+
+def complete_download(progress, final_path, content_key):
+    """Mark a job completed and remember its final (merged) file so repeat requests skip the download"""
+    if final_path and os.path.isfile(final_path):
+        progress.file_path = final_path
+        completed_index.record(content_key, final_path, progress.title)
+
+    # Status last: streams close on a final status, so everything it sends must be in place
+    progress.progress = 100
+    progress.error = None  # From an attempt that was retried
+    progress.status = "completed"
+    journal.set_status(progress.download_id, "completed", title=progress.title, file_path=progress.file_path)
+    jobs_finished.inc(status="completed")
+
+
+def fail_download(progress, error):
+    """Mark a job failed"""
+    progress.error = str(error)
+    progress.retry_class = classify(error)
+    progress.status = "error"  # Last, as in complete_download
+    journal.set_status(progress.download_id, "error", error=progress.error)
+    jobs_finished.inc(status="error")
+    download_errors.inc(error=error_class(error))
+
+
+def retry_later(progress, error, url):
+    """
+    Get a failed job ready for another attempt if its failure is worth one (see retry.py)
+    Returns the seconds to back off before queueing it again, None if it should fail instead
+    """
+    retry_class = classify(error)
+    delay = retry_delay(retry_class, progress.retries + 1)
+    if delay is None:
+        return None
+
+    if retry_class == EXPIRED:
+        info_cache.invalidate(video_key(url))  # Its format URLs are dead; extract afresh
+    progress.retries += 1
+    progress.retry_class = retry_class
+    progress.retry_at = time.time() + delay
+    progress.error = str(error)  # Why it is retrying
+    progress.status = "queued"
+    progress.speed = 0
+    progress.eta = 0
+    progress.aggregator = ProgressAggregator()  # The next attempt reports from scratch
+    progress.partial = None
+    progress.profile.start('queued')
+    journal.set_status(progress.download_id, "queued")
+    download_retries.inc(retry_class=retry_class)
+    return delay
+
+
+def error_class(error):
+    """Name of what actually went wrong (yt-dlp wraps the original exception in DownloadError)"""
+    if isinstance(error, WorkerError):
+        return error.error_class  # Already unwrapped in the worker process
+    return type(unwrap_error(error)).__name__
+
+
+def quality_label(quality):
+    """Metrics label for a quality: a known quality name, else 'other' (labels must stay a short list)"""
+    return quality if isinstance(quality, str) and quality in QUALITY_MAP else 'other'
+
+
+def bytes_hook(quality):
+    """Progress hook adding a job's newly received bytes to the downloaded bytes counter"""
+    label = quality_label(quality)
+    return new_bytes_hook(lambda amount: downloaded_bytes.inc(amount, quality=label))
+
+
+def dedup_keys(url, format_selector, save_path):
+    """
+    Keys identifying the same content: video + format for finished files,
+    plus the target folder for running downloads (which write to the same path)
+    """
+    content_key = f"{video_key(url)}|{format_selector}"
+    flight_key = f"{content_key}|{os.path.abspath(save_path)}"
+    return content_key, flight_key
+
+
+def record_extraction(seconds, cached):
+    extraction_seconds.observe(seconds, cached=str(cached).lower())
+
+
+def timed_extract(ydl, url):
+    """info_cache.extract, recording how long it took"""
+    started = time.perf_counter()
+    info, cached = info_cache.extract(ydl, url)
+    record_extraction(time.perf_counter() - started, cached)
+    return info, cached
+
 
 
 @app.route('/')
@@ -115,27 +437,599 @@ def start_download():
     url = data.get('url')
     quality = data.get('quality', '2160p (4K)')
     save_path = data.get('save_path', str(Path.home() / "Downloads"))
+    priority = data.get('priority', 0)  # Higher runs sooner
+    turbo = data.get('turbo', False)  # Parallel connections per download
+    rate_limit = data.get('rate_limit')  # Bytes/second cap for this download
+    profile = data.get('profile', False)  # cProfile + tracemalloc capture, see /api/jobs/<id>/profile
 
     # Validate URL
     if not url:
         return jsonify({'error': 'URL is required'}), 400
+    if not isinstance(quality, str) or quality not in QUALITY_MAP:
+        return jsonify({'error': f"quality must be one of: {', '.join(QUALITY_MAP)}"}), 400
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        return jsonify({'error': 'priority must be an integer'}), 400
+    if not isinstance(turbo, bool):
+        return jsonify({'error': 'turbo must be true or false'}), 400
+    if not isinstance(profile, bool):
+        return jsonify({'error': 'profile must be true or false'}), 400
+    try:
+        rate_limit = parse_rate(rate_limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    download_id, deduplicated = enqueue_download(url, quality, save_path, priority, turbo=turbo, profile=profile)
+    if rate_limit is not None and deduplicated is None:
+        bandwidth.set_job_limit(download_id, rate_limit)
+
+    result = {'download_id': download_id}
+    if deduplicated:
+        result['deduplicated'] = deduplicated
+    return jsonify(result)
+
 
+def enqueue_download(url, quality, save_path, priority=0, download_id=None, turbo=False, profile=False):
+    """
+    Create (or reuse) a download job and queue it on the worker pool
+    Returns (download_id, deduplicated) where deduplicated is None, 'completed' or 'in_flight'
+    Pass download_id to resume a journaled job under its old ID, profile to capture cProfile/tracemalloc data
+    """
     # Create unique download ID
-    download_id = str(uuid.uuid4())
+    download_id = download_id or str(uuid.uuid4())
+    format_selector = format_for(quality)
+    content_key, flight_key = dedup_keys(url, format_selector, save_path)
+
+    # Already downloaded this video at this quality? Hand back the file
+    existing = completed_index.lookup(content_key)
+    if existing:
+        file_path = place_file(existing['path'], save_path)
+        if file_path:
+            progress = DownloadProgress(download_id)
+            progress.title = existing['title']
+            progress.file_path = file_path
+            progress.progress = 100
+            progress.status = "completed"
+            downloads[download_id] = progress
+            return download_id, 'completed'
+
+    # Same download already running? Share its progress instead of fetching twice
+    running_id = in_flight.claim(flight_key, download_id)
+    if running_id in downloads:
+        return running_id, 'in_flight'
 
     # Create progress tracker
-    progress = DownloadProgress(download_id)
+    progress = DownloadProgress(download_id, profile=profile)
+    progress.profile.start('queued')
     downloads[download_id] = progress
+    journal.add(download_id, url, quality, save_path, priority, turbo)
+
+    if broker is not None:
+        # Distributed mode: a junay_worker.py process claims it
+        job = {'url': url, 'quality': quality, 'format': format_selector, 'save_path': save_path, 'turbo': turbo}
+        broker.enqueue(download_id, job, priority)
+        start_lease_reaper()
+        return download_id, None
+
+    # Queue the download on the worker pool
+    scheduler.submit(
+        download_id,
+        download_video,
+        args=(download_id, url, quality, save_path, turbo, priority),
+        url=url,
+        priority=priority
+    )
+
+    return download_id, None
+
+
+def resume_interrupted_jobs():
+    """
+    Re-queue every job the journal says was still queued or running
+    yt-dlp continues each one from its .part files
+    Returns the number of jobs resumed
+    """
+    jobs = journal.interrupted()
+
+    for job in jobs:
+        download_id, deduplicated = enqueue_download(
+            job['url'], job['quality'], job['save_path'], job['priority'],
+            download_id=job['download_id'], turbo=job['turbo']
+        )
+
+        # Finished (or being fetched) elsewhere in the meantime - nothing left to resume
+        if deduplicated == 'completed':
+            journal.set_status(job['download_id'], 'completed')
+        elif deduplicated == 'in_flight':
+            journal.set_status(job['download_id'], 'error', error=f'Merged into download {download_id}')
+
+    return len(jobs)
+
+
+@app.route('/api/batch', methods=['POST'])
+def start_batch():
+    """
+    API endpoint to download many videos/playlists at once
+    Playlists are expanded in the background and their videos queued as they are found
+    """
+    data = request.json
+    urls = data.get('urls')
+    quality = data.get('quality', '2160p (4K)')
+    save_path = data.get('save_path', str(Path.home() / "Downloads"))
+    priority = data.get('priority', 0)
+    turbo = data.get('turbo', False)
+
+    # Accept a list of URLs or pasted text with one URL per line
+    if isinstance(urls, str):
+        urls = split_urls(urls)
+    if not urls or not all(isinstance(url, str) for url in urls):
+        return jsonify({'error': 'urls must be a non-empty list of URLs'}), 400
+    if not isinstance(quality, str) or quality not in QUALITY_MAP:
+        return jsonify({'error': f"quality must be one of: {', '.join(QUALITY_MAP)}"}), 400
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        return jsonify({'error': 'priority must be an integer'}), 400
+    if not isinstance(turbo, bool):
+        return jsonify({'error': 'turbo must be true or false'}), 400
+
+    batch_id = str(uuid.uuid4())
+    batch = BatchProgress(batch_id)
+    batches[batch_id] = batch
+
+    # Expansion uses a worker slot too, ahead of the videos it will queue
+    scheduler.submit(
+        batch_id,
+        expand_batch,
+        args=(batch, urls, quality, save_path, priority, turbo),
+        url=urls[0],
+        priority=priority + 1
+    )
+
+    return jsonify({'batch_id': batch_id})
+
+
+def expand_batch(batch, urls, quality, save_path, priority, turbo=False):
+    """Walk the batch's URLs lazily, queueing each video as soon as it is discovered"""
+    try:
+        for video_url in expand_urls(urls):
+            download_id, _ = enqueue_download(video_url, quality, save_path, priority, turbo=turbo)
+            batch.download_ids.append(download_id)
+    except Exception as e:
+        batch.error = str(e)
+    finally:
+        batch.expanding = False
+        batch.finished_at = time.time()
+
+
+@app.route('/api/batch/<batch_id>')
+def get_batch(batch_id):
+    """
+    API endpoint with aggregate progress for a batch
+    Returns counts per status and overall percentage across its videos
+    """
+    batch = batches.get(batch_id)
+
+    if not batch:
+        return jsonify({'error': 'Batch not found'}), 404
+
+    download_ids = list(batch.download_ids)
+    counts = {}
+    total_progress = 0
+    for download_id in download_ids:
+        progress = downloads.get(download_id)
+        # Only finished jobs get reaped, so a missing one is long done
+        status = progress.status if progress else 'expired'
+        counts[status] = counts.get(status, 0) + 1
+        if progress is None or status in TERMINAL_STATUSES:
+            total_progress += 100
+        else:
+            total_progress += progress.progress
+
+    finished = sum(counts.get(status, 0) for status in TERMINAL_STATUSES + ('expired',))
+
+    return jsonify({
+        'expanding': batch.expanding,  # Still discovering videos
+        'total': len(download_ids),
+        'finished': finished,
+        'counts': counts,
+        'progress': total_progress / len(download_ids) if download_ids else 0,
+        'done': not batch.expanding and finished == len(download_ids),
+        'error': batch.error,
+        'download_ids': download_ids
+    })
+
+
+@app.route('/api/info')
+def get_info():
+    """
+    API endpoint to look up video metadata without downloading
+    Served straight from the extraction cache when possible
+    """
+    url = request.args.get('url')
+
+    if not url:
+        return jsonify({'error': 'URL is required'}), 400
+
+    try:
+        # Through the per-host limits like downloads: repeated lookups are what gets a host to throttle
+        with ydl_pool.borrow({'quiet': True, 'no_warnings': True}, downloader_for()) as ydl:
+            info, cached = timed_extract(ydl, url)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+    heights = sorted({f['height'] for f in info.get('formats') or [] if f.get('height')}, reverse=True)
+
+    return jsonify({
+        'id': info.get('id'),
+        'title': info.get('title'),
+        'uploader': info.get('uploader'),
+        'duration': info.get('duration'),
+        'thumbnail': info.get('thumbnail'),
+        'heights': heights,  # Available video resolutions, best first
+        'cached': cached
+    })
+
+
+@app.route('/api/cache')
+def get_cache_stats():
+    """API endpoint with extraction cache hit/miss counters"""
+    return jsonify(info_cache.stats())
+
+
+@app.route('/api/status')
+def get_status():
+    """API endpoint with server health: job counts, memory use and the worker pool"""
+    return jsonify({
+        'downloads': downloads.stats(),
+        'batches': batches.stats(),
+        'scheduler': scheduler.stats(),
+        'bandwidth': bandwidth.stats(),  # Limits in force and actual throughput per job
+        'hosts': host_limits.stats(),  # Adaptive connection and request rate limits per host
+        'ydl_pool': ydl_pool.stats(),  # YoutubeDL reuse and per-job setup time
+        'worker_processes': worker_processes.stats() if worker_processes else None,  # Process backend, if on
+        'broker': broker.stats() if broker else None,  # Distributed mode: queue, leases and workers
+        'postprocessing': postprocessor.stats(),  # Merge stage, including backpressure
+        'process_memory': process_memory()  # Resident bytes (None where unavailable)
+    })
+
+
+@app.route('/api/bandwidth', methods=['GET', 'POST'])
+def bandwidth_settings():
+    """
+    API endpoint for the global bandwidth limit and its schedule
+    POST {"global_limit": bytes/s or null, "schedule": [...]} changes them for running jobs too
+    """
+    if request.method == 'POST':
+        data = request.json or {}
+        try:
+            limit = parse_rate(data.get('global_limit', bandwidth.global_limit))
+            schedule = parse_schedule(data['schedule']) if 'schedule' in data else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        bandwidth.set_global_limit(limit, schedule)
 
-    # Start download in background thread
-    thread = threading.Thread(
-        target=download_video,
-        args=(download_id, url, quality, save_path),
-        daemon=True
+    return jsonify(bandwidth.stats())
+
+
+@app.route('/api/bandwidth/<download_id>', methods=['POST'])
+def set_download_bandwidth(download_id):
+    """API endpoint to cap (or with null, uncap) one download: {"limit": bytes/s or null}"""
+    progress = downloads.get(download_id)
+    if not progress:
+        return jsonify({'error': 'Download not found'}), 404
+    if progress.status in TERMINAL_STATUSES:
+        return jsonify({'error': 'Download already finished'}), 400
+
+    try:
+        limit = parse_rate((request.json or {}).get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    bandwidth.set_job_limit(download_id, limit)
+    return jsonify({'download_id': download_id, 'limit': limit})
+
+
+@app.route('/api/hosts', methods=['GET', 'POST'])
+def host_limit_settings():
+    """
+    API endpoint with each host's adaptive connection and request rate limits
+    POST {"max_connections": n, "max_rate": requests/s} changes the ceilings for every host
+    """
+    if request.method == 'POST':
+        try:
+            max_connections, max_rate = parse_ceilings(request.json or {})
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        host_limits.set_ceilings(max_connections=max_connections, max_rate=max_rate)
+        if worker_processes is not None:
+            worker_processes.share_host_ceilings()  # Downloads run there
+
+    return jsonify(host_limits.stats())
+
+
+@app.route('/api/hosts/<host>', methods=['POST'])
+def set_host_limits(host):
+    """API endpoint with ceilings for one host: {"max_connections": n, "max_rate": requests/s}"""
+    try:
+        max_connections, max_rate = parse_ceilings(request.json or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    max_connections, max_rate = host_limits.set_ceilings(host, max_connections, max_rate)
+    if worker_processes is not None:
+        worker_processes.share_host_ceilings()
+    return jsonify({'host': host, 'max_connections': max_connections, 'max_rate': max_rate})
+
+
+@app.route('/api/files/<download_id>')
+def get_file(download_id):
+    """
+    API endpoint serving a download's file
+    Finished files support Range and conditional requests (resumable downloads, caching);
+    a progressive download can be fetched while it's still arriving
+    """
+    progress = downloads.get(download_id)
+
+    if not progress:
+        return jsonify({'error': 'Download not found'}), 404
+
+    if progress.status == 'completed':
+        if not progress.file_path or not os.path.isfile(progress.file_path):
+            return jsonify({'error': 'File no longer exists'}), 410
+        # Streamed from disk through the server's file wrapper, never read into memory whole
+        return send_file(progress.file_path, as_attachment=True, conditional=True)
+
+    if progress.status == 'downloading' and progress.partial:
+        return growing_file_response(progress)
+
+    return jsonify({'error': 'File not ready', 'status': progress.status}), 409
+
+
+def growing_file_response(progress):
+    """Response following a progressive download as yt-dlp writes it"""
+    part_path, final_path, size = progress.partial
+    headers = {
+        'Content-Disposition': attachment_header(os.path.basename(final_path)),
+        'Cache-Control': 'no-store',  # Not the finished file yet - nothing to revalidate against
+    }
+    mimetype = mimetypes.guess_type(final_path)[0] or 'application/octet-stream'
+
+    def still_writing():
+        return progress.status == 'downloading'
+
+    if size is None:
+        # Unknown length: stream to the end, no ranges
+        return Response(follow_file((part_path, final_path), 0, None, still_writing), mimetype=mimetype, headers=headers)
+
+    headers['Accept-Ranges'] = 'bytes'
+    byte_range = request.range.range_for_length(size) if request.range else None
+    if request.range and byte_range is None:
+        return Response(status=416, headers={'Content-Range': f'bytes */{size}'})
+
+    start, stop = byte_range or (0, size)
+    if byte_range:
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+    response = Response(
+        follow_file((part_path, final_path), start, stop - start, still_writing),
+        status=206 if byte_range else 200, mimetype=mimetype, headers=headers
     )
-    thread.start()
+    response.content_length = stop - start
+    return response
+
+
+def worker_request():
+    """
+    JSON body of a call from a distributed worker, or an error response
+    (distributed mode off, wrong token, no worker name)
+    """
+    if broker is None:
+        return None, (jsonify({'error': 'Distributed mode is off (set JUNAY_DISTRIBUTED=1)'}), 404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {WORKER_TOKEN}'):
+        return None, (jsonify({'error': 'Invalid worker token'}), 401)
+    data = request.json or {}
+    if not data.get('worker'):
+        return None, (jsonify({'error': 'worker is required'}), 400)
+    return data, None
+
+
+@app.route('/api/worker/claim', methods=['POST'])
+def worker_claim():
+    """
+    Distributed mode: lease the next queued download to {"worker": name}
+    Returns the job and its lease length, or 204 when the queue is empty
+    """
+    data, error = worker_request()
+    if error:
+        return error
+
+    start_lease_reaper()
+    expire_worker_leases()
+    claimed = broker.claim(data['worker'])
+    if claimed is None:
+        return '', 204
+
+    download_id, job, attempt = claimed
+    progress = downloads.get(download_id)
+    if progress is not None:
+        progress.status = "starting"
+        progress.retry_at = None
+        progress.profile.end('queued')
+    journal.set_status(download_id, "starting")
+
+    return jsonify({
+        'download_id': download_id,
+        'job': job,
+        'attempt': attempt,
+        'lease_seconds': broker.lease_seconds,
+    })
+
+
+@app.route('/api/worker/jobs/<download_id>/heartbeat', methods=['POST'])
+def worker_heartbeat(download_id):
+    """
+    Distributed mode: renew a worker's lease and take its progress
+    {"worker", "progress": {...}, "new_bytes"}; 409 tells the worker to stop, the job went to another
+    """
+    data, error = worker_request()
+    if error:
+        return error
+
+    if not broker.heartbeat(download_id, data['worker']):
+        return jsonify({'error': 'Lease lost'}), 409
+
+    progress = downloads.get(download_id)
+    if progress is not None:
+        apply_worker_progress(progress, data.get('progress') or {})
+    if data.get('new_bytes'):
+        downloaded_bytes.inc(data['new_bytes'], quality=quality_label(data.get('quality')))
+    return jsonify({'ok': True})
+
+
+@app.route('/api/worker/jobs/<download_id>/finish', methods=['POST'])
+def worker_finish(download_id):
+    """
+    Distributed mode: a worker is done with its job
+    {"worker", "file_path"} on success, {"worker", "error", "error_class", "retry_class"} on failure;
+    plus "phases" it timed. Failures worth another try are queued again after a backoff
+    """
+    data, error = worker_request()
+    if error:
+        return error
+
+    job = broker.finish(download_id, data['worker'], failed=bool(data.get('error')))
+    if job is None:
+        return jsonify({'error': 'Lease lost'}), 409
+
+    content_key, flight_key = dedup_keys(job['url'], job['format'], job['save_path'])
+    progress = downloads.get(download_id)
+    if progress is not None:
+        apply_worker_progress(progress, data.get('progress') or {})
+        for phase, started, ended in data.get('phases') or []:
+            progress.profile.record(phase, started, ended)
+        if data.get('error'):
+            error = WorkerError(data['error'], data.get('error_class') or 'WorkerError', data.get('retry_class'))
+            delay = retry_later(progress, error, job['url'])
+            if delay is not None:
+                broker.enqueue(download_id, job, delay=delay)  # The same or another worker picks it up then
+                return jsonify({'ok': True, 'retry_in': round(delay, 1)})
+            fail_download(progress, error)
+        else:
+            # Where the worker put it; indexed for dedup only if this machine can see it (shared storage).
+            # /api/files serves it, so only a path inside the job's folder is taken
+            file_path = data.get('file_path')
+            if not isinstance(file_path, str) or not path_inside(file_path, job['save_path']):
+                file_path = None
+            progress.file_path = file_path
+            complete_download(progress, file_path, content_key)
+    bandwidth.release(download_id)  # Finished either way: drop its limit, as download_video does
+    in_flight.release(flight_key, download_id)
+    return jsonify({'ok': True})
+
+
+def path_inside(path, folder):
+    """True if path (links resolved) is within folder"""
+    path, folder = os.path.realpath(path), os.path.realpath(folder)
+    try:
+        return os.path.commonpath([path, folder]) == folder
+    except ValueError:
+        return False  # Different drives (Windows)
+
+
+def apply_worker_progress(progress, report):
+    """Copy a worker's progress report onto the job's DownloadProgress"""
+    if progress.status in TERMINAL_STATUSES:
+        return
+    if report.get('status') in ('starting', 'downloading', 'processing', 'merging'):
+        progress.status = report['status']
+    for field in ('progress', 'speed', 'eta', 'title', 'audio'):
+        if field in report:
+            setattr(progress, field, report[field])
+
+
+def expire_worker_leases():
+    """Requeue jobs whose worker went quiet; fail the ones that have lost too many workers"""
+    requeued, failed = broker.expire_leases()
+
+    for download_id, job in requeued:
+        progress = downloads.get(download_id)
+        if progress is not None and progress.status not in TERMINAL_STATUSES:
+            progress.status = "queued"
+            progress.speed = 0
+            progress.eta = 0
+            progress.profile.start('queued')
+        journal.set_status(download_id, "queued")
+
+    for download_id, job in failed:
+        progress = downloads.get(download_id)
+        if progress is not None and progress.status not in TERMINAL_STATUSES:
+            fail_download(progress, WorkerError(
+                f'Lost its worker {broker.max_attempts} times, giving up', 'WorkerLost'
+            ))
+        bandwidth.release(download_id)
+        in_flight.release(dedup_keys(job['url'], job['format'], job['save_path'])[1], download_id)
+
+
+def start_lease_reaper():
+    """Expire leases in the background too, so jobs come back even when no worker is asking"""
+    global _lease_reaper
+    with _lease_reaper_lock:
+        if _lease_reaper is not None:
+            return
 
-    return jsonify({'download_id': download_id})
+        def reap():
+            while True:
+                time.sleep(broker.lease_seconds / 2)
+                expire_worker_leases()
+
+        _lease_reaper = threading.Thread(target=reap, name='junay-lease-reaper', daemon=True)
+        _lease_reaper.start()
+
+
+@app.route('/api/jobs/<download_id>/profile')
+def get_job_profile(download_id):
+    """
+    API endpoint with a job's phase timeline (queued, extract, download, merge...)
+    Jobs started with "profile": true also get their hottest functions and allocations
+    """
+    progress = downloads.get(download_id)
+
+    if not progress:
+        return jsonify({'error': 'Download not found'}), 404
+
+    return jsonify(progress.profile.report())
+
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus scrape endpoint: job counts, throughput and where the time goes"""
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+
+def jobs_by_status():
+    counts = {}
+    for download_id in downloads:
+        progress = downloads.get(download_id)
+        if progress is not None:
+            counts[(progress.status,)] = counts.get((progress.status,), 0) + 1
+    return counts
+
+
+def pipeline_gauge(key):
+    """Gauge reading key ('queued' or 'running') from both stages of the pipeline"""
+    return lambda: {('download',): scheduler.stats()[key], ('merge',): postprocessor.stats()[key]}
+
+
+def host_gauge(key):
+    """Gauge reading key from every host's limits"""
+    return lambda: {(host,): limits[key] for host, limits in host_limits.stats()['hosts'].items()}
+
+
+metrics.gauge('junay_jobs', 'Downloads the server currently knows about, by status', ['status'], jobs_by_status)
+metrics.gauge('junay_queue_depth', 'Jobs waiting for a worker, by stage', ['stage'], pipeline_gauge('queued'))
+metrics.gauge('junay_jobs_running', 'Jobs holding a worker, by stage', ['stage'], pipeline_gauge('running'))
+metrics.gauge('junay_host_connection_limit', 'Adaptive cap on open connections, by host', ['host'], host_gauge('connections'))
+metrics.gauge('junay_host_request_rate', 'Adaptive cap on new requests per second, by host', ['host'], host_gauge('rate'))
+metrics.gauge('junay_host_connections', 'Connections open right now, by host', ['host'], host_gauge('open'))
+metrics.gauge('junay_threads', 'Live threads in the server process', collect=threading.active_count)
+metrics.gauge('junay_process_memory_bytes', 'Resident memory of the server process', collect=process_memory)
 
 
 @app.route('/api/progress/<download_id>')
@@ -149,17 +1043,189 @@ def get_progress(download_id):
     if not progress:
         return jsonify({'error': 'Download not found'}), 404
 
-    return jsonify({
+    return jsonify(progress_snapshot(download_id, progress))
+
+
+@app.route('/api/jobs')
+def list_jobs():
+    """
+    API endpoint listing every download the server knows about (download_id -> progress)
+    ?status=downloading (or any other status) narrows it down
+    """
+    return jsonify(jobs_snapshot(request.args.get('status')))
+
+
+def jobs_snapshot(status=None):
+    """Progress snapshot of every download, optionally only those with the given status"""
+    result = {}
+    positions = scheduler.queue_positions()  # Once for all of them, not per queued job
+    for download_id in downloads:
+        progress = downloads.get(download_id)
+        if progress is not None and status in (None, progress.status):
+            result[download_id] = progress_snapshot(download_id, progress, positions)
+    return result
+
+
+@app.route('/api/progress/<download_id>/stream')
+def stream_progress(download_id):
+    """
+    Server-Sent Events stream for one download
+    Pushes a snapshot on every real change and closes once the download finishes
+    """
+    if download_id not in downloads:
+        return jsonify({'error': 'Download not found'}), 404
+
+    return event_stream_response(progress_events(download_id))
+
+
+@app.route('/api/progress/stream')
+def stream_all_progress():
+    """
+    Server-Sent Events stream for every download
+    Each event maps download_id -> snapshot for the downloads that changed
+    """
+    return event_stream_response(progress_events())
+
+
+def event_stream_response(events):
+    """
+    Wrap an event generator in an unbuffered text/event-stream response
+    Answers 503 instead when MAX_STREAMS streams are already open
+    """
+    if not stream_slots.acquire(blocking=False):
+        events.close()
+        response = jsonify({'error': 'Too many progress streams open, poll /api/progress instead'})
+        response.headers['Retry-After'] = str(STREAM_KEEPALIVE_SECONDS)
+        return response, 503
+
+    response = Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # Stop reverse proxies from batching events
+    })
+    response.call_on_close(stream_slots.release)  # The server closes it when the client goes away
+    return response
+
+
+def progress_events(download_id=None):
+    """
+    Generate SSE messages for one download (or all of them when download_id is None)
+    Only emits when a snapshot actually changed, at most every STREAM_COALESCE_SECONDS
+    """
+    sent = {}  # download_id -> last snapshot sent to this client
+    last_emit = 0
+
+    while True:
+        # Let bursts of updates collapse into a single event
+        delay = STREAM_COALESCE_SECONDS - (time.time() - last_emit)
+        if delay > 0:
+            time.sleep(delay)
+
+        # Read the version before snapshotting so changes made meanwhile wake us again
+        version = progress_feed.version
+
+        changed = progress_changes(download_id, sent)
+        if changed:
+            last_emit = time.time()
+            yield progress_event(download_id, changed)
+
+        if download_id and stream_finished(download_id):
+            return
+
+        if progress_feed.wait(version, STREAM_KEEPALIVE_SECONDS) == version:
+            yield ": keepalive\n\n"
+
+
+def progress_changes(download_id, sent, snapshots=None):
+    """
+    Snapshots (download_id -> snapshot, None once reaped) that differ from what a
+    streaming client was last sent; updates sent to match
+    snapshots: a jobs_snapshot() to compare against instead of taking fresh ones
+    """
+    if snapshots is None:
+        ids = [download_id] if download_id else set(downloads) | set(sent)
+        positions = None if download_id else scheduler.queue_positions()
+    else:
+        ids = [download_id] if download_id else set(snapshots) | set(sent)
+
+    changed = {}
+    for job_id in ids:
+        if snapshots is None:
+            progress = downloads.get(job_id)
+            snapshot = progress_snapshot(job_id, progress, positions) if progress is not None else None
+        else:
+            snapshot = snapshots.get(job_id)
+        if snapshot is None:
+            # Reaped from the registry - tell the client once, then forget it
+            if job_id in sent:
+                del sent[job_id]
+                changed[job_id] = None
+            continue
+        # Time spent queued ticks constantly; it alone is not a change
+        comparable = {key: value for key, value in snapshot.items() if key != 'waited'}
+        if sent.get(job_id) != comparable:
+            sent[job_id] = comparable
+            changed[job_id] = snapshot
+    return changed
+
+
+def progress_event(download_id, changed):
+    """SSE message for changes from progress_changes()"""
+    payload = changed[download_id] if download_id else changed
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def stream_finished(download_id):
+    """True once a single-download stream has nothing more to send"""
+    progress = downloads.get(download_id)
+    return progress is None or progress.status in TERMINAL_STATUSES
+
+
+def progress_snapshot(download_id, progress, queue_positions=None):
+    """
+    JSON-ready view of a download's progress
+    Pass scheduler.queue_positions() when snapshotting many downloads, to look up the queue once
+    """
+    result = {
         'status': progress.status,
         'progress': progress.progress,
         'speed': progress.speed,
         'eta': progress.eta,
         'title': progress.title,
-        'error': progress.error
-    })
+        'error': progress.error,
+        'audio': progress.audio
+    }
+
+    # Queued jobs also report where they are in line
+    if progress.status == 'queued':
+        if queue_positions is None:
+            queue_info = scheduler.queue_info(download_id)
+        else:
+            queue_info = queue_positions.get(download_id)
+        if queue_info:
+            result.update(queue_info)
+        if progress.retry_at is not None:
+            result['retry_in'] = max(round(progress.retry_at - time.time(), 1), 0)
+
+    # Failed attempts retried so far, and how the last one failed
+    if progress.retry_class is not None:
+        result['retries'] = progress.retries
+        result['retry_class'] = progress.retry_class
+
+    # Throttled downloads: the rate they are allowed next to the rate they get (MB/s)
+    rates = bandwidth.job_stats(download_id)
+    if rates:
+        result['rate_limit'] = round(rates['limit'] / 1_000_000, 2) if rates['limit'] else None
+        result['actual_speed'] = round(rates['actual'] / 1_000_000, 2)
+
+    return result
 
 
 if __name__ == '__main__':
+    # Pick up downloads interrupted by the last shutdown - in the reloader's serving child
+    # only; the watching parent runs this block too, and would download every job again
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        resume_interrupted_jobs()
+
     # Run Flask development server
     # For production, use gunicorn or waitress
     app.run(debug=True, host='0.0.0.0', port=5001)
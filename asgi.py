@@ -0,0 +1,340 @@
+"""
+Junay ASGI App
+Async front end for the web API: progress polling, progress streams (SSE) and
+the job list are answered on the event loop, so thousands of clients can wait
+on them without holding a thread each. Every other route runs the Flask app
+on a thread pool, and downloads still run on the app's own worker threads
+
+    uvicorn asgi:asgi_app --port 5001    (or: JUNAY_SERVER=asgi python launcher.py)
+"""
+
+import asyncio
+import io
+import json
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from werkzeug.wsgi import FileWrapper
+
+from app import (
+    STREAM_COALESCE_SECONDS, STREAM_KEEPALIVE_SECONDS, app, downloads, jobs_snapshot,
+    progress_changes, progress_event, progress_feed, progress_snapshot, stream_finished
+)
+
+# Threads running Flask for the routes that aren't async (downloads, batches, info...)
+WSGI_THREADS = 16
+
+# Read size when the Flask app sends a file (/api/files)
+FILE_BLOCK_SIZE = 1024 * 1024
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),  # Stop reverse proxies from batching events
+]
+
+
+class AsyncChangeFeed:
+    """
+    Lets coroutines wait on the app's ChangeFeed
+    Publishes happen on download threads; each one wakes the event loop at most
+    once, however many clients are waiting
+    """
+    def __init__(self, feed, loop):
+        self.feed = feed
+        self.loop = loop
+        self._event = asyncio.Event()
+        self._pending = False
+        feed.add_listener(self._published)
+
+    def _published(self):
+        # Download thread: skip if a wake-up is already on its way
+        if not self._pending:
+            self._pending = True
+            self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        self._pending = False
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def wait(self, since, timeout):
+        """Wait until the version moves past since; returns False on timeout"""
+        deadline = self.loop.time() + timeout
+        while self.feed.version == since:
+            remaining = deadline - self.loop.time()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+
+class SharedSnapshots:
+    """
+    jobs_snapshot(), taken on the thread pool and shared: every client asking while the
+    feed is at the same version (and within STREAM_COALESCE_SECONDS) gets the same one,
+    so the event loop never takes the app's locks and n clients cost one snapshot
+    """
+    def __init__(self, executor):
+        self.executor = executor
+        self._version = None
+        self._taken_at = 0
+        self._future = None
+        self._bodies = {}  # status filter -> future of the encoded /api/jobs reply, for this snapshot
+
+    def _taken(self, future):
+        self._taken_at = future.get_loop().time()
+
+    async def get(self):
+        loop = asyncio.get_running_loop()
+        version = progress_feed.version
+        # One being taken is always shared; a finished one while it is fresh
+        stale = self._future is None or (self._future.done() and (
+            version != self._version or loop.time() - self._taken_at > STREAM_COALESCE_SECONDS
+        ))
+        if stale:
+            self._version = version
+            self._future = loop.run_in_executor(self.executor, jobs_snapshot)
+            self._future.add_done_callback(self._taken)
+            self._bodies = {}
+        # Shielded: one client going away must not cancel the snapshot the others wait on
+        return await asyncio.shield(self._future)
+
+    async def jobs_body(self, status=None):
+        """The /api/jobs reply for the current snapshot, encoded once however many clients ask"""
+        snapshots = await self.get()
+
+        def encode():
+            return json.dumps({
+                download_id: snapshot for download_id, snapshot in snapshots.items()
+                if status in (None, snapshot['status'])
+            }).encode()
+
+        loop = asyncio.get_running_loop()
+        if not (self._future.done() and self._future.result() is snapshots):
+            return await loop.run_in_executor(self.executor, encode)  # A newer snapshot is on its way
+        if status not in self._bodies:
+            self._bodies[status] = loop.run_in_executor(self.executor, encode)
+        return await asyncio.shield(self._bodies[status])
+
+
+class JunayASGI:
+    """ASGI application: async routes first, the Flask (WSGI) app for everything else"""
+    def __init__(self, wsgi_app, threads=WSGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='junay-wsgi')
+        self.feed = None  # AsyncChangeFeed, created on the server's event loop
+        self.snapshots = SharedSnapshots(self.executor)
+
+        # (method, path pattern, handler) - same URLs and replies as the Flask routes
+        self.routes = [
+            ('GET', re.compile(r'/api/progress/stream'), self.stream_all_progress),
+            ('GET', re.compile(r'/api/progress/(?P<download_id>[^/]+)/stream'), self.stream_progress),
+            ('GET', re.compile(r'/api/progress/(?P<download_id>[^/]+)'), self.get_progress),
+            ('GET', re.compile(r'/api/jobs'), self.list_jobs),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        if self.feed is None:
+            self.feed = AsyncChangeFeed(progress_feed, asyncio.get_running_loop())
+
+        for method, pattern, handler in self.routes:
+            match = pattern.fullmatch(scope['path'])
+            if match and scope['method'] == method:
+                return await handler(scope, receive, send, **match.groupdict())
+
+        await self.call_wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # Async routes
+
+    async def get_progress(self, scope, receive, send, download_id):
+        progress = downloads.get(download_id)
+        if not progress:
+            return await send_json(send, {'error': 'Download not found'}, 404)
+        snapshot = (await self.snapshots.get()).get(download_id)
+        if snapshot is None:
+            # Newer than the shared snapshot
+            loop = asyncio.get_running_loop()
+            snapshot = await loop.run_in_executor(self.executor, progress_snapshot, download_id, progress)
+        await send_json(send, snapshot)
+
+    async def list_jobs(self, scope, receive, send):
+        status = dict(parse_qsl(scope['query_string'].decode('latin-1'))).get('status')
+        await send_json_body(send, await self.snapshots.jobs_body(status))
+
+    async def stream_progress(self, scope, receive, send, download_id):
+        if download_id not in downloads:
+            return await send_json(send, {'error': 'Download not found'}, 404)
+        await self.stream(receive, send, self.progress_events(download_id))
+
+    async def stream_all_progress(self, scope, receive, send):
+        await self.stream(receive, send, self.progress_events())
+
+    async def progress_events(self, download_id=None):
+        """Async twin of app.progress_events: same events, but waiting costs no thread"""
+        sent = {}  # download_id -> last snapshot sent to this client
+        last_emit = 0
+
+        while True:
+            delay = STREAM_COALESCE_SECONDS - (time.time() - last_emit)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            version = progress_feed.version
+
+            changed = progress_changes(download_id, sent, await self.snapshots.get())
+            if changed:
+                last_emit = time.time()
+                yield progress_event(download_id, changed)
+
+            if download_id and stream_finished(download_id):
+                return
+
+            if not await self.feed.wait(version, STREAM_KEEPALIVE_SECONDS):
+                yield ": keepalive\n\n"
+
+    async def stream(self, receive, send, events):
+        """Send events as an SSE response until they end or the client goes away"""
+        await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+
+        async def pump():
+            async for event in events:
+                await send({'type': 'http.response.body', 'body': event.encode(), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(disconnected(receive))]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+        if tasks[0].done() and not tasks[0].cancelled():
+            tasks[0].result()  # Surface errors from the stream itself
+
+    # Everything else: the Flask app on the thread pool
+
+    async def call_wsgi(self, scope, receive, send):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        loop = asyncio.get_running_loop()
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+            ]
+
+        def begin():
+            result = self.wsgi_app(wsgi_environ(scope, body), start_response)
+            return result, iter(result)
+
+        result, chunks = await loop.run_in_executor(self.executor, begin)
+        gone = asyncio.ensure_future(disconnected(receive))
+        try:
+            # Pull the body a chunk at a time so big responses never sit in memory whole,
+            # and stop pulling once the client goes away (the chunk being read is left to finish)
+            chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+            await send({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+            while chunk is not None and not gone.done():
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+            if not gone.done():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            gone.cancel()
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(self.executor, result.close)  # Closes the file being sent
+
+
+async def disconnected(receive):
+    """Return once the client has gone away (call after the request body has been read)"""
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def send_json(send, payload, status=200):
+    await send_json_body(send, json.dumps(payload).encode(), status)
+
+
+async def send_json_body(send, body, status=200):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def wsgi_environ(scope, body):
+    """WSGI environ for an ASGI HTTP request whose body has been read"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        # Files (send_file) go out in big blocks: each block is a trip to the thread pool
+        'wsgi.file_wrapper': lambda file, block_size=8192: FileWrapper(file, max(block_size, FILE_BLOCK_SIZE)),
+    }
+    for name, value in scope['headers']:
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-length':
+            continue
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+            continue
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def serve(host='127.0.0.1', port=5001):
+    """Run the ASGI app under uvicorn (pip install uvicorn)"""
+    import uvicorn
+
+    uvicorn.run(asgi_app, host=host, port=port, log_level='warning', backlog=4096)
+
+
+asgi_app = JunayASGI(app)
@@ -0,0 +1,280 @@
+"""
+Junay Bandwidth Manager
+Global and per-job download rate limits, shared fairly between running jobs,
+with optional time-of-day schedules for the global limit
+"""
+
+import threading
+import time
+from datetime import datetime
+
+# How often the global limit is re-divided between jobs (seconds)
+REBALANCE_INTERVAL = 1.0
+
+# A job that never had to wait and used less than this share of its allocation
+# is treated as not needing more (the server or the disk is what holds it back)
+SATURATED = 0.9
+
+# Burst allowance of each job's bucket, in seconds of its rate
+BUCKET_SECONDS = 0.5
+
+# Fixed read size for throttled downloads; yt-dlp otherwise grows its reads to 4MB,
+# and a job sleeping off 4MB at a time stalls for seconds instead of flowing evenly
+BLOCK_SIZE = 256 * 1024
+
+
+def throttle_options():
+    """yt-dlp options that let progress hooks throttle a download smoothly"""
+    return {'buffersize': BLOCK_SIZE, 'noresizebuffer': True}
+
+
+def parse_schedule(entries):
+    """
+    Validate a schedule: a list of {"start": "HH:MM", "end": "HH:MM", "limit": bytes/s or null,
+    "days": [0-6] (optional, Monday is 0)}; an end before the start wraps past midnight
+    Raises ValueError with a readable message
+    """
+    if not isinstance(entries, list):
+        raise ValueError('schedule must be a list')
+
+    schedule = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise ValueError('schedule entries must be objects')
+        start = _parse_time(entry.get('start'))
+        end = _parse_time(entry.get('end'))
+        limit = parse_rate(entry.get('limit'))
+        days = entry.get('days')
+        if days is not None and (
+            not isinstance(days, list) or not all(isinstance(day, int) and 0 <= day <= 6 for day in days)
+        ):
+            raise ValueError('days must be a list of weekday numbers 0-6 (Monday is 0)')
+        schedule.append({'start': start, 'end': end, 'limit': limit, 'days': days})
+    return schedule
+
+
+def _parse_time(value):
+    """'HH:MM' -> minutes after midnight"""
+    try:
+        hours, minutes = str(value).split(':')
+        hours, minutes = int(hours), int(minutes)
+    except ValueError:
+        raise ValueError(f'invalid time {value!r}, expected HH:MM') from None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f'invalid time {value!r}, expected HH:MM')
+    return hours * 60 + minutes
+
+
+def parse_rate(value):
+    """A rate in bytes/second; None (or null) means unlimited"""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise ValueError('limits must be a positive number of bytes per second, or null')
+    return value
+
+
+def _format_time(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+class TokenBucket:
+    """Token bucket that lets callers go into debt and sleep it off"""
+    __slots__ = ('rate', 'tokens', 'updated', 'lock')
+
+    def __init__(self, rate):
+        self.rate = rate  # Bytes per second, or None for unlimited
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        """Take amount bytes; returns how long the caller should sleep to stay under the rate"""
+        with self.lock:
+            now = time.monotonic()
+            rate = self.rate
+            if rate is None:
+                self.tokens = 0.0
+                self.updated = now
+                return 0
+
+            capacity = rate * BUCKET_SECONDS
+            self.tokens = min(self.tokens + (now - self.updated) * rate, capacity)
+            self.updated = now
+            self.tokens -= amount
+            return -self.tokens / rate if self.tokens < 0 else 0
+
+
+class JobBandwidth:
+    """Rate-limiting state of one running job"""
+    __slots__ = ('limit', 'bucket', 'seen', 'window_bytes', 'window_start', 'actual', 'waited', 'throttled')
+
+    def __init__(self, limit):
+        self.limit = limit  # The job's own cap (None = only the global limit applies)
+        self.bucket = TokenBucket(limit)
+        self.seen = {}  # filename -> bytes already counted (turbo jobs have several streams)
+        self.window_bytes = 0
+        self.window_start = time.monotonic()
+        self.actual = None  # Measured bytes/second over the last window (None until measured)
+        self.waited = False  # Slept for its allocation during the current window
+        self.throttled = True  # ...and during the last one; a throttled job wants more than it gets
+
+
+class BandwidthManager:
+    """
+    Hands out bandwidth to running jobs
+    Every job's progress hook reports bytes; the job's thread sleeps once it runs ahead of its allocation.
+    Allocation is max-min fair: jobs that can't use an equal share keep what they use, the rest is split evenly
+    """
+    def __init__(self, global_limit=None, schedule=None):
+        self.global_limit = global_limit  # Bytes/second when no schedule entry applies
+        self.schedule = schedule or []
+
+        self._lock = threading.Lock()
+        self._jobs = {}  # download_id -> JobBandwidth
+        self._job_limits = {}  # download_id -> limit set before/while the job runs
+        self._last_rebalance = 0.0
+
+    def set_global_limit(self, limit, schedule=None):
+        """Change the global limit (and optionally the schedule); applies to running jobs at once"""
+        with self._lock:
+            self.global_limit = limit
+            if schedule is not None:
+                self.schedule = schedule
+            self._rebalance()
+
+    def set_job_limit(self, download_id, limit):
+        """Cap one job (None removes its cap); works before the job starts too"""
+        with self._lock:
+            if limit is None:
+                self._job_limits.pop(download_id, None)
+            else:
+                self._job_limits[download_id] = limit
+            job = self._jobs.get(download_id)
+            if job is not None:
+                job.limit = limit
+            self._rebalance()
+
+    def current_global_limit(self, now=None):
+        """Global limit in force right now, taking the schedule into account"""
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        for entry in self.schedule:
+            if entry['days'] is not None and now.weekday() not in entry['days']:
+                continue
+            start, end = entry['start'], entry['end']
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                return entry['limit']
+        return self.global_limit
+
+    def hook(self, download_id):
+        """yt-dlp progress hook that registers the job and throttles it"""
+        def hook(d):
+            if d.get('status') == 'downloading':
+                self._throttle(download_id, d.get('filename'), d.get('downloaded_bytes') or 0)
+        return hook
+
+    def release(self, download_id, keep_limit=False):
+        """
+        Forget a job once it stops downloading; its share goes back to the others
+        keep_limit holds on to the job's own limit for when it runs again (a retry)
+        """
+        with self._lock:
+            self._jobs.pop(download_id, None)
+            if not keep_limit:
+                self._job_limits.pop(download_id, None)
+            self._rebalance()
+
+    def _throttle(self, download_id, filename, downloaded):
+        with self._lock:
+            job = self._jobs.get(download_id)
+            if job is None:
+                job = self._jobs[download_id] = JobBandwidth(self._job_limits.get(download_id))
+                self._rebalance()
+
+            # Bytes since the last report for this stream; the first report only sets the
+            # baseline (a resumed download starts with everything already on disk)
+            previous = job.seen.get(filename, downloaded)
+            amount = downloaded - previous if downloaded >= previous else downloaded
+            job.seen[filename] = downloaded
+
+            now = time.monotonic()
+            job.window_bytes += amount
+            elapsed = now - job.window_start
+            if elapsed >= REBALANCE_INTERVAL:
+                job.actual = job.window_bytes / elapsed
+                job.throttled = job.waited
+                job.window_bytes = 0
+                job.window_start = now
+                job.waited = False
+
+            if now - self._last_rebalance >= REBALANCE_INTERVAL:
+                self._rebalance()
+
+            bucket = job.bucket
+
+        delay = bucket.consume(amount)
+        if delay > 0:
+            job.waited = True
+            time.sleep(delay)
+
+    def _rebalance(self):
+        """Recompute every job's allocation (caller holds the lock)"""
+        self._last_rebalance = time.monotonic()
+        jobs = list(self._jobs.values())
+        if not jobs:
+            return
+
+        remaining = self.current_global_limit()
+        if remaining is None:
+            # No global limit: each job is held to its own cap only
+            for job in jobs:
+                job.bucket.rate = job.limit
+            return
+
+        # Max-min fairness: satisfy the smallest demands first, split what's left evenly
+        def demand(job):
+            wants = job.limit if job.limit is not None else float('inf')
+            if not job.throttled and job.bucket.rate and job.actual < job.bucket.rate * SATURATED:
+                # Not using its allocation (slow server, nearly done) - offer a little headroom
+                wants = min(wants, max(job.actual * 1.2, 1))
+            return wants
+
+        pending = sorted(jobs, key=demand)
+        while pending:
+            share = remaining / len(pending)
+            job = pending.pop(0)
+            rate = min(demand(job), share)
+            job.bucket.rate = max(int(rate), 1)
+            remaining -= rate
+
+    def job_stats(self, download_id):
+        """Limit in force and measured rate of a running job (bytes/second), or None"""
+        with self._lock:
+            job = self._jobs.get(download_id)
+            if job is None:
+                return None
+            return {'limit': job.bucket.rate, 'actual': int(job.actual or 0)}
+
+    def stats(self):
+        """Settings and per-job allocations for the bandwidth endpoint"""
+        with self._lock:
+            return {
+                'global_limit': self.global_limit,
+                'current_limit': self.current_global_limit(),
+                'schedule': [
+                    {
+                        'start': _format_time(entry['start']),
+                        'end': _format_time(entry['end']),
+                        'limit': entry['limit'],
+                        'days': entry['days'],
+                    }
+                    for entry in self.schedule
+                ],
+                'jobs': {
+                    download_id: {'limit': job.bucket.rate, 'job_limit': job.limit, 'actual': int(job.actual or 0)}
+                    for download_id, job in self._jobs.items()
+                },
+                'total_actual': int(sum(job.actual or 0 for job in self._jobs.values())),
+            }
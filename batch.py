@@ -0,0 +1,89 @@
+"""
+Junay Batch Ingestion
+Expands lists of video and playlist URLs into single videos, lazily,
+so downloads can start while a long playlist is still being paged through
+"""
+
+import re
+
+from hosts import host_limited
+from info_cache import find_extractor
+
+# Flat extraction: list playlist entries without visiting every video page
+EXPAND_OPTS = {
+    'extract_flat': 'in_playlist',
+    'lazy_playlist': True,
+    'quiet': True,
+    'no_warnings': True,
+}
+
+# How deep to follow playlists of playlists (channel -> tab -> videos)
+MAX_EXPAND_DEPTH = 2
+
+
+def split_urls(text):
+    """Split pasted text (one URL per line, or separated by spaces/commas) into URLs"""
+    return [part for part in re.split(r'[\s,]+', text) if part]
+
+
+def expand_urls(urls):
+    """Generator yielding one video URL at a time for a list of video/playlist URLs"""
+    import yt_dlp
+
+    # Playlist pages count against the per-host limits like the downloads' own requests
+    with host_limited(yt_dlp.YoutubeDL)(EXPAND_OPTS) as ydl:
+        for url in urls:
+            yield from _expand(ydl, url, 0)
+
+
+def _expand(ydl, url, depth):
+    """Yield the videos behind one URL"""
+    # Plain video links need no expansion (and extracting them here would be wasted work)
+    ie = find_extractor(url)
+    if ie is not None and getattr(ie, '_RETURN_TYPE', None) == 'video':
+        yield url
+        return
+
+    try:
+        # process=False keeps playlist entries as a lazy generator of pages
+        info = ydl.extract_info(url, download=False, process=False)
+    except Exception:
+        # Let the download job for this URL report the real error
+        yield url
+        return
+
+    result_type = info.get('_type', 'video')
+
+    if result_type in ('playlist', 'multi_video'):
+        for entry in info.get('entries') or []:
+            if not entry:
+                continue  # Deleted/private videos show up as empty entries
+            entry_url = entry.get('url') or entry.get('webpage_url')
+            if not entry_url:
+                continue
+            if depth < MAX_EXPAND_DEPTH and _is_playlist(entry):
+                yield from _expand(ydl, entry_url, depth + 1)
+            else:
+                yield entry_url
+
+    elif result_type in ('url', 'url_transparent') and depth < MAX_EXPAND_DEPTH:
+        # Redirect (short link, embed...) - resolve one more hop
+        yield from _expand(ydl, info['url'], depth + 1)
+
+    else:
+        yield info.get('webpage_url') or url
+
+
+def _is_playlist(entry):
+    """Whether a flat playlist entry is itself a playlist"""
+    if entry.get('_type') == 'playlist':
+        return True
+
+    ie_key = entry.get('ie_key')
+    if not ie_key:
+        return False
+    try:
+        from yt_dlp.extractor import get_info_extractor
+        return getattr(get_info_extractor(ie_key), '_RETURN_TYPE', None) == 'playlist'
+    except Exception:
+        return False
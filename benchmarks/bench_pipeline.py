@@ -0,0 +1,282 @@
+"""
+Junay Pipeline Benchmark
+Runs the web app (under waitress, as launcher.py does) against the fixture server
+and its stub extractor, drives /api/download at several concurrency levels and
+reports throughput, job latency, CPU time and memory - no network needed
+
+    python benchmarks/bench_pipeline.py [--jobs 16] [--concurrency 1,4,8] [--media dash] [--json results.json]
+    python benchmarks/bench_pipeline.py --concurrency 8,32,64 --backends threads,processes
+"""
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+from fixture_server import STREAMS, FixtureMedia, start_fixture_server  # noqa: E402
+
+try:
+    import resource  # CPU time of the server once it exits (not on Windows)
+except ImportError:
+    resource = None
+
+# How often clients poll their download, and the sampler polls /api/status
+POLL_SECONDS = 0.05
+SAMPLE_SECONDS = 0.5
+
+TERMINAL_STATUSES = ('completed', 'error')
+
+# Download backends: yt-dlp on the server's threads, or in worker processes (JUNAY_WORKER_PROCESSES)
+BACKENDS = ('threads', 'processes')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def api(base_url, path, payload=None):
+    """GET (or POST payload as JSON) and decode the JSON reply"""
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(base_url + path, data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (None for no values)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def children_cpu():
+    """User + system CPU seconds of every child process that has been waited for"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class AppServer:
+    """The web app in its own process, with a scratch data folder, worker limits and backend"""
+    def __init__(self, workers, scratch, backend='threads'):
+        self.port = free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        self.log_path = os.path.join(scratch, 'server.log')
+
+        env = dict(
+            os.environ,
+            JUNAY_DATA_DIR=os.path.join(scratch, 'data'),
+            JUNAY_MAX_DOWNLOADS=str(workers),
+            JUNAY_MAX_PER_HOST=str(workers),  # Every fixture video is on the same host
+            JUNAY_WORKER_PROCESSES=str(os.cpu_count() or 2) if backend == 'processes' else '0',
+            # The app, plus benchmarks/ so yt-dlp finds the stub extractor plugin
+            PYTHONPATH=os.pathsep.join(filter(None, [ROOT, BENCH_DIR, os.environ.get('PYTHONPATH')])),
+        )
+        self._log = open(self.log_path, 'w')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'waitress', '--host=127.0.0.1', f'--port={self.port}',
+             f'--threads={workers + 4}', 'app:app'],
+            cwd=ROOT, env=env, stdout=self._log, stderr=subprocess.STDOUT
+        )
+
+    def wait_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'server exited, see {self.log_path}')
+            try:
+                return api(self.base_url, '/api/status')
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError(f'server did not start within {timeout}s, see {self.log_path}')
+
+    def stop(self):
+        """Stop the server; returns the CPU seconds it used"""
+        before = children_cpu()
+        if resource is not None:
+            # Ctrl+C: the server exits normally and reaps its worker processes,
+            # so their CPU time is counted in its own
+            self.process.send_signal(signal.SIGINT)
+        else:
+            self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._log.close()
+        after = children_cpu()
+        return after - before if before is not None else None
+
+
+def server_memory(status):
+    """Resident bytes of the server, worker processes included"""
+    workers = status.get('worker_processes')
+    if status['process_memory'] is None:
+        return None
+    return status['process_memory'] + (workers['memory'] if workers else 0)
+
+
+def run_job(server, fixture, save_path, name, options):
+    """Start one download and wait for it; returns (status, seconds from request to finish)"""
+    started = time.perf_counter()
+    payload = dict(options, url=f'{fixture.base_url}/watch/{name}', save_path=save_path)
+    download_id = api(server.base_url, '/api/download', payload)['download_id']
+
+    while True:
+        progress = api(server.base_url, f'/api/progress/{download_id}')
+        if progress['status'] in TERMINAL_STATUSES:
+            return progress['status'], time.perf_counter() - started
+        time.sleep(POLL_SECONDS)
+
+
+def run_level(fixture, concurrency, backend, args):
+    """Run args.jobs downloads, concurrency at a time, against a fresh server using backend"""
+    scratch = tempfile.mkdtemp(prefix='junay-pipeline-')
+    save_path = os.path.join(scratch, 'downloads')
+    os.makedirs(save_path)
+    options = {'quality': args.quality, 'turbo': args.turbo}
+
+    server = AppServer(concurrency, scratch, backend)
+    try:
+        idle_rss = server_memory(server.wait_ready())
+
+        # Memory sampled while the jobs run
+        peak_rss = [idle_rss or 0]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(SAMPLE_SECONDS):
+                rss = server_memory(api(server.base_url, '/api/status'))
+                peak_rss[0] = max(peak_rss[0], rss or 0)
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(
+                lambda number: run_job(server, fixture, save_path, f'{backend}-c{concurrency}-{number}', options),
+                range(args.jobs)
+            ))
+        wall = time.perf_counter() - started
+
+        done.set()
+        sampler.join()
+        cpu = server.stop()
+    except BaseException:
+        server.stop()
+        raise
+
+    size = sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(save_path) for name in names
+    )
+    latencies = [seconds for status, seconds in results if status == 'completed']
+    failed = sum(1 for status, _ in results if status != 'completed')
+
+    if failed:
+        print(f'  ({failed} failed, server log kept in {server.log_path})')
+    else:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    return {
+        'backend': backend,
+        'concurrency': concurrency,
+        'jobs': args.jobs,
+        'failed': failed,
+        'wall_seconds': wall,
+        'bytes': size,
+        'mb_per_second': size / wall / 1_000_000,
+        'jobs_per_second': len(latencies) / wall,
+        'p50_seconds': percentile(latencies, 50),
+        'p99_seconds': percentile(latencies, 99),
+        'cpu_seconds': cpu,
+        'idle_rss_bytes': idle_rss,
+        'peak_rss_bytes': peak_rss[0] or None,
+    }
+
+
+def report(result):
+    def number(value, fmt, unit=''):
+        if value is None:
+            return format('-', '>' + fmt.split('.')[0]) + ' ' * len(unit)
+        return format(value, fmt) + unit
+
+    mb = 1024 * 1024
+    print(
+        f"  {result['backend']:<9} {result['concurrency']:>5} {result['jobs'] - result['failed']:>4}/{result['jobs']:<4}"
+        f" {result['wall_seconds']:8.2f}s {result['mb_per_second']:8.2f} {result['jobs_per_second']:7.2f}"
+        f" {number(result['p50_seconds'], '8.2f', 's')} {number(result['p99_seconds'], '8.2f', 's')}"
+        f" {number(result['cpu_seconds'], '8.2f', 's')}"
+        f" {number(result['idle_rss_bytes'] and result['idle_rss_bytes'] / mb, '7.1f')}"
+        f" {number(result['peak_rss_bytes'] and result['peak_rss_bytes'] / mb, '7.1f')}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=16, help='downloads per concurrency level')
+    parser.add_argument('--concurrency', default='1,4,8', help='comma-separated downloads in flight at once')
+    parser.add_argument('--media', choices=STREAMS, default='dash', help='stream type the fixture videos offer')
+    parser.add_argument('--backends', default='threads', help=f'comma-separated download backends ({", ".join(BACKENDS)})')
+    parser.add_argument('--quality', default='Best Available')
+    parser.add_argument('--turbo', action='store_true', help='start downloads in turbo mode')
+    parser.add_argument('--duration', type=int, default=10, help='seconds of media per video')
+    parser.add_argument('--rate', type=int, default=2_000_000, help='per-connection bytes/second (0 = unthrottled)')
+    parser.add_argument('--burst', type=int, default=512 * 1024, help='unthrottled bytes per response')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds added to every request')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    backends = args.backends.split(',')
+    for backend in backends:
+        if backend not in BACKENDS:
+            parser.error(f'unknown backend {backend!r}, expected one of {", ".join(BACKENDS)}')
+    fixture = start_fixture_server(
+        FixtureMedia(duration=args.duration), rate=args.rate, burst_bytes=args.burst,
+        latency=args.latency, streams=(args.media,)
+    )
+    print(f'Fixture: {args.media}, {args.duration}s videos, {args.rate / 1_000_000:.1f} MB/s per connection '
+          f'after {args.burst // 1024}KB, {args.latency * 1000:.0f}ms per request'
+          f'{", turbo" if args.turbo else ""}; {args.jobs} jobs per level')
+    if shutil.which('ffmpeg') is None:
+        print('ffmpeg not found: DASH video and audio will not be merged')
+    print(f"  {'backend':<9} {'conc':>5} {'ok':>4} {'':<4} {'wall':>9} {'MB/s':>8} {'jobs/s':>7} {'p50':>9} {'p99':>9}"
+          f" {'cpu':>9} {'rss MB':>7} {'peak':>7}")
+
+    results = []
+    try:
+        for level in levels:
+            for backend in backends:
+                result = run_level(fixture, level, backend, args)
+                report(result)
+                results.append(result)
+    finally:
+        fixture.stop()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Junay Startup Benchmark
+Cold-starts launcher.py (no browser) several times and reports how long it takes
+to import, to accept connections, to answer its first request and to finish loading
+yt-dlp in the background, plus which packages the app's imports spend their time in.
+Save runs with --json to compare releases
+
+    python benchmarks/bench_startup.py [--runs 5] [--json startup.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+from bench_pipeline import free_port  # noqa: E402
+
+# Steps launcher.py --startup-report prints, plus the first answered request measured here
+STEPS = ('imports', 'listening', 'first_response', 'warm')
+
+
+def cold_start(scratch, timeout=60):
+    """Start the launcher once; returns {step: seconds since the process was started}"""
+    port = free_port()
+    env = dict(os.environ, JUNAY_PORT=str(port), JUNAY_DATA_DIR=os.path.join(scratch, 'data'))
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, 'launcher.py', '--no-browser', '--startup-report'],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/api/status', timeout=5).read()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError('launcher did not start:\n' + process.stdout.read())
+                time.sleep(0.01)
+        first_response = time.perf_counter() - started
+
+        for line in process.stdout:
+            if line.startswith('startup '):
+                # The launcher's clock starts after interpreter startup; ours before it
+                timings = json.loads(line[len('startup '):])
+                break
+        else:
+            raise RuntimeError('launcher exited without a startup report')
+    finally:
+        process.terminate()
+        process.wait()
+
+    timings['first_response'] = first_response
+    return timings
+
+
+def import_profile(top=10):
+    """Seconds `import app` spends in each top-level package (python -X importtime), biggest first"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    packages = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)', line)
+        if match:
+            package = match.group(2).split('.')[0]
+            packages[package] = packages.get(package, 0) + int(match.group(1)) / 1_000_000
+    total = sum(packages.values())
+    return total, sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='cold starts to take the median of')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as scratch:
+        for _ in range(args.runs):
+            runs.append(cold_start(scratch))
+
+    print(f'Cold start over {args.runs} runs (seconds after launch; imports count from the launcher\'s first line)')
+    print(f"  {'step':<15} {'median':>8} {'min':>8} {'max':>8}")
+    summary = {}
+    for step in STEPS:
+        values = [run[step] for run in runs]
+        summary[step] = {'median': statistics.median(values), 'min': min(values), 'max': max(values)}
+        print(f"  {step:<15} {summary[step]['median']:8.3f} {min(values):8.3f} {max(values):8.3f}")
+
+    total, packages = import_profile()
+    print(f'\nimport app: {total:.3f}s, by package')
+    for package, seconds in packages:
+        print(f'  {package:<15} {seconds:8.3f}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'settings': vars(args), 'steps': summary, 'runs': runs,
+                'import_seconds': total, 'import_packages': dict(packages),
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
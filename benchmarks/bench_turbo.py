@@ -0,0 +1,122 @@
+"""
+Junay Turbo Benchmark
+Downloads the fixture server's DASH, HLS and progressive media with normal and
+turbo settings and prints the throughput of each
+
+    python benchmarks/bench_turbo.py [--duration 60] [--rate 2000000] [--repeat 3]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp  # noqa: E402
+from yt_dlp.postprocessor import FFmpegMergerPP  # noqa: E402
+
+from fixture_server import FixtureMedia, start_fixture_server  # noqa: E402
+from turbo import TurboYoutubeDL, turbo_options  # noqa: E402
+
+# Same transfer settings as the web app's download_video
+BASE_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'noprogress': True,
+    'retries': 3,
+    'fragment_retries': 3,
+    'http_chunk_size': 10485760,
+}
+
+SCENARIOS = [
+    # (name, path, format) - DASH has separate video and audio like YouTube
+    ('DASH video+audio', '/dash/manifest.mpd', 'video+audio'),
+    ('HLS', '/hls/stream.m3u8', 'best'),
+    ('Progressive', '/progressive.mp4', 'best'),
+]
+
+
+def download_once(url, format_selector, turbo, chunk_size=None):
+    """Download url into a scratch folder; returns (seconds, bytes)"""
+    folder = tempfile.mkdtemp(prefix='junay-bench-')
+    opts = dict(BASE_OPTS, format=format_selector, outtmpl=os.path.join(folder, 'media.%(format_id)s.%(ext)s'))
+
+    # Without ffmpeg the streams can't be merged - keep them as separate files
+    if not FFmpegMergerPP(None).available:
+        opts['allow_unplayable_formats'] = True
+
+    downloader = yt_dlp.YoutubeDL
+    if turbo:
+        opts.update(turbo_options())
+        downloader = TurboYoutubeDL
+    if chunk_size is not None:
+        opts['http_chunk_size'] = chunk_size
+
+    try:
+        started = time.perf_counter()
+        with downloader(opts) as ydl:
+            ydl.download([url])
+        elapsed = time.perf_counter() - started
+
+        size = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(folder) for name in names
+        )
+        return elapsed, size
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def best_of(repeat, *args, **kwargs):
+    """Fastest of several runs (the least disturbed by everything else on the machine)"""
+    return min((download_once(*args, **kwargs) for _ in range(repeat)), key=lambda run: run[0])
+
+
+def report(label, seconds, size, baseline=None):
+    line = f'  {label:<28} {seconds:7.2f}s  {size / seconds / 1_000_000:7.2f} MB/s'
+    if baseline:
+        line += f'  x{baseline / seconds:.2f}'
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duration', type=int, default=60, help='seconds of media per stream')
+    parser.add_argument('--rate', type=int, default=2_000_000, help='per-connection bytes/second')
+    parser.add_argument('--burst', type=int, default=512 * 1024, help='unthrottled bytes per response')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds added to every request')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    fixture = start_fixture_server(
+        FixtureMedia(duration=args.duration), rate=args.rate,
+        burst_bytes=args.burst, latency=args.latency
+    )
+    print(f'Fixture: {args.rate / 1_000_000:.1f} MB/s per connection after {args.burst // 1024}KB, '
+          f'{args.latency * 1000:.0f}ms per request, best of {args.repeat}')
+
+    try:
+        for name, path, format_selector in SCENARIOS:
+            url = fixture.base_url + path
+            print(name)
+            normal = best_of(args.repeat, url, format_selector, turbo=False)
+            report('normal', *normal)
+            report('turbo', *best_of(args.repeat, url, format_selector, turbo=True), baseline=normal[0])
+
+        # Range size matters once each response is throttled past its first burst
+        print('Progressive, by range size')
+        url = fixture.base_url + '/progressive.mp4'
+        baseline = None
+        for chunk_mb in (10, 5, 2, 1):
+            seconds, size = best_of(args.repeat, url, 'best', turbo=False, chunk_size=chunk_mb * 1024 * 1024)
+            report(f'{chunk_mb}MB ranges', seconds, size, baseline=baseline)
+            baseline = baseline or seconds
+    finally:
+        fixture.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Junay Benchmark Fixture Server
+Local stand-in for a video host: a progressive file, an HLS stream and a
+DASH manifest with separate video and audio, all served with a per-request
+latency and a per-connection throttle like the real sites apply
+/watch/<id> URLs are videos for the stub extractor in yt_dlp_plugins/, which
+reads their metadata from /api/video/<id>
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SEGMENT_SECONDS = 2
+
+
+class FixtureMedia:
+    """Sizes of the synthetic media; contents are random bytes (nothing decodes them)"""
+    def __init__(self, duration=60, video_bitrate=4_000_000, audio_bitrate=128_000, audio_codec='mp4a.40.2'):
+        self.duration = duration
+        self.audio_codec = audio_codec
+        self.segments = duration // SEGMENT_SECONDS
+        self.video_segment_bytes = video_bitrate // 8 * SEGMENT_SECONDS
+        self.audio_segment_bytes = audio_bitrate // 8 * SEGMENT_SECONDS
+        self.progressive_bytes = (self.video_segment_bytes + self.audio_segment_bytes) * self.segments
+
+        # One random block reused for every body keeps memory flat
+        self.block = random.Random(0).randbytes(64 * 1024)
+
+    def hls_playlist(self):
+        lines = [
+            '#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{SEGMENT_SECONDS}',
+            '#EXT-X-MEDIA-SEQUENCE:0', '#EXT-X-PLAYLIST-TYPE:VOD',
+        ]
+        for number in range(self.segments):
+            lines += [f'#EXTINF:{SEGMENT_SECONDS}.0,', f'seg{number}.ts']
+        lines.append('#EXT-X-ENDLIST')
+        return '\n'.join(lines) + '\n'
+
+    def dash_manifest(self):
+        adaptation = '''
+    <AdaptationSet mimeType="{mime}" contentType="{kind}">
+      <Representation id="{kind}" codecs="{codecs}" bandwidth="{bandwidth}"{extra}>
+        <SegmentTemplate timescale="1" duration="{seconds}" startNumber="1"
+                         initialization="{kind}/init.mp4" media="{kind}/$Number$.m4s"/>
+      </Representation>
+    </AdaptationSet>'''
+        video = adaptation.format(
+            mime='video/mp4', kind='video', codecs='avc1.640028', seconds=SEGMENT_SECONDS,
+            bandwidth=self.video_segment_bytes * 8 // SEGMENT_SECONDS, extra=' width="1920" height="1080"'
+        )
+        audio = adaptation.format(
+            mime='audio/mp4', kind='audio', codecs=self.audio_codec, seconds=SEGMENT_SECONDS,
+            bandwidth=self.audio_segment_bytes * 8 // SEGMENT_SECONDS, extra=' audioSamplingRate="44100"'
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" '
+            f'mediaPresentationDuration="PT{self.duration}S" minBufferTime="PT2S" '
+            'profiles="urn:mpeg:dash:profile:isoff-on-demand:2011">\n'
+            f'  <Period>{video}{audio}\n  </Period>\n</MPD>\n'
+        )
+
+    def body_size(self, path):
+        """Size of a media file, or None if path isn't one"""
+        if path == '/progressive.mp4':
+            return self.progressive_bytes
+        if re.fullmatch(r'/hls/seg\d+\.ts', path):
+            return self.video_segment_bytes + self.audio_segment_bytes
+        if path in ('/dash/video/init.mp4', '/dash/audio/init.mp4'):
+            return 1024
+        match = re.fullmatch(r'/dash/(video|audio)/(\d+)\.m4s', path)
+        if match and 1 <= int(match.group(2)) <= self.segments:
+            return self.video_segment_bytes if match.group(1) == 'video' else self.audio_segment_bytes
+        return None
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output readable
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?')[0]
+        time.sleep(server.latency)  # Round trip + server think time
+
+        with server.stats_lock:
+            server.requests += 1
+
+        match = re.fullmatch(r'/api/video/([\w-]+)', path)
+        if match:
+            return self._send_text(json.dumps(server.video_metadata(match.group(1))), 'application/json')
+        if path == '/hls/stream.m3u8':
+            return self._send_text(server.media.hls_playlist(), 'application/vnd.apple.mpegurl')
+        if path == '/dash/manifest.mpd':
+            return self._send_text(server.media.dash_manifest(), 'application/dash+xml')
+
+        size = server.media.body_size(path)
+        if size is None:
+            self.send_error(404)
+            return
+
+        start, end = 0, size - 1
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        self._send_throttled(end - start + 1)
+
+    def _send_text(self, text, content_type):
+        body = text.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_throttled(self, length):
+        """Send length bytes: the first burst_bytes at full speed, the rest at rate bytes/s"""
+        server = self.server
+        block = server.media.block
+        sent = 0
+        started = time.monotonic()
+
+        while sent < length:
+            chunk = block[:min(len(block), length - sent)]
+            try:
+                self.wfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            sent += len(chunk)
+
+            throttled = sent - server.burst_bytes
+            if server.rate and throttled > 0:
+                # Sleep until this connection is back under its rate
+                due = started + throttled / server.rate
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+        with server.stats_lock:
+            server.bytes_sent += sent
+
+
+# Stream types a /watch/<id> video can offer
+STREAMS = ('dash', 'hls', 'progressive')
+
+
+def start_fixture_server(media=None, rate=2_000_000, burst_bytes=512 * 1024, latency=0.02, port=0, streams=STREAMS):
+    """
+    Serve media on 127.0.0.1 in a background thread; returns the server (base_url, stop())
+    rate is bytes/second per connection after the first burst_bytes of each response
+    streams are the stream types (of STREAMS) that /watch/<id> videos offer
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), FixtureHandler)
+    server.daemon_threads = True
+    server.media = media or FixtureMedia()
+    server.rate = rate
+    server.burst_bytes = burst_bytes
+    server.latency = latency
+    server.streams = list(streams)
+    server.stats_lock = threading.Lock()
+    server.requests = 0
+    server.bytes_sent = 0
+    server.base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    thread = threading.Thread(target=server.serve_forever, name='junay-fixture', daemon=True)
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+
+    def video_metadata(video_id):
+        """What the stub extractor learns about /watch/<video_id> - every ID is the same media"""
+        return {
+            'id': video_id,
+            'title': f'Fixture video {video_id}',
+            'duration': server.media.duration,
+            'streams': server.streams,
+            'progressive_bytes': server.media.progressive_bytes,
+        }
+
+    server.stop = stop
+    server.video_metadata = video_metadata
+    return server
+
+
+if __name__ == '__main__':
+    fixture = start_fixture_server(port=8780)
+    print(f'Serving fixture media on {fixture.base_url}')
+    print(f'  {fixture.base_url}/progressive.mp4')
+    print(f'  {fixture.base_url}/hls/stream.m3u8')
+    print(f'  {fixture.base_url}/dash/manifest.mpd')
+    print(f'  {fixture.base_url}/watch/<any-id> (with benchmarks/ on PYTHONPATH for the stub extractor)')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fixture.stop()
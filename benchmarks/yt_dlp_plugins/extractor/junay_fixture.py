@@ -0,0 +1,44 @@
+"""
+Junay Fixture Extractor
+yt-dlp plugin for the fixture server's /watch/<id> URLs, so benchmarks go
+through extraction and format selection like a real site, without the network
+yt-dlp loads it when benchmarks/ is on PYTHONPATH
+"""
+
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class JunayFixtureIE(InfoExtractor):
+    IE_NAME = 'junay:fixture'
+    _VALID_URL = r'(?P<base>https?://(?:127\.0\.0\.1|localhost):\d+)/watch/(?P<id>[\w-]+)'
+
+    def _real_extract(self, url):
+        base, video_id = self._match_valid_url(url).group('base', 'id')
+        meta = self._download_json(f'{base}/api/video/{video_id}', video_id)
+
+        # Same media for every ID; the query only keeps each video's URLs distinct
+        formats = []
+        if 'dash' in meta['streams']:
+            formats += self._extract_mpd_formats(f'{base}/dash/manifest.mpd?v={video_id}', video_id, mpd_id='dash')
+        if 'hls' in meta['streams']:
+            formats += self._extract_m3u8_formats(
+                f'{base}/hls/stream.m3u8?v={video_id}', video_id, 'mp4', m3u8_id='hls'
+            )
+        if 'progressive' in meta['streams']:
+            formats.append({
+                'format_id': 'progressive',
+                'url': f'{base}/progressive.mp4?v={video_id}',
+                'ext': 'mp4',
+                'width': 640,
+                'height': 360,
+                'vcodec': 'avc1.4d401e',
+                'acodec': 'mp4a.40.2',
+                'filesize': meta['progressive_bytes'],
+            })
+
+        return {
+            'id': video_id,
+            'title': meta['title'],
+            'duration': meta['duration'],
+            'formats': formats,
+        }
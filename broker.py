@@ -0,0 +1,184 @@
+"""
+Junay Job Broker
+SQLite job queue for distributed mode: the web app enqueues downloads and
+junay_worker.py processes on any number of machines claim them over the API.
+A claim is a lease; workers renew it with every heartbeat, and a job whose
+worker stops heartbeating goes back on the queue for someone else
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+# Seconds a claim lasts without a heartbeat (override with JUNAY_LEASE_SECONDS)
+DEFAULT_LEASE_SECONDS = 30
+
+# Leases a job may lose (worker crashed, machine gone) before it is failed instead of retried
+MAX_ATTEMPTS = 3
+
+
+class JobBroker:
+    """
+    Persistent queue of download jobs with leases
+    Jobs move queued -> leased -> done (or failed); an expired lease puts the job back to queued
+    """
+    def __init__(self, path, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        # Counters for the status endpoint
+        self.claims = 0
+        self.requeued = 0  # Leases that expired and went back on the queue
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS broker_jobs (
+                download_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                not_before REAL NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS broker_queue ON broker_jobs (status, priority, created_at)')
+        self._add_missing_columns()
+        self._conn.commit()
+
+    def _add_missing_columns(self):
+        """Bring a queue written by an older version up to the current table"""
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(broker_jobs)')}
+        if 'not_before' not in columns:
+            self._conn.execute('ALTER TABLE broker_jobs ADD COLUMN not_before REAL NOT NULL DEFAULT 0')
+
+    def enqueue(self, download_id, payload, priority=0, delay=0):
+        """
+        Queue a job (payload: what a worker needs to run it), claimable delay seconds from now
+        A job already known keeps its lease; a finished one is queued again (a retry)
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO broker_jobs (download_id, payload, priority, status, not_before, created_at, updated_at) '
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?) "
+                "ON CONFLICT(download_id) DO UPDATE SET status = 'queued', attempts = 0, worker = NULL, "
+                'not_before = excluded.not_before, updated_at = excluded.updated_at '
+                "WHERE broker_jobs.status IN ('done', 'failed')",
+                (download_id, json.dumps(payload), priority, now + delay, now, now)
+            )
+            self._conn.commit()
+
+    def claim(self, worker):
+        """
+        Lease the next job to worker: highest priority first, then oldest
+        Returns (download_id, payload, attempt) or None when the queue is empty
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT download_id, payload, attempts FROM broker_jobs WHERE status = 'queued' AND not_before <= ? "
+                'ORDER BY priority DESC, created_at LIMIT 1',
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            download_id, payload, attempts = row
+            self._conn.execute(
+                "UPDATE broker_jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = ?, "
+                'updated_at = ? WHERE download_id = ?',
+                (worker, now + self.lease_seconds, attempts + 1, now, download_id)
+            )
+            self._conn.commit()
+            self.claims += 1
+
+        return download_id, json.loads(payload), attempts + 1
+
+    def heartbeat(self, download_id, worker):
+        """Renew worker's lease on a job; False if the lease was lost (the job went to someone else)"""
+        now = time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE broker_jobs SET lease_expires = ?, updated_at = ? "
+                "WHERE download_id = ? AND worker = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, download_id, worker)
+            ).rowcount
+            self._conn.commit()
+        return updated > 0
+
+    def finish(self, download_id, worker, failed=False):
+        """Close a job its worker has finished; returns its payload, or None if the lease was lost first"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM broker_jobs WHERE download_id = ? AND worker = ? AND status = 'leased'",
+                (download_id, worker)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                'UPDATE broker_jobs SET status = ?, lease_expires = NULL, updated_at = ? WHERE download_id = ?',
+                ('failed' if failed else 'done', time.time(), download_id)
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def expire_leases(self):
+        """
+        Put jobs whose lease ran out back on the queue (or fail them after max_attempts)
+        Returns (requeued, failed), each a list of (download_id, payload)
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT download_id, payload, attempts FROM broker_jobs WHERE status = 'leased' AND lease_expires < ?",
+                (now,)
+            ).fetchall()
+            requeued = [(download_id, json.loads(payload)) for download_id, payload, attempts in rows
+                        if attempts < self.max_attempts]
+            failed = [(download_id, json.loads(payload)) for download_id, payload, attempts in rows
+                      if attempts >= self.max_attempts]
+
+            self._conn.executemany(
+                "UPDATE broker_jobs SET status = 'queued', worker = NULL, lease_expires = NULL, updated_at = ? "
+                'WHERE download_id = ?',
+                [(now, download_id) for download_id, _ in requeued]
+            )
+            self._conn.executemany(
+                "UPDATE broker_jobs SET status = 'failed', lease_expires = NULL, updated_at = ? WHERE download_id = ?",
+                [(now, download_id) for download_id, _ in failed]
+            )
+            self._conn.commit()
+            self.requeued += len(requeued)
+
+        return requeued, failed
+
+    def stats(self):
+        """Jobs by status and the workers holding leases"""
+        with self._lock:
+            counts = dict(self._conn.execute('SELECT status, COUNT(*) FROM broker_jobs GROUP BY status').fetchall())
+            delayed = self._conn.execute(
+                "SELECT COUNT(*) FROM broker_jobs WHERE status = 'queued' AND not_before > ?", (time.time(),)
+            ).fetchone()[0]
+            workers = dict(self._conn.execute(
+                "SELECT worker, COUNT(*) FROM broker_jobs WHERE status = 'leased' GROUP BY worker"
+            ).fetchall())
+        return {
+            'queued': counts.get('queued', 0),
+            'delayed': delayed,  # Queued, but backing off before a retry
+            'leased': counts.get('leased', 0),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'workers': workers,  # worker -> jobs it holds right now
+            'claims': self.claims,
+            'requeued': self.requeued,
+            'lease_seconds': self.lease_seconds,
+        }
@@ -0,0 +1,124 @@
+"""
+Junay Download Deduplication
+Remembers finished files so the same video + quality is never fetched twice,
+and lets duplicate requests share a download that is still running
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+
+def place_file(source, directory):
+    """
+    Make an existing file available in directory without downloading it again
+    Hardlinks when possible (instant), returns the path or None if it can't be done
+    """
+    target = os.path.join(directory, os.path.basename(source))
+    if os.path.exists(target):
+        # Already there - but a different file with the same name doesn't count
+        return target if os.path.samefile(target, source) else None
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        os.link(source, target)
+        return target
+    except OSError:
+        # Different filesystem, or links not supported - let the caller download normally
+        return None
+
+
+class CompletedIndex:
+    """
+    SQLite index of finished downloads: (video ID + format selector) -> path, size, mtime
+    Entries whose file was moved, deleted or rewritten are dropped on lookup
+    (files are never read: size and mtime tell a changed file apart)
+    """
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS files (
+                key TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                title TEXT,
+                size INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,  -- Not computed any more (''); existing indexes have the column
+                completed_at REAL NOT NULL
+            )
+        ''')
+        self._add_missing_columns()
+        self._conn.commit()
+
+    def _add_missing_columns(self):
+        """Bring an index written by an older version up to the current table"""
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(files)')}
+        if 'mtime' not in columns:
+            self._conn.execute('ALTER TABLE files ADD COLUMN mtime REAL NOT NULL DEFAULT 0')
+
+    def lookup(self, key):
+        """
+        Finished file for key as a dict, or None if we don't have a usable copy
+        Checked by size and mtime (no reading), so it is safe on the request path
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT path, title, size, mtime FROM files WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            path, title, size, mtime = row
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat is None or stat.st_size != size or (mtime and stat.st_mtime != mtime):
+                # File was moved, deleted or rewritten since we recorded it
+                self._conn.execute('DELETE FROM files WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+            if not mtime:
+                # Recorded before mtimes were: the size matched, so take this one as the file's
+                self._conn.execute('UPDATE files SET mtime = ? WHERE key = ?', (stat.st_mtime, key))
+                self._conn.commit()
+
+        return {'path': path, 'title': title, 'size': size}
+
+    def record(self, key, path, title):
+        """Remember a finished download (reads only its size and mtime)"""
+        stat = os.stat(path)
+
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO files (key, path, title, size, mtime, sha256, completed_at) '
+                "VALUES (?, ?, ?, ?, ?, '', ?)",
+                (key, path, title, stat.st_size, stat.st_mtime, time.time())
+            )
+            self._conn.commit()
+
+
+class InFlightJobs:
+    """Maps a dedup key to the download currently fetching it"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}  # key -> download_id
+
+    def claim(self, key, download_id):
+        """Register download_id for key; returns the id already running it, if any"""
+        with self._lock:
+            existing = self._jobs.get(key)
+            if existing is not None:
+                return existing
+            self._jobs[key] = download_id
+            return None
+
+    def release(self, key, download_id):
+        """Forget key once its download has finished (either way)"""
+        with self._lock:
+            if self._jobs.get(key) == download_id:
+                del self._jobs[key]
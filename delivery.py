@@ -0,0 +1,71 @@
+"""
+Junay File Delivery
+Streams a download's file to a client while yt-dlp is still writing it
+"""
+
+import time
+import unicodedata
+from urllib.parse import quote
+
+# Largest read handed to the server at once, and how often to look for new bytes
+FOLLOW_CHUNK = 1024 * 1024
+FOLLOW_POLL_SECONDS = 0.25
+
+
+def is_progressive(d):
+    """
+    True when a yt-dlp progress report comes from a single progressive HTTP stream
+    written front to back into the job's final file (not a fragment download, and
+    not one of the streams of a format that will be merged)
+    """
+    info = d.get('info_dict') or {}
+    return (
+        bool(d.get('tmpfilename'))
+        and info.get('protocol') in ('http', 'https')
+        and d.get('filename') == info.get('_filename')
+    )
+
+
+def follow_file(paths, start, length, still_writing, poll=FOLLOW_POLL_SECONDS):
+    """
+    Yield length bytes (None = everything) of a growing file, from offset start
+    paths are tried in order - the .part file, then the name it is renamed to;
+    still_writing() returns False once nothing more will be appended.
+    The file is reopened for every read so the writer is free to rename it
+    (Windows won't rename a file someone has open)
+    """
+    position = start
+    end = start + length if length is not None else None
+
+    while end is None or position < end:
+        wanted = FOLLOW_CHUNK if end is None else min(FOLLOW_CHUNK, end - position)
+        # Ask before reading: bytes written before the writer stopped are still picked up
+        writing = still_writing()
+        chunk = _read_at(paths, position, wanted)
+        if chunk:
+            position += len(chunk)
+            yield chunk
+        elif writing:
+            time.sleep(poll)
+        else:
+            return  # The download ended (or failed) short of what was asked for
+
+
+def _read_at(paths, position, size):
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                f.seek(position)
+                return f.read(size)
+        except FileNotFoundError:
+            continue  # Renamed since we last looked
+    return b''
+
+
+def attachment_header(filename):
+    """Content-Disposition value offering filename as a download (RFC 6266 for non-ASCII names)"""
+    simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+    simple = simple.replace('\\', '\\\\').replace('"', '\\"')
+    if simple == filename:
+        return f'attachment; filename="{simple}"'
+    return f'attachment; filename="{simple}"; filename*=UTF-8\'\'{quote(filename, safe="")}'
@@ -0,0 +1,166 @@
+"""
+Junay Engine
+Download core shared by the web app, the desktop apps and the distributed worker:
+quality choices, the tuned yt-dlp options and the download itself, with progress
+going to whatever sinks the client plugs in
+"""
+
+import os
+from pathlib import Path
+
+from hosts import host_limited
+from info_cache import InfoCache, cached_download, video_key
+from postprocess import PREFER_AAC_SORT, deferred_merge, deferring, run_deferred
+from profiling import JobProfile
+from retry import retry_sleep
+
+# Map quality to yt-dlp format
+QUALITY_MAP = {
+    "2160p (4K)": "bestvideo[height<=2160]+bestaudio/best[height<=2160]",
+    "1440p (2K)": "bestvideo[height<=1440]+bestaudio/best[height<=1440]",
+    "1080p (Full HD)": "bestvideo[height<=1080]+bestaudio/best[height<=1080]",
+    "720p (HD)": "bestvideo[height<=720]+bestaudio/best[height<=720]",
+    "Best Available": "bestvideo+bestaudio/best"
+}
+BEST_FORMAT = QUALITY_MAP["Best Available"]
+
+# Where caches and indexes live (the web app's data folder, shared with the desktop apps)
+DATA_DIR = Path(os.environ.get('JUNAY_DATA_DIR', Path.home() / '.junay'))
+
+
+def format_for(quality):
+    """yt-dlp format selector for a quality choice; anything unknown gets the best available"""
+    return QUALITY_MAP.get(quality, BEST_FORMAT)
+
+
+def downloader_for(turbo=False):
+    """
+    YoutubeDL class for a job: turbo fetches fragments and streams over parallel connections
+    Either way its requests keep within the per-host limits (see hosts.py)
+    """
+    if turbo:
+        from turbo import TurboYoutubeDL
+        return host_limited(TurboYoutubeDL)
+    import yt_dlp
+    return host_limited(yt_dlp.YoutubeDL)
+
+
+def download_options(format_selector, save_path, progress_hooks=(), turbo=False, **extra):
+    """
+    The yt-dlp options every client downloads with
+    extra adds to or overrides them (the web app's read throttling, the worker's postprocessor hooks)
+    """
+    opts = {
+        'format': format_selector,
+        'outtmpl': os.path.join(save_path, '%(title)s.%(ext)s'),
+        'progress_hooks': list(progress_hooks),
+        'merge_output_format': 'mp4',
+        'format_sort': PREFER_AAC_SORT,  # AAC audio among equals: merges can copy it
+        'continuedl': True,  # Pick up .part files left by an interrupted run
+        'quiet': False,  # Show errors
+        'no_warnings': False,  # Show warnings
+        'socket_timeout': 30,  # Timeout for network operations
+        'retries': 3,  # Retry failed downloads
+        'fragment_retries': 3,  # Retry failed fragments
+        'http_chunk_size': 10485760,  # 10MB chunks (helps with broken pipe)
+        # Back off between those retries; failures that outlast them are retried by the client (see retry.py)
+        'retry_sleep_functions': {'http': retry_sleep, 'fragment': retry_sleep, 'extractor': retry_sleep},
+    }
+    if turbo:
+        from turbo import turbo_options
+        opts.update(turbo_options())
+    opts.update(extra)
+    return opts
+
+
+def open_info_cache(data_dir=DATA_DIR, **settings):
+    """The extraction cache in data_dir (settings go to InfoCache)"""
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    return InfoCache(data_dir / 'info_cache.db', **settings)
+
+
+def unwrap_error(error):
+    """The exception that actually went wrong (yt-dlp wraps the original in DownloadError)"""
+    import yt_dlp
+
+    if isinstance(error, yt_dlp.utils.DownloadError) and error.exc_info and error.exc_info[1] is not None:
+        return error.exc_info[1]
+    return error
+
+
+def warm_up():
+    """
+    Load yt-dlp, its extractor list and the merger ahead of the first job
+    Nothing imports them at startup; a server calls this once it is listening
+    """
+    import merger  # noqa: F401 - yt-dlp itself and its postprocessors
+    import turbo  # noqa: F401
+    video_key('https://www.youtube.com/watch?v=jNQXAC9IVRw')  # Matching a URL loads the extractor classes
+
+
+def final_file_path(info):
+    """Path of the file yt-dlp produced (after merging), if it reported one"""
+    requested = info.get('requested_downloads') or []
+    if requested:
+        return requested[-1].get('filepath')
+    return info.get('filepath')
+
+
+class DownloadJob:
+    """
+    One video to download: its options, progress sinks and phase timings
+    Sinks are callables that get every yt-dlp progress report (UI updates, counters,
+    limits); the job itself knows nothing about the client running it
+    """
+    def __init__(self, url, save_path, quality=None, format_selector=None, turbo=False,
+                 sinks=(), profile=None, options=None):
+        self.url = url
+        self.save_path = save_path
+        self.format_selector = format_selector or format_for(quality)
+        self.turbo = turbo
+        self.sinks = list(sinks)
+        self.profile = profile or JobProfile(url)  # Phase timings (extract, download, merge)
+        self.options = options or {}  # Extra yt-dlp options on top of download_options
+        self.info = None  # yt-dlp's info dict once downloaded
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    @property
+    def title(self):
+        return (self.info or {}).get('title', 'video')
+
+    @property
+    def merge_pending(self):
+        """Downloaded as separate video and audio that merge() still has to put together"""
+        return self.info is not None and deferred_merge(self.info) is not None
+
+    def ydl_options(self):
+        return download_options(self.format_selector, self.save_path, self.sinks, self.turbo, **self.options)
+
+    def download(self, ydl_pool, info_cache, on_extracted=None):
+        """
+        Extract (through info_cache) and download on a pooled YoutubeDL; returns the info dict
+        Separate video and audio streams are left unmerged - call merge(), here or on another thread
+        """
+        with ydl_pool.borrow(self.ydl_options(), deferring(downloader_for(self.turbo))) as ydl:
+            self.info = cached_download(ydl, self.url, info_cache, self.profile, on_extracted)
+        return self.info
+
+    def merge(self, on_progress=None):
+        """
+        Merge the downloaded video and audio if they came separately
+        Returns how the audio was handled ('copy' or 'transcode'), None if there was nothing to merge
+        """
+        merge_info = deferred_merge(self.info)
+        if merge_info is None:
+            return None
+        with self.profile.phase('merge'):
+            return run_deferred(merge_info, on_progress)
+
+    def run(self, ydl_pool, info_cache, on_extracted=None):
+        """Download and merge; returns the final file's path"""
+        self.download(ydl_pool, info_cache, on_extracted)
+        self.merge()
+        return final_file_path(self.info)
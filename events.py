@@ -0,0 +1,33 @@
+"""
+Junay Progress Events
+Lets streaming clients sleep until some download's progress actually changes
+"""
+
+import threading
+
+
+class ChangeFeed:
+    """Version counter that readers can block on until it moves"""
+    def __init__(self):
+        self.version = 0
+        self._cond = threading.Condition()
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call callback() after every publish, on the publishing thread (keep it cheap)"""
+        self._listeners.append(callback)
+
+    def publish(self):
+        """Record a change and wake every waiting reader"""
+        with self._cond:
+            self.version += 1
+            self._cond.notify_all()
+
+        for listener in self._listeners:
+            listener()
+
+    def wait(self, since, timeout=None):
+        """Block until the version differs from `since` (or timeout); returns the current version"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != since, timeout)
+            return self.version
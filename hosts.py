@@ -0,0 +1,379 @@
+"""
+Junay Host Limits
+Per-host caps on open connections and on the rate new requests start, applied to
+every HTTP request yt-dlp makes (extraction, chunks, fragments). The caps adapt to
+how each host copes: cut back when it throttles or slows down, grown back a step at
+a time while it keeps up (AIMD), always within the configured ceilings
+"""
+
+import functools
+import os
+import threading
+import time
+
+from retry import NETWORK, THROTTLED, classify
+from scheduler import host_of
+
+# Ceilings for every host (override with JUNAY_HOST_CONNECTIONS / JUNAY_HOST_RATE); limits adapt below them
+MAX_CONNECTIONS = int(os.environ.get('JUNAY_HOST_CONNECTIONS', 32))
+MAX_RATE = float(os.environ.get('JUNAY_HOST_RATE', 50))  # New requests per second
+
+# Floors a struggling host is backed off to
+MIN_CONNECTIONS = 1
+MIN_RATE = 0.5
+
+# Pushback cuts the limits to this fraction: gentler than halving, so a host that is only
+# just over its limit keeps most of its throughput while it settles
+BACKOFF_FACTOR = 0.7
+
+# Requests per second added back for each window of healthy responses
+RATE_STEP = 1
+
+# A response counts as slow (the host struggling) when its headers take this many
+# times longer than the host's usual, and at least SLOW_SECONDS
+SLOW_FACTOR = 4
+SLOW_SECONDS = 2
+
+# Requests already in flight when a host pushes back fail together; cut once for the lot
+DECREASE_INTERVAL = 2
+
+# Longest Retry-After honoured (seconds); the job-level retry handles longer waits
+MAX_RETRY_AFTER = 60
+
+# A connection whose response nobody has read from for this long is taken back (an
+# abandoned response still referenced somewhere); waiters check every STALE_CHECK seconds
+STALE_SECONDS = 120
+STALE_CHECK = 10
+
+# Idle hosts are forgotten once more than this many are known
+MAX_HOSTS = 256
+IDLE_SECONDS = 600
+
+
+def parse_ceilings(data):
+    """
+    (max_connections, max_rate) from an API request; a missing or null one stays as it is
+    Raises ValueError with a readable message
+    """
+    max_connections, max_rate = data.get('max_connections'), data.get('max_rate')
+    if max_connections is not None and (
+        isinstance(max_connections, bool) or not isinstance(max_connections, int) or max_connections < 1
+    ):
+        raise ValueError('max_connections must be a whole number of at least 1')
+    if max_rate is not None and (
+        isinstance(max_rate, bool) or not isinstance(max_rate, (int, float)) or max_rate < MIN_RATE
+    ):
+        raise ValueError(f'max_rate must be a number of requests per second, at least {MIN_RATE}')
+    return max_connections, max_rate
+
+
+class HostLimit:
+    """One host's current limits, its ceilings and what it is doing now"""
+    def __init__(self, host, max_connections, max_rate):
+        self.host = host
+        self.max_connections = max_connections
+        self.max_rate = max_rate
+        self.connections = float(max_connections)  # Adaptive cap on open connections (whole numbers count)
+        self.rate = float(max_rate)  # Adaptive requests per second
+        self.tokens = self.rate  # Token bucket: a second's worth of requests (at least one) can start at once
+        self.refilled_at = time.monotonic()
+        self.blocked_until = 0  # Retry-After: no new requests before this
+        self.open = 0  # Connections open right now
+        self.tickets = set()  # Their HostTickets
+        self.holders = {}  # Thread ident -> connections it has open
+        self.latency = None  # Smoothed seconds to response headers, healthy responses only
+        self.healthy = 0  # Healthy responses since the last step up
+        self.decreased_at = 0
+        self.last_used = time.monotonic()
+
+        # Counters for the status endpoint
+        self.requests = 0
+        self.throttled = 0
+        self.slow = 0
+        self.decreases = 0
+        self.reclaimed = 0
+
+    def wait_time(self, now, thread):
+        """Seconds until a request can start (0 = now), None to wait for a connection to close"""
+        self.tokens = min(max(self.rate, 1), self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        # A thread that already holds a connection here may open another (a request made
+        # while reading a response); making it wait on itself would never end
+        if self.open >= int(self.connections) and not self.holders.get(thread):
+            return None
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        return 0
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'connections': int(self.connections),
+            'max_connections': self.max_connections,
+            'rate': round(self.rate, 2),
+            'max_rate': self.max_rate,
+            'open': self.open,
+            'blocked_for': round(self.blocked_until - now, 1) if self.blocked_until > now else None,
+            'latency': None if self.latency is None else round(self.latency, 3),
+            'requests': self.requests,
+            'throttled': self.throttled,
+            'slow': self.slow,
+            'decreases': self.decreases,
+            'reclaimed': self.reclaimed,
+        }
+
+
+class HostTicket:
+    """One request's connection slot: report how the host answered, release once the response is done"""
+    __slots__ = ('limiter', 'limit', 'thread', 'started', 'active_at', 'released')
+
+    def __init__(self, limiter, limit, thread):
+        self.limiter = limiter
+        self.limit = limit
+        self.thread = thread
+        self.started = self.active_at = time.monotonic()
+        self.released = False
+
+    def answered(self):
+        """The host sent response headers"""
+        self.limiter._record(self.limit, time.monotonic() - self.started)
+
+    def failed(self, error):
+        """The request failed; throttling and network trouble count against the host"""
+        self.limiter._record(self.limit, time.monotonic() - self.started, error)
+        self.release()
+
+    def release(self):
+        if not self.released:
+            self.limiter._release(self)
+
+
+class HeldResponse:
+    """
+    A response holding its connection slot until it is read to the end, closed or dropped
+    A wrapper rather than patched methods: nothing refers back to it, so dropping it
+    frees the slot straight away instead of whenever the cycle collector runs
+    """
+    __slots__ = ('_response', '_ticket')
+
+    def __init__(self, response, ticket):
+        self._response = response
+        self._ticket = ticket
+
+    def read(self, amt=None):
+        self._ticket.active_at = time.monotonic()
+        try:
+            data = self._response.read(amt)
+        except Exception:
+            self._ticket.release()
+            raise
+        if not data or amt is None or amt < 0:
+            self._ticket.release()
+        return data
+
+    def close(self):
+        self._ticket.release()
+        self._response.close()
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)  # url, headers, status, get_header...
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return iter(self._response)
+
+    def __del__(self):
+        self._ticket.release()
+
+
+class HostLimiter:
+    """Adaptive connection and request rate limits, one set per host"""
+    def __init__(self, max_connections=MAX_CONNECTIONS, max_rate=MAX_RATE):
+        self.max_connections = max_connections  # Ceilings for hosts without their own
+        self.max_rate = max_rate
+        self._cond = threading.Condition()
+        self._hosts = {}  # host -> HostLimit
+        self._ceilings = {}  # host -> (max_connections, max_rate) set through the API
+
+    def acquire(self, url):
+        """Wait until a request to url's host may start; returns its HostTicket"""
+        host = host_of(url)
+        thread = threading.get_ident()
+        with self._cond:
+            limit = self._host(host)
+            while True:
+                wait = limit.wait_time(time.monotonic(), thread)
+                if wait == 0:
+                    break
+                # Waiting on a connection to close: wake now and then to take back abandoned ones
+                self._cond.wait(STALE_CHECK if wait is None else wait)
+                self._reclaim_stale(limit)
+
+            ticket = HostTicket(self, limit, thread)
+            limit.tokens -= 1
+            limit.open += 1
+            limit.tickets.add(ticket)
+            limit.holders[thread] = limit.holders.get(thread, 0) + 1
+            limit.requests += 1
+            limit.last_used = time.monotonic()
+        return ticket
+
+    def _host(self, host):
+        """host's HostLimit, created on first use (caller holds the lock)"""
+        limit = self._hosts.get(host)
+        if limit is None:
+            if len(self._hosts) >= MAX_HOSTS:
+                self._forget_idle()
+            limit = HostLimit(host, *self._ceilings.get(host, (self.max_connections, self.max_rate)))
+            self._hosts[host] = limit
+        return limit
+
+    def _forget_idle(self):
+        cutoff = time.monotonic() - IDLE_SECONDS
+        for host, limit in list(self._hosts.items()):
+            if not limit.open and limit.last_used < cutoff and host not in self._ceilings:
+                del self._hosts[host]
+
+    def _record(self, limit, seconds, error=None):
+        """Adapt limit to one answer (AIMD): cut on throttling or slowness, step up after a healthy window"""
+        with self._cond:
+            now = time.monotonic()
+            if error is not None:
+                retry_class = classify(error)
+                if retry_class == THROTTLED:
+                    limit.throttled += 1
+                    retry_after = _retry_after(error)
+                    if retry_after:
+                        limit.blocked_until = max(limit.blocked_until, now + min(retry_after, MAX_RETRY_AFTER))
+                    self._decrease(limit, now)
+                elif retry_class == NETWORK:
+                    self._decrease(limit, now)
+                return  # Other errors (404, expired URLs) say nothing about load
+
+            if limit.latency is not None and seconds > max(SLOW_SECONDS, SLOW_FACTOR * limit.latency):
+                limit.slow += 1
+                self._decrease(limit, now)
+                return
+
+            limit.latency = seconds if limit.latency is None else 0.8 * limit.latency + 0.2 * seconds
+            limit.healthy += 1
+            if limit.healthy >= limit.connections:
+                limit.healthy = 0
+                limit.connections = min(limit.max_connections, limit.connections + 1)
+                limit.rate = min(limit.max_rate, limit.rate + RATE_STEP)
+                self._cond.notify_all()
+
+    def _decrease(self, limit, now):
+        if now - limit.decreased_at < DECREASE_INTERVAL:
+            return
+        limit.decreased_at = now
+        limit.decreases += 1
+        limit.healthy = 0
+        limit.connections = max(MIN_CONNECTIONS, limit.connections * BACKOFF_FACTOR)
+        limit.rate = max(MIN_RATE, limit.rate * BACKOFF_FACTOR)
+        limit.tokens = min(limit.tokens, 1)  # No burst straight after pushback
+
+    def _release(self, ticket):
+        with self._cond:
+            if ticket.released:
+                return
+            ticket.released = True
+            limit = ticket.limit
+            limit.open -= 1
+            limit.tickets.discard(ticket)
+            limit.holders[ticket.thread] -= 1
+            if not limit.holders[ticket.thread]:
+                del limit.holders[ticket.thread]
+            self._cond.notify_all()
+
+    def _reclaim_stale(self, limit):
+        """Release limit's connections nobody has read from in STALE_SECONDS (caller holds the lock)"""
+        cutoff = time.monotonic() - STALE_SECONDS
+        for ticket in list(limit.tickets):
+            if ticket.active_at < cutoff:
+                limit.reclaimed += 1
+                self._release(ticket)  # The lock is reentrant
+
+    def set_ceilings(self, host=None, max_connections=None, max_rate=None):
+        """
+        Change the ceilings for host, or with host None the defaults for every host without its own
+        Current limits above a new ceiling come down to it; lower ones grow back to it as usual
+        """
+        with self._cond:
+            if host is None:
+                self.max_connections = max_connections or self.max_connections
+                self.max_rate = max_rate or self.max_rate
+                limits = [limit for name, limit in self._hosts.items() if name not in self._ceilings]
+                ceilings = (self.max_connections, self.max_rate)
+            else:
+                host = host_of(f'//{host}')
+                current = self._ceilings.get(host, (self.max_connections, self.max_rate))
+                ceilings = (max_connections or current[0], max_rate or current[1])
+                self._ceilings[host] = ceilings
+                limits = [self._host(host)]
+
+            for limit in limits:
+                limit.max_connections, limit.max_rate = ceilings
+                limit.connections = min(limit.connections, limit.max_connections)
+                limit.rate = min(limit.rate, limit.max_rate)
+            self._cond.notify_all()
+        return ceilings
+
+    def ceilings(self):
+        """[(host, max_connections, max_rate)]: the defaults first (host None), then hosts with their own"""
+        with self._cond:
+            return [(None, self.max_connections, self.max_rate)] + [
+                (host, max_connections, max_rate) for host, (max_connections, max_rate) in self._ceilings.items()
+            ]
+
+    def stats(self):
+        """Ceilings and each host's current limits, busiest first"""
+        with self._cond:
+            hosts = sorted(self._hosts.values(), key=lambda limit: (-limit.open, -limit.last_used))
+            return {
+                'max_connections': self.max_connections,
+                'max_rate': self.max_rate,
+                'hosts': {limit.host: limit.stats() for limit in hosts},
+            }
+
+
+def _retry_after(error):
+    """Seconds from a throttled response's Retry-After header, if it gave a number"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+# Every YoutubeDL in this process shares it (worker processes have their own, see workers.py)
+limiter = HostLimiter()
+
+
+class HostLimitedMixin:
+    """YoutubeDL mixin sending each request through the process's HostLimiter"""
+
+    def urlopen(self, req):
+        url = req if isinstance(req, str) else getattr(req, 'url', None) or req.get_full_url()
+        ticket = limiter.acquire(url)
+        try:
+            response = super().urlopen(req)
+        except Exception as e:
+            ticket.failed(e)
+            raise
+        ticket.answered()
+        return HeldResponse(response, ticket)
+
+
+@functools.lru_cache(maxsize=None)
+def host_limited(downloader):
+    """The YoutubeDL class (or subclass such as TurboYoutubeDL) with per-host limits"""
+    return type(f'HostLimited{downloader.__name__}', (HostLimitedMixin, downloader), {})
@@ -0,0 +1,225 @@
+"""
+Junay Metadata Cache
+Persistent SQLite cache of yt-dlp extraction results, keyed by video ID
+Lets repeat and multi-quality requests skip the page/player/format round trips
+"""
+
+import functools
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+
+@functools.lru_cache(maxsize=4096)
+def find_extractor(url):
+    """The site-specific yt-dlp extractor class for a URL, or None if only the generic one fits"""
+    from yt_dlp.extractor import gen_extractor_classes
+
+    for ie in gen_extractor_classes():
+        if ie.ie_key() == 'Generic':
+            continue
+        if ie.suitable(url):
+            return ie
+    return None
+
+
+def video_key(url):
+    """Canonical cache key for a URL (extractor + video ID), so URL variants share one entry"""
+    ie = find_extractor(url)
+    if ie is not None:
+        video_id = ie.get_temp_id(url)
+        if video_id:
+            return f"{ie.ie_key()}:{video_id}"
+
+    # Unknown site - the URL itself is the best key we have
+    return url
+
+
+def format_expiry(info, default_ttl, margin=300):
+    """
+    When cached info stops being usable
+    Signed format URLs (YouTube's expire=...) die first; otherwise use default_ttl
+    """
+    now = time.time()
+    expires_at = now + default_ttl
+
+    for fmt in info.get('formats') or []:
+        expire = parse_qs(urlparse(fmt.get('url') or '').query).get('expire')
+        if expire and expire[0].isdigit():
+            # Stop serving the entry a little before the URLs actually expire
+            expires_at = min(expires_at, int(expire[0]) - margin)
+
+    return expires_at
+
+
+class InfoCache:
+    """
+    SQLite-backed extraction cache with a TTL per entry and LRU eviction by total size
+    Safe to share between worker threads
+    """
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, default_ttl=3600):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+
+        # Counters for the stats endpoint
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                info TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def get(self, key):
+        """Cached info dict for key, or None on a miss"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT info, expires_at FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            if row[1] <= time.time():
+                # Format URLs are stale - the entry is useless now
+                self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._conn.commit()
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                'UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key)
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(row[0])
+
+    def put(self, key, info):
+        """Store an (already sanitized) info dict and evict old entries if over budget"""
+        data = json.dumps(info)
+        now = time.time()
+        expires_at = format_expiry(info, self.default_ttl)
+
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (key, info, size, expires_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, data, len(data), expires_at, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def invalidate(self, key):
+        """Drop one entry (e.g. its format URLs were rejected early)"""
+        with self._lock:
+            self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._conn.commit()
+
+    def _evict(self):
+        """Remove least recently used entries until under max_bytes (caller holds the lock)"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute('SELECT key, size FROM entries ORDER BY last_access').fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total -= size
+            self.evicted += 1
+
+    def extract(self, ydl, url):
+        """
+        Info for url via the cache, running ydl.extract_info only on a miss
+        Returns (info, cached) - pass info to ydl.process_ie_result to download
+        """
+        return extract_cached(self, ydl, url)
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+            ).fetchone()
+
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'evicted': self.evicted,
+            'hit_rate': self.hits / lookups if lookups else 0,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+        }
+
+
+def extract_cached(cache, ydl, url):
+    """InfoCache.extract for anything with get(key) and put(key, info) - a worker process's view of the cache too"""
+    key = video_key(url)
+    info = cache.get(key)
+    if info is not None:
+        return info, True
+
+    # Raw extraction only - format selection happens per download, so any quality can reuse it
+    info = ydl.extract_info(url, download=False, process=False)
+
+    # Playlists and redirects are huge or incomplete; only single videos are cached
+    if info.get('_type', 'video') != 'video':
+        return info, False
+
+    info = ydl.sanitize_info(info, remove_private_keys=True)
+    cache.put(key, info)
+    return info, False
+
+
+def cached_download(ydl, url, cache, phases, on_extracted=None):
+    """
+    Download url, reusing cached extraction results when cache has them
+    The extract and download phases are timed on phases (a JobProfile);
+    on_extracted(seconds, cached) is called after every extraction
+    """
+    from yt_dlp.utils import DownloadError
+
+    def extract():
+        started = time.perf_counter()
+        info, cached = cache.extract(ydl, url)
+        if on_extracted is not None:
+            on_extracted(time.perf_counter() - started, cached)
+        return info, cached
+
+    with phases.phase('extract'):
+        info, cached = extract()
+
+    try:
+        with phases.phase('download'):
+            return ydl.process_ie_result(info, download=True)
+    except DownloadError:
+        if not cached:
+            raise
+
+        # Format URLs can be revoked before they expire - extract fresh and try once more
+        cache.invalidate(video_key(url))
+        with phases.phase('extract'):
+            info, _ = extract()
+        with phases.phase('download'):
+            return ydl.process_ie_result(info, download=True)
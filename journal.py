@@ -0,0 +1,127 @@
+"""
+Junay Job Journal
+Write-ahead SQLite record of every download so a restart can pick up where it left off
+yt-dlp continues from the .part files on its own once the same job runs again
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+# Statuses that mean the job is done and should not be resumed
+FINISHED_STATUSES = ('completed', 'error')
+
+
+class JobJournal:
+    """Persistent job table: parameters, last known status and partial files"""
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')  # WAL keeps this crash-safe
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                download_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                quality TEXT NOT NULL,
+                save_path TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                turbo INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                part_files TEXT NOT NULL DEFAULT '[]',
+                title TEXT,
+                file_path TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        self._add_missing_columns()
+        self._conn.commit()
+
+    def _add_missing_columns(self):
+        """Bring a journal written by an older version up to the current table"""
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+        if 'turbo' not in columns:
+            self._conn.execute('ALTER TABLE jobs ADD COLUMN turbo INTEGER NOT NULL DEFAULT 0')
+
+    def add(self, download_id, url, quality, save_path, priority=0, turbo=False):
+        """Record a newly queued job (a resumed job keeps its history and part files)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO jobs '
+                '(download_id, url, quality, save_path, priority, turbo, status, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(download_id) DO UPDATE SET status = excluded.status, '
+                'updated_at = excluded.updated_at',
+                (download_id, url, quality, save_path, priority, int(turbo), 'queued', now, now)
+            )
+            self._conn.commit()
+
+    def set_status(self, download_id, status, **fields):
+        """Record a status change, plus any of title / file_path / error"""
+        columns = {key: fields[key] for key in ('title', 'file_path', 'error') if key in fields}
+        assignments = ''.join(f', {key} = ?' for key in columns)
+
+        with self._lock:
+            self._conn.execute(
+                f'UPDATE jobs SET status = ?, updated_at = ?{assignments} WHERE download_id = ?',
+                (status, time.time(), *columns.values(), download_id)
+            )
+            self._conn.commit()
+
+    def add_part_file(self, download_id, path):
+        """Remember a partial file being written for a job"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT part_files FROM jobs WHERE download_id = ?', (download_id,)
+            ).fetchone()
+            if row is None:
+                return
+
+            part_files = json.loads(row[0])
+            if path not in part_files:
+                part_files.append(path)
+                self._conn.execute(
+                    'UPDATE jobs SET part_files = ?, updated_at = ? WHERE download_id = ?',
+                    (json.dumps(part_files), time.time(), download_id)
+                )
+                self._conn.commit()
+
+    def part_file_hook(self, download_id):
+        """yt-dlp progress hook that records each .part file the first time it appears"""
+        seen = set()
+
+        def hook(d):
+            path = d.get('tmpfilename')
+            if d.get('status') == 'downloading' and path and path not in seen:
+                seen.add(path)
+                self.add_part_file(download_id, path)
+
+        return hook
+
+    def interrupted(self):
+        """Jobs that were queued or running when the process stopped, oldest first"""
+        placeholders = ', '.join('?' for _ in FINISHED_STATUSES)
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT download_id, url, quality, save_path, priority, turbo, part_files FROM jobs '
+                f'WHERE status NOT IN ({placeholders}) ORDER BY created_at',
+                FINISHED_STATUSES
+            ).fetchall()
+
+        return [
+            {
+                'download_id': download_id,
+                'url': url,
+                'quality': quality,
+                'save_path': save_path,
+                'priority': priority,
+                'turbo': bool(turbo),
+                'part_files': json.loads(part_files),
+            }
+            for download_id, url, quality, save_path, priority, turbo, part_files in rows
+        ]
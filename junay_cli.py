@@ -0,0 +1,362 @@
+"""
+Junay CLI
+Headless downloader for scripts and worker nodes: URLs come from the command line,
+from files or on stdin, and download a few at a time with the same engine, caches
+and merge pool as the web app. Loads no web or GUI code
+
+    python junay_cli.py URL [URL...] [-i urls.txt] [--jobs 3] [--quality 1080p] [--json]
+    some-command | python junay_cli.py --save-path ~/Videos
+
+Finished files are listed on stdout (a live status line goes to stderr on a terminal);
+--json prints one JSON event per line instead. Exits 0 when every download succeeded,
+1 when any failed, 2 on bad arguments
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+from batch import expand_urls, split_urls
+from engine import DATA_DIR, QUALITY_MAP, DownloadJob, final_file_path, open_info_cache, unwrap_error
+from info_cache import video_key
+from postprocess import PostProcessingPool
+from progress import ProgressAggregator
+from retry import EXPIRED, classify, retry_delay
+from scheduler import DownloadScheduler
+from ydl_pool import YoutubeDLPool
+
+# yt-dlp's own console output would tangle with ours; errors still reach stderr
+QUIET_OPTIONS = {'quiet': True, 'no_warnings': True, 'noprogress': True}
+
+# Status line redraws at most this often (seconds)
+STATUS_INTERVAL = 0.2
+
+EXIT_OK, EXIT_FAILED, EXIT_USAGE, EXIT_INTERRUPTED = 0, 1, 2, 130
+
+
+class CliJob:
+    """One video of the run and what became of it"""
+    def __init__(self, number, url):
+        self.number = number
+        self.url = url
+        self.status = 'queued'  # queued -> downloading -> merging -> done / failed
+        self.title = ''
+        self.percent = None
+        self.speed = None  # Bytes/second, smoothed
+        self.eta = None
+        self.file_path = None
+        self.error = None
+        self.error_class = None
+        self.retries = 0  # Failed attempts queued again
+        self.retry_class = None  # How the last attempt failed (see retry.py)
+        self.retry_in = None  # Backoff before the next attempt, while retrying
+        self.aggregator = ProgressAggregator()
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def as_dict(self):
+        return {
+            'id': self.number,
+            'url': self.url,
+            'status': self.status,
+            'title': self.title,
+            'percent': None if self.percent is None else round(self.percent, 1),
+            'speed': None if self.speed is None else round(self.speed),
+            'eta': self.eta,
+            'file': self.file_path,
+            'error': self.error,
+            'error_class': self.error_class,
+            'retries': self.retries,
+            'retry_class': self.retry_class,
+            'retry_in': self.retry_in,
+        }
+
+
+class Run:
+    """All the jobs of one invocation: downloads on the scheduler, merges on the merge pool"""
+    def __init__(self, args, reporter):
+        self.args = args
+        self.reporter = reporter
+        self.scheduler = DownloadScheduler(max_workers=args.jobs, max_per_host=args.per_host)
+        self.postprocessor = PostProcessingPool(max_workers=args.merge_workers)
+        self.ydl_pool = YoutubeDLPool(max_idle=args.jobs)
+        self.info_cache = open_info_cache(args.data_dir)
+
+        self.jobs = []
+        self.expanded = False  # Every input URL has been read and expanded
+        self._cond = threading.Condition()
+
+    def feed(self, urls):
+        """Queue every video behind urls (playlists expand lazily, stdin is read as it arrives)"""
+        try:
+            for url in expand_urls(urls):
+                self.add(url)
+        finally:
+            with self._cond:
+                self.expanded = True
+                self._cond.notify_all()
+
+    def add(self, url):
+        with self._cond:
+            job = CliJob(len(self.jobs) + 1, url)
+            self.jobs.append(job)
+        self.reporter.event(self, job, 'queued')
+        self.scheduler.submit(job.number, self.download, args=(job,), url=url)
+
+    def download(self, job):
+        """Download stage (scheduler thread); a pending merge goes to the merge pool to free the slot"""
+        job.retry_in = None
+        def progress_hook(d):
+            snapshot = job.aggregator.feed(d)
+            if snapshot is None:
+                return
+            if not job.title:
+                job.title = (d.get('info_dict') or {}).get('title', '')
+            job.status = 'downloading'
+            job.percent, job.speed, job.eta = snapshot['percent'], snapshot['speed'], snapshot['eta']
+            self.reporter.event(self, job, 'progress')
+
+        engine_job = DownloadJob(
+            job.url, self.args.save_path, format_selector=self.args.quality, turbo=self.args.turbo,
+            sinks=[progress_hook], options=QUIET_OPTIONS
+        )
+        try:
+            engine_job.download(self.ydl_pool, self.info_cache)
+            job.title = engine_job.title
+            if engine_job.merge_pending:
+                job.status, job.percent, job.speed, job.eta = 'merging', 0, None, None
+                self.reporter.event(self, job, 'merging')
+                self.postprocessor.submit(self.merge, args=(job, engine_job))
+                return
+            self.finish(job, engine_job)
+        except Exception as e:
+            if not self.retry(job, e):
+                self.fail(job, e)
+
+    def retry(self, job, error):
+        """Queue the job again after a backoff if its failure is worth another try; False if not"""
+        if self.args.retries is not None and job.retries >= self.args.retries:
+            return False
+        retry_class = classify(error)
+        delay = retry_delay(retry_class, job.retries + 1)
+        if delay is None:
+            return False
+        if retry_class == EXPIRED:
+            self.info_cache.invalidate(video_key(job.url))
+        job.retries += 1
+        job.retry_in = round(delay, 1)
+        job.error, job.error_class, job.retry_class = str(error), type(unwrap_error(error)).__name__, retry_class
+        job.status, job.percent, job.speed, job.eta = 'queued', None, None, None
+        job.aggregator = ProgressAggregator()
+        self.reporter.event(self, job, 'retrying')
+        self.scheduler.submit(job.number, self.download, args=(job,), url=job.url, delay=delay)
+        return True
+
+    def merge(self, job, engine_job):
+        """Merge stage (merge pool thread)"""
+        def on_progress(percent):
+            job.percent = percent
+            self.reporter.event(self, job, 'progress')
+
+        try:
+            engine_job.merge(on_progress)
+            self.finish(job, engine_job)
+        except Exception as e:
+            self.fail(job, e)
+
+    def finish(self, job, engine_job):
+        job.file_path = final_file_path(engine_job.info)
+        job.percent = 100
+        self._close(job, 'done')
+
+    def fail(self, job, error):
+        job.error = str(error)
+        job.error_class = type(unwrap_error(error)).__name__
+        job.retry_class = classify(error)
+        self._close(job, 'failed')
+
+    def _close(self, job, status):
+        job.status = status
+        job.aggregator = None
+        self.reporter.event(self, job, status)
+        with self._cond:
+            self._cond.notify_all()
+
+    def wait(self, timeout):
+        """True once every URL is read and every job finished"""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self.expanded and all(job.finished for job in self.jobs), timeout
+            )
+
+    def counts(self):
+        counts = {'queued': 0, 'downloading': 0, 'merging': 0, 'done': 0, 'failed': 0}
+        for job in list(self.jobs):
+            counts[job.status] += 1
+        return counts
+
+
+class JsonLinesReporter:
+    """One JSON object per line on stdout: queued, progress, retrying, merging, done, failed, then a summary"""
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self._lock = threading.Lock()
+
+    def _write(self, payload):
+        with self._lock:
+            self.out.write(json.dumps(payload) + '\n')
+            self.out.flush()
+
+    def event(self, run, job, kind):
+        self._write(dict(job.as_dict(), event=kind))
+
+    def close(self, run, interrupted=False):
+        self._write(dict(run.counts(), event='summary', interrupted=interrupted))
+
+
+class TextReporter:
+    """A line per finished job on stdout; on a terminal, a live status line on stderr as well"""
+    def __init__(self, out=sys.stdout, status=sys.stderr):
+        self.out = out
+        self.status = status
+        self.live = status.isatty()
+        self._lock = threading.Lock()
+        self._drawn = 0  # Width of the status line on screen
+        self._last_draw = 0
+
+    def event(self, run, job, kind):
+        with self._lock:
+            if kind in ('done', 'failed'):
+                self._clear()
+                if kind == 'done':
+                    self.out.write(f"{job.file_path or job.title}\n")
+                else:
+                    self.status.write(f"failed: {job.url}: {job.error}\n")
+                self.out.flush()
+            elif kind == 'retrying':
+                self._clear()
+                self.status.write(f"retrying in {job.retry_in:.0f}s ({job.retry_class}): {job.url}: {job.error}\n")
+            elif not self.live or time.monotonic() - self._last_draw < STATUS_INTERVAL:
+                return
+            if self.live:
+                self._draw(run)
+
+    def _draw(self, run):
+        counts = run.counts()
+        active = [job for job in list(run.jobs) if job.status in ('downloading', 'merging')]
+        speed = sum(job.speed or 0 for job in active if job.status == 'downloading')
+
+        line = f"[{counts['done'] + counts['failed']}/{len(run.jobs)}] {speed / 1_000_000:.2f} MB/s"
+        if counts['failed']:
+            line += f", {counts['failed']} failed"
+        for job in active:
+            percent = '' if job.percent is None else f" {job.percent:.0f}%"
+            verb = ' merging' if job.status == 'merging' else ''
+            line += f" | {(job.title or job.url)[:30]}{verb}{percent}"
+
+        width = shutil.get_terminal_size().columns - 1
+        line = line[:width]
+        self.status.write('\r' + line.ljust(self._drawn))
+        self.status.flush()
+        self._drawn = len(line)
+        self._last_draw = time.monotonic()
+
+    def _clear(self):
+        if self._drawn:
+            self.status.write('\r' + ' ' * self._drawn + '\r')
+            self._drawn = 0
+
+    def close(self, run, interrupted=False):
+        counts = run.counts()
+        with self._lock:
+            self._clear()
+            summary = f"{counts['done']} downloaded, {counts['failed']} failed"
+            if interrupted:
+                summary += f", {len(run.jobs) - counts['done'] - counts['failed']} interrupted"
+            self.status.write(summary + '\n')
+
+
+def input_urls(urls, files):
+    """URLs from the arguments, then from each file ('-' reads stdin); lines starting with # are skipped"""
+    for url in urls:
+        if url == '-':
+            yield from _read_urls(sys.stdin)
+        else:
+            yield url
+    for path in files:
+        if path == '-':
+            yield from _read_urls(sys.stdin)
+        else:
+            with open(path, encoding='utf-8') as f:
+                yield from _read_urls(f)
+
+
+def _read_urls(lines):
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield from split_urls(line)
+
+
+def quality_format(value):
+    """--quality: a quality name or the start of one ('1080p', 'best')"""
+    for name, selector in QUALITY_MAP.items():
+        if name.lower().startswith(value.lower()):
+            return selector
+    raise argparse.ArgumentTypeError(f"unknown quality {value!r} (choose from: {', '.join(QUALITY_MAP)})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('urls', nargs='*', help="video or playlist URLs ('-' reads them from stdin)")
+    parser.add_argument('-i', '--input', action='append', default=[], metavar='FILE',
+                        help="file of URLs, one per line ('-' for stdin); repeatable")
+    parser.add_argument('-o', '--save-path', default='.', help='where files go (default: current folder)')
+    parser.add_argument('-q', '--quality', type=quality_format, default='2160p',
+                        help='2160p, 1440p, 1080p, 720p or best (default 2160p)')
+    parser.add_argument('-j', '--jobs', type=int, default=3, help='downloads at once (default 3)')
+    parser.add_argument('--per-host', type=int, default=2, help='downloads at once from one site (default 2)')
+    parser.add_argument('--merge-workers', type=int, help='ffmpeg merges at once (default: CPU cores)')
+    parser.add_argument('--retries', type=int, metavar='N',
+                        help='retries per video at most (default: by failure, up to 5 when throttled; 0 turns them off)')
+    parser.add_argument('--turbo', action='store_true', help='parallel connections per download')
+    parser.add_argument('--json', action='store_true', help='JSON lines progress on stdout')
+    parser.add_argument('--data-dir', default=str(DATA_DIR), help='where the video info cache lives')
+    args = parser.parse_args(argv)
+
+    if not args.urls and not args.input:
+        if sys.stdin.isatty():
+            parser.error('no URLs given (pass them as arguments, with --input, or on stdin)')
+        args.input = ['-']
+    for path in args.input:
+        if path != '-' and not os.path.isfile(path):
+            parser.error(f'no such file: {path}')
+    if args.jobs < 1 or args.per_host < 1:
+        parser.error('--jobs and --per-host must be at least 1')
+
+    reporter = JsonLinesReporter() if args.json else TextReporter()
+    run = Run(args, reporter)
+    threading.Thread(target=run.feed, args=(input_urls(args.urls, args.input),), name='junay-input', daemon=True).start()
+
+    try:
+        while not run.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        # Running downloads stop with the process; rerunning resumes their .part files
+        reporter.close(run, interrupted=True)
+        return EXIT_INTERRUPTED
+
+    reporter.close(run)
+    if not run.jobs:
+        return EXIT_USAGE
+    return EXIT_FAILED if any(job.status == 'failed' for job in run.jobs) else EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,16 +6,22 @@ Built with CustomTkinter for a flashy, modern UI
 
 import customtkinter as ctk
 import threading
-import os
+import queue
 from tkinter import filedialog, messagebox
 from pathlib import Path
-import yt_dlp
+from progress import ProgressAggregator
+from ydl_pool import YoutubeDLPool
+from engine import DownloadJob, format_for, open_info_cache
+from batch import expand_urls, split_urls
 import sys
 
 # Configure CustomTkinter appearance
 ctk.set_appearance_mode("dark")  # Force dark mode for beautiful iOS-like design
 ctk.set_default_color_theme("blue")  # Will override with custom purple colors
 
+# How often the main loop picks up progress from the download thread
+UI_PUMP_INTERVAL_MS = 100
+
 
 class JunayDownloader(ctk.CTk):
     """Main application class for the YouTube downloader"""
@@ -25,16 +31,35 @@ class JunayDownloader(ctk.CTk):
 
         # Window configuration
         self.title("Junay 4K Downloader")
-        self.geometry("800x600")
+        self.geometry("800x640")
         self.resizable(False, False)
 
         # State variables
         self.download_path = str(Path.home() / "Downloads")  # Default to user's Downloads folder
         self.is_downloading = False
 
+        # Progress handed from the download thread to the Tk main loop
+        self.aggregator = ProgressAggregator()
+        self.latest_progress = None
+        self.ui_events = queue.Queue()
+
+        # Videos in a batch reuse one warm YoutubeDL per settings combination
+        self.ydl_pool = YoutubeDLPool(max_idle=1)
+
+        # Video info cache, shared with the web app's (a retry or a re-download skips extraction)
+        self.info_cache = open_info_cache()
+
+        # Batch state: URLs added while a batch runs, and which video we're on
+        self.pending_urls = queue.Queue()
+        self.batch_index = 0
+        self.batch_size = 0
+
         # Build the UI
         self.setup_ui()
 
+        # Single pump that applies download updates on the main loop
+        self.after(UI_PUMP_INTERVAL_MS, self.pump_ui)
+
         # Force update for macOS compatibility
         self.update_idletasks()
 
@@ -124,7 +149,19 @@ class JunayDownloader(ctk.CTk):
             button_hover_color=PURPLE_HOVER,
             text_color=TEXT_PRIMARY
         )
-        self.quality_menu.pack(fill="x", padx=24, pady=(0, 20))
+        self.quality_menu.pack(fill="x", padx=24, pady=(0, 12))
+
+        # Turbo mode toggle - parallel connections for DASH/HLS and split video/audio
+        self.turbo_var = ctk.BooleanVar(value=False)
+        self.turbo_switch = ctk.CTkSwitch(
+            quality_frame,
+            text="Turbo mode (parallel connections)",
+            variable=self.turbo_var,
+            font=ctk.CTkFont(size=12),
+            text_color=TEXT_SECONDARY,
+            progress_color=PURPLE_PRIMARY
+        )
+        self.turbo_switch.pack(anchor="w", padx=24, pady=(0, 20))
 
         # Download Location Section - Smooth card
         location_frame = ctk.CTkFrame(main_frame, corner_radius=16, fg_color=CARD_BG)
@@ -229,103 +266,173 @@ class JunayDownloader(ctk.CTk):
 
     def get_format_selector(self):
         """Convert quality selection to yt-dlp format string"""
-        quality = self.quality_var.get()
-
-        # Map quality options to yt-dlp format selectors
-        # This ensures we get the best video+audio combination for selected quality
-        quality_map = {
-            "2160p (4K)": "bestvideo[height<=2160]+bestaudio/best[height<=2160]",
-            "1440p (2K)": "bestvideo[height<=1440]+bestaudio/best[height<=1440]",
-            "1080p (Full HD)": "bestvideo[height<=1080]+bestaudio/best[height<=1080]",
-            "720p (HD)": "bestvideo[height<=720]+bestaudio/best[height<=720]",
-            "Best Available": "bestvideo+bestaudio/best"
-        }
-
-        return quality_map.get(quality, "bestvideo+bestaudio/best")
+        return format_for(self.quality_var.get())
 
     def progress_hook(self, d):
-        """Callback function to update progress bar during download"""
-        if d['status'] == 'downloading':
-            # Extract progress percentage from yt-dlp
-            if 'downloaded_bytes' in d and 'total_bytes' in d:
-                percent = d['downloaded_bytes'] / d['total_bytes']
+        """
+        Callback from yt-dlp (runs on the download thread)
+        Only records the latest throttled snapshot - pump_ui draws it on the main loop
+        """
+        snapshot = self.aggregator.feed(d)
+        if snapshot is not None:
+            self.latest_progress = snapshot
+
+    def pump_ui(self):
+        """Apply pending download updates to the widgets (always runs on the Tk main loop)"""
+        snapshot, self.latest_progress = self.latest_progress, None
+
+        if snapshot is not None and self.is_downloading:
+            # In a batch, say which video this is
+            prefix = f"Video {self.batch_index}: " if self.batch_index > 1 or self.batch_size > 1 else ""
+
+            if snapshot['status'] == 'downloading' and snapshot['percent'] is not None:
+                percent = snapshot['percent'] / 100
                 self.progress_bar.set(percent)
 
-                # Update status text with download info
-                speed = d.get('speed', 0)
-                eta = d.get('eta', 0)
-                if speed:
-                    speed_mb = speed / 1_000_000  # Convert to MB/s
+                # Update status text with smoothed download info
+                if snapshot['speed']:
+                    speed_mb = snapshot['speed'] / 1_000_000  # Convert to MB/s
+                    eta = snapshot['eta'] if snapshot['eta'] is not None else '?'
                     self.progress_label.configure(
-                        text=f"Downloading... {percent*100:.1f}% | {speed_mb:.2f} MB/s | ETA: {eta}s"
+                        text=f"{prefix}Downloading... {percent*100:.1f}% | {speed_mb:.2f} MB/s | ETA: {eta}s"
                     )
                 else:
-                    self.progress_label.configure(text=f"Downloading... {percent*100:.1f}%")
-
-        elif d['status'] == 'finished':
-            self.progress_bar.set(1.0)
-            self.progress_label.configure(text="Processing... (merging video & audio)")
-
-    def download_video(self):
-        """Main download function (runs in separate thread to avoid UI freezing)"""
-        url = self.url_entry.get().strip()
-
-        # Validate URL
-        if not url:
-            messagebox.showerror("Error", "Please enter a YouTube URL")
-            self.reset_ui()
+                    self.progress_label.configure(text=f"{prefix}Downloading... {percent*100:.1f}%")
+
+            elif snapshot['status'] == 'finished':
+                self.progress_bar.set(1.0)
+                self.progress_label.configure(text=f"{prefix}Processing... (merging video & audio)")
+
+        # Results posted by the download thread
+        while True:
+            try:
+                event, detail = self.ui_events.get_nowait()
+            except queue.Empty:
+                break
+
+            if event == 'batch_done':
+                self.show_batch_result(detail)
+                self.reset_ui()
+
+                # URLs added after the last one was picked up start a new batch
+                leftover = self.take_pending_urls()
+                if leftover:
+                    self.begin_batch(leftover)
+
+        self.after(UI_PUMP_INTERVAL_MS, self.pump_ui)
+
+    def show_batch_result(self, results):
+        """Tell the user how the batch went (results are (title, error) pairs)"""
+        failed = [(title, error) for title, error in results if error]
+
+        if len(results) == 1:
+            # Single video - same messages as always
+            title, error = results[0]
+            if error:
+                self.progress_label.configure(text="❌ Download Failed", text_color="red")
+                messagebox.showerror("Download Error", f"Failed to download video:\n\n{error}")
+            else:
+                self.progress_label.configure(text="✅ Download Complete!", text_color="green")
+                messagebox.showinfo(
+                    "Success",
+                    f"'{title}' downloaded successfully!\n\nSaved to: {self.download_path}"
+                )
             return
 
-        # Configure yt-dlp options
-        ydl_opts = {
-            'format': self.get_format_selector(),  # Quality selector
-            'outtmpl': os.path.join(self.download_path, '%(title)s.%(ext)s'),  # Output file naming
-            'progress_hooks': [self.progress_hook],  # Progress callback
-            'merge_output_format': 'mp4',  # Ensure output is mp4
-            'postprocessor_args': ['-c:v', 'copy', '-c:a', 'aac'],  # Fast merge with AAC audio
-        }
-
+        succeeded = len(results) - len(failed)
+        summary = f"{succeeded} of {len(results)} videos downloaded to: {self.download_path}"
+        if failed:
+            self.progress_label.configure(text="⚠️ Batch finished with errors", text_color="orange")
+            details = "\n".join(f"- {title}: {error}" for title, error in failed[:10])
+            messagebox.showwarning("Batch Finished", f"{summary}\n\nFailed:\n{details}")
+        else:
+            self.progress_label.configure(text="✅ Batch Complete!", text_color="green")
+            messagebox.showinfo("Success", summary)
+
+    def take_pending_urls(self):
+        """Drain URLs the user added while the batch was running"""
+        urls = []
+        while True:
+            try:
+                urls.append(self.pending_urls.get_nowait())
+            except queue.Empty:
+                return urls
+
+    def queued_urls(self, urls):
+        """The batch's own URLs, then any added while it runs (read lazily)"""
+        yield from urls
+        while True:
+            try:
+                yield self.pending_urls.get_nowait()
+            except queue.Empty:
+                return
+
+    def download_batch(self, urls, format_selector, turbo=False):
+        """Download every video behind urls, one after another (runs in separate thread)"""
+        results = []
+
+        # Playlists are expanded lazily - the first video starts before the list is complete
+        for index, video_url in enumerate(expand_urls(self.queued_urls(urls)), start=1):
+            self.batch_index = index
+            self.aggregator = ProgressAggregator()
+            results.append(self.download_video(video_url, format_selector, turbo))
+
+        # Tk widgets must only be touched from the main loop - hand the results over
+        self.ui_events.put(('batch_done', results))
+
+    def download_video(self, url, format_selector, turbo=False):
+        """Download one video (runs in separate thread to avoid UI freezing); returns (title, error)"""
+        # Same options, caching and merge handling as the web app
+        job = DownloadJob(url, self.download_path, format_selector=format_selector, turbo=turbo,
+                          sinks=[self.progress_hook])
         try:
-            # Download the video
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                video_title = info.get('title', 'video')
-
-            # Success notification
-            self.progress_label.configure(text="✅ Download Complete!", text_color="green")
-            messagebox.showinfo(
-                "Success",
-                f"'{video_title}' downloaded successfully!\n\nSaved to: {self.download_path}"
-            )
+            job.run(self.ydl_pool, self.info_cache)
+            return job.title, None
 
         except Exception as e:
-            # Error handling
-            self.progress_label.configure(text="❌ Download Failed", text_color="red")
-            messagebox.showerror("Download Error", f"Failed to download video:\n\n{str(e)}")
-
-        finally:
-            # Reset UI back to ready state
-            self.reset_ui()
+            return url, str(e)
 
     def start_download(self):
-        """Initiate download process in background thread"""
+        """Initiate download process in background thread (or add to the running batch)"""
+        # Several URLs (or playlist URLs) can be pasted at once
+        urls = split_urls(self.url_entry.get())
+
+        # Validate URL
+        if not urls:
+            messagebox.showerror("Error", "Please enter a YouTube URL")
+            return
+
         if self.is_downloading:
-            return  # Prevent multiple simultaneous downloads
+            # Already running - queue these behind the current batch
+            for url in urls:
+                self.pending_urls.put(url)
+            self.url_entry.delete(0, "end")
+            return
+
+        self.begin_batch(urls)
 
-        # Update UI to downloading state
+    def begin_batch(self, urls):
+        """Switch the UI to downloading and start a batch in the background"""
         self.is_downloading = True
-        self.download_btn.configure(state="disabled", text="DOWNLOADING...")
+        self.batch_index = 0
+        self.batch_size = len(urls)
+        self.latest_progress = None
+        self.download_btn.configure(text="➕  ADD TO QUEUE")
         self.progress_bar.set(0)
         self.progress_label.configure(text="Starting download...", text_color="gray70")
 
         # Run download in background thread to keep UI responsive
-        download_thread = threading.Thread(target=self.download_video, daemon=True)
+        download_thread = threading.Thread(
+            target=self.download_batch,
+            args=(urls, self.get_format_selector(), self.turbo_var.get()),
+            daemon=True
+        )
         download_thread.start()
 
     def reset_ui(self):
         """Reset UI elements back to initial state after download"""
         self.is_downloading = False
-        self.download_btn.configure(state="normal", text="⬇️  DOWNLOAD VIDEO")
+        self.download_btn.configure(text="⬇️  DOWNLOAD VIDEO")
         self.progress_bar.set(0)
         self.progress_label.configure(text="Ready to download", text_color="gray70")
 
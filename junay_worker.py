@@ -0,0 +1,229 @@
+"""
+Junay Worker
+Download worker for a Junay server in distributed mode (JUNAY_DISTRIBUTED=1):
+claims queued jobs over the server's API, downloads them on this machine and
+heartbeats progress back. Run as many as you like, on as many machines
+
+    python junay_worker.py --server http://10.0.0.5:5001 [--jobs 2] [--save-path /mnt/videos] [--token secret]
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from engine import DownloadJob, final_file_path, open_info_cache, unwrap_error
+from profiling import JobProfile
+from retry import classify
+from progress import ProgressAggregator, new_bytes_hook
+from ydl_pool import YoutubeDLPool
+
+# How long an idle worker waits before asking for work again
+IDLE_POLL_SECONDS = 2
+
+# Heartbeats per lease: a couple can go missing before the server gives the job away
+HEARTBEATS_PER_LEASE = 3
+
+
+class LeaseLost(Exception):
+    """The server gave this job to another worker; raised from the progress hook to stop yt-dlp"""
+
+
+class ServerClient:
+    """JSON calls to the server's worker API"""
+    def __init__(self, base_url, token=None):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+
+    def post(self, path, payload):
+        """POST payload; returns (status, decoded reply or None)"""
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        req = urllib.request.Request(self.base_url + path, data=json.dumps(payload).encode(), headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                body = response.read()
+                return response.status, json.loads(body) if body else None
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+
+class JobRun:
+    """One claimed job: runs yt-dlp here and keeps the server up to date"""
+    def __init__(self, client, worker, claim, save_path=None):
+        self.client = client
+        self.worker = worker
+        self.download_id = claim['download_id']
+        self.job = claim['job']
+        self.save_path = save_path or self.job['save_path']
+        self.heartbeat_seconds = claim['lease_seconds'] / HEARTBEATS_PER_LEASE
+
+        self.aggregator = ProgressAggregator()
+        self.profile = JobProfile(self.download_id)
+        self.report = {'status': 'starting'}  # Latest progress, sent with every heartbeat
+        self.new_bytes = 0  # Received since the last heartbeat
+        self._lock = threading.Lock()
+        self._count_bytes = new_bytes_hook(self._add_bytes)
+        self.lost = False
+        self.done = threading.Event()
+
+    def progress_hook(self, d):
+        if self.lost:
+            raise LeaseLost(self.download_id)
+
+        self._count_bytes(d)
+        if 'title' not in self.report:
+            self.report['title'] = (d.get('info_dict') or {}).get('title', '')
+        snapshot = self.aggregator.feed(d)
+        if snapshot is None:
+            return
+        with self._lock:
+            if snapshot['status'] == 'downloading':
+                self.report.update(
+                    status='downloading',
+                    progress=snapshot['percent'] if snapshot['percent'] is not None else 50,
+                    speed=round(snapshot['speed'] / 1_000_000, 2),
+                    eta=snapshot['eta'] or 0,
+                )
+            elif snapshot['status'] == 'finished':
+                self.report.update(status='processing', progress=100, speed=0, eta=0)
+
+    def _add_bytes(self, amount):
+        with self._lock:
+            self.new_bytes += amount
+
+    def merge_progress(self, percent):
+        with self._lock:
+            self.report.update(status='merging', progress=round(percent, 1))
+
+    def heartbeat(self):
+        with self._lock:
+            payload = {
+                'worker': self.worker,
+                'progress': dict(self.report),
+                'new_bytes': self.new_bytes,
+                'quality': self.job['quality'],
+            }
+            self.new_bytes = 0
+        try:
+            status, _ = self.client.post(f'/api/worker/jobs/{self.download_id}/heartbeat', payload)
+        except OSError:
+            return  # Server unreachable for now; the lease covers a few missed beats
+        if status == 409:
+            self.lost = True
+
+    def _heartbeats(self):
+        while not self.done.wait(self.heartbeat_seconds):
+            self.heartbeat()
+            if self.lost:
+                return
+
+    def run(self, ydl_pool, info_cache):
+        """Download the job and tell the server how it went"""
+        beats = threading.Thread(target=self._heartbeats, name=f'heartbeat-{self.download_id}', daemon=True)
+        beats.start()
+
+        job = DownloadJob(
+            self.job['url'], self.save_path, format_selector=self.job['format'], turbo=self.job.get('turbo'),
+            sinks=[self.progress_hook], profile=self.profile
+        )
+
+        result = {'worker': self.worker}
+        try:
+            os.makedirs(self.save_path, exist_ok=True)
+            # continuedl takes over .part files from a worker that died (shared storage)
+            job.download(ydl_pool, info_cache)
+            with self._lock:
+                self.report['title'] = job.title
+            job.merge(self.merge_progress)
+            result['file_path'] = final_file_path(job.info)
+            with self._lock:
+                self.report.update(status='processing', progress=100)
+        except Exception as e:
+            if self.lost:
+                print(f'[{self.worker}] {self.download_id}: lease lost, dropped')
+                return
+            result.update(error=str(e), error_class=type(unwrap_error(e)).__name__, retry_class=classify(e))
+        finally:
+            self.done.set()
+
+        with self._lock:
+            result['progress'] = dict(self.report)
+        result['phases'] = [entry for entry in self.profile.phases if entry[2] is not None]
+        outcome = 'failed' if 'error' in result else 'done'
+        try:
+            status, _ = self.client.post(f'/api/worker/jobs/{self.download_id}/finish', result)
+        except OSError as e:
+            # The lease runs out and the job is requeued; yt-dlp will find the file already there
+            status = e
+        print(f'[{self.worker}] {self.download_id}: {outcome}' + ('' if status == 200 else f' (server said {status})'))
+
+
+def work(client, worker, save_path, ydl_pool, info_cache, stop):
+    """Claim and run jobs until stop is set"""
+    while not stop.is_set():
+        try:
+            status, claim = client.post('/api/worker/claim', {'worker': worker})
+        except OSError as e:
+            print(f'[{worker}] server unreachable: {e}')
+            stop.wait(IDLE_POLL_SECONDS)
+            continue
+
+        if status == 204:
+            stop.wait(IDLE_POLL_SECONDS)
+            continue
+        if status != 200:
+            print(f'[{worker}] claim refused ({status}) - is the server in distributed mode, and the token right?')
+            stop.wait(IDLE_POLL_SECONDS * 5)
+            continue
+
+        print(f"[{worker}] {claim['download_id']}: {claim['job']['url']} (attempt {claim['attempt']})")
+        JobRun(client, worker, claim, save_path).run(ydl_pool, info_cache)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--server', default=os.environ.get('JUNAY_SERVER_URL', 'http://127.0.0.1:5001'))
+    parser.add_argument('--jobs', type=int, default=2, help='downloads this worker runs at once')
+    parser.add_argument('--save-path', help="where files go (default: the folder each job asked for)")
+    parser.add_argument('--token', default=os.environ.get('JUNAY_WORKER_TOKEN'), help='the server\'s JUNAY_WORKER_TOKEN')
+    parser.add_argument('--name', default=f'{socket.gethostname()}:{os.getpid()}', help='worker name shown by the server')
+    parser.add_argument('--data-dir', default=os.environ.get('JUNAY_DATA_DIR', str(Path.home() / '.junay-worker')))
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    client = ServerClient(args.server, args.token)
+    ydl_pool = YoutubeDLPool(max_idle=args.jobs)
+    info_cache = open_info_cache(args.data_dir)
+    stop = threading.Event()
+
+    print(f'Junay worker {args.name}: {args.jobs} job(s) at a time from {args.server}')
+    threads = [
+        threading.Thread(
+            target=work, args=(client, f'{args.name}/{slot}', args.save_path, ydl_pool, info_cache, stop),
+            name=f'slot-{slot}', daemon=True
+        )
+        for slot in range(args.jobs)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        # Running jobs are abandoned; their leases run out and the server requeues them
+        print('\nStopping')
+        stop.set()
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
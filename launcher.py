@@ -2,26 +2,91 @@
 Junay Downloader Launcher
 This script starts the Flask server and opens the browser automatically
 Used for packaging into a Windows .exe
+
+yt-dlp isn't imported at startup: it loads in the background once the server is
+listening. --startup-report (or JUNAY_STARTUP_REPORT=1) prints how long each step took
+and appends it to startup.log in the data folder
 """
 
+import time
+STARTED = time.perf_counter()  # Before the heavy imports, so the report counts them
+
 import sys
 import os
+import json
+import multiprocessing
+import socket
 import threading
-import time
 import webbrowser
 from waitress import serve
-from app import app
+from app import app, resume_interrupted_jobs
+from engine import DATA_DIR, warm_up
+IMPORTED = time.perf_counter()
+
+HOST = '127.0.0.1'
+PORT = int(os.environ.get('JUNAY_PORT', 5001))
+
+# How long to wait for the server's socket before opening the browser anyway
+SERVER_START_TIMEOUT = 30
+
+# HTTP server in front of the app: 'waitress' (a thread per connection) or 'asgi'
+# (asyncio via uvicorn - progress streams and polling cost no thread; --asgi also picks it)
+SERVER_MODE = 'asgi' if '--asgi' in sys.argv[1:] else os.environ.get('JUNAY_SERVER', 'waitress')
+
+OPEN_BROWSER = '--no-browser' not in sys.argv[1:]
+STARTUP_REPORT = '--startup-report' in sys.argv[1:] or os.environ.get('JUNAY_STARTUP_REPORT', '') == '1'
+
+
+def wait_for_server(timeout=SERVER_START_TIMEOUT):
+    """Block until the server accepts connections; False if it didn't within timeout"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((HOST, PORT), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.02)
+    return False
 
-def open_browser():
-    """Wait for server to start, then open browser with proper window size"""
-    time.sleep(2)  # Wait for server to initialize
 
+def after_start():
+    """
+    Background thread: once the server is listening, open the browser, then do
+    the work that used to hold startup up - resuming jobs and loading yt-dlp
+    """
+    wait_for_server()
+    listening = time.perf_counter()
+    if OPEN_BROWSER:
+        open_browser()
+
+    # Pick up downloads interrupted by the last shutdown
+    resumed = resume_interrupted_jobs()
+    if resumed:
+        print(f"  Resuming {resumed} interrupted download(s)")
+
+    warm_up()
+    if STARTUP_REPORT:
+        report = {
+            'imports': IMPORTED - STARTED,  # Launcher and app modules (Flask, no yt-dlp)
+            'listening': listening - STARTED,  # Socket accepting connections
+            'warm': time.perf_counter() - STARTED,  # yt-dlp and its extractors loaded
+        }
+        line = json.dumps({step: round(seconds, 3) for step, seconds in report.items()})
+        print('startup ' + line, flush=True)
+
+        # The windowed .exe has no console: keep a log to compare releases with
+        with open(DATA_DIR / 'startup.log', 'a') as log:
+            log.write(json.dumps(dict(report, time=time.time(), frozen=getattr(sys, 'frozen', False))) + '\n')
+
+
+def open_browser():
+    """Open browser with proper window size"""
     # Try to open with specific size using browser-specific methods
     # Chrome/Edge on Windows: Use --window-size flag
     import subprocess
     import platform
 
-    url = 'http://127.0.0.1:5001'
+    url = f'http://{HOST}:{PORT}'
 
     # On Windows, try to launch Chrome/Edge with specific window size
     if platform.system() == 'Windows':
@@ -68,6 +133,18 @@ def open_browser():
         # For non-Windows, use default browser
         webbrowser.open(url)
 
+def serve_asgi():
+    """Serve through the async front end (asgi.py) under uvicorn"""
+    try:
+        import uvicorn  # noqa: F401
+    except ImportError:
+        print("ASGI mode needs uvicorn: pip install uvicorn")
+        sys.exit(1)
+
+    from asgi import serve as serve_async
+    serve_async(host=HOST, port=PORT)
+
+
 def main():
     """Main entry point for the launcher"""
     print("=" * 60)
@@ -75,22 +152,27 @@ def main():
     print("  Starting server...")
     print("=" * 60)
 
-    # Start browser in background thread
-    browser_thread = threading.Thread(target=open_browser, daemon=True)
-    browser_thread.start()
+    # Browser, resumed jobs and yt-dlp follow as soon as the server is listening
+    threading.Thread(target=after_start, name='junay-startup', daemon=True).start()
 
     print("\nServer started!")
-    print("Opening browser...")
-    print("\nThe app is now running at: http://127.0.0.1:5001")
+    if OPEN_BROWSER:
+        print("Opening browser...")
+    print(f"\nThe app is now running at: http://{HOST}:{PORT}")
     print("\nPress CTRL+C to stop the server\n")
 
-    # Start the production server (Waitress)
+    # Start the production server (Waitress, or uvicorn in ASGI mode)
     # This is better than Flask's dev server for production use
     try:
-        serve(app, host='127.0.0.1', port=5001, threads=4)
+        if SERVER_MODE == 'asgi':
+            serve_asgi()
+        else:
+            # Progress streams hold a thread each while open; JUNAY_MAX_STREAMS (8) leaves the rest for the API
+            serve(app, host=HOST, port=PORT, threads=16)
     except KeyboardInterrupt:
         print("\n\nShutting down...")
         sys.exit(0)
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Worker processes (JUNAY_WORKER_PROCESSES) in the packaged .exe
     main()
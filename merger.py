@@ -0,0 +1,90 @@
+"""
+Junay Merger
+yt-dlp's ffmpeg merger with progress reports and audio-only re-encoding, used by
+postprocess.run_deferred. Kept apart so the app can start without loading yt-dlp
+"""
+
+import os
+import re
+import tempfile
+import threading
+
+from yt_dlp.postprocessor import FFmpegMergerPP
+
+from postprocess import TRANSCODE_AUDIO, audio_handling
+
+# How often a running merge's progress file is read
+PROGRESS_POLL_SECONDS = 0.25
+
+
+class ProgressMergerPP(FFmpegMergerPP):
+    """
+    FFmpegMergerPP that reports how far ffmpeg has got through the video,
+    and only re-encodes audio the output container can't hold
+    """
+    def __init__(self, downloader, on_progress=None):
+        super().__init__(downloader)
+        self.on_progress = on_progress
+        self.audio = None  # 'copy' or 'transcode', once run
+        self._progress_path = None  # ffmpeg -progress file while a merge runs
+
+    def run(self, info):
+        self.audio = audio_handling(info)
+        return super().run(info)
+
+    def run_ffmpeg_multiple_files(self, input_paths, out_path, opts, **kwargs):
+        # The merger asks for '-c copy'; override just the audio when it has to change
+        if self.audio == 'transcode':
+            opts = list(opts) + ['-c:a', TRANSCODE_AUDIO.get(self._ext(out_path), 'aac')]
+        if self.on_progress is None:
+            return super().run_ffmpeg_multiple_files(input_paths, out_path, opts, **kwargs)
+
+        # ffmpeg's -progress output goes to a file we follow while yt-dlp runs it
+        fd, self._progress_path = tempfile.mkstemp(prefix='junay-merge-', suffix='.progress')
+        os.close(fd)
+        done = threading.Event()
+        follower = threading.Thread(target=self._follow_progress, args=(self._progress_path, done), daemon=True)
+        follower.start()
+        try:
+            return super().run_ffmpeg_multiple_files(input_paths, out_path, opts, **kwargs)
+        finally:
+            done.set()
+            follower.join()
+            os.remove(self._progress_path)
+            self._progress_path = None
+
+    @staticmethod
+    def _ext(path):
+        return os.path.splitext(path)[1][1:].lower()
+
+    def _configuration_args(self, exe, *args, **kwargs):
+        # yt-dlp builds and runs the command; we only add where ffmpeg writes its progress
+        config_args = super()._configuration_args(exe, *args, **kwargs)
+        keys = args[0] if args else kwargs.get('keys')
+        if self._progress_path and keys and '_o1' in keys:
+            config_args = config_args + ['-progress', self._progress_path]
+        return config_args
+
+    def _follow_progress(self, path, done):
+        """Report each `key=value` line ffmpeg adds to its progress file until done is set"""
+        with open(path, encoding='utf-8', errors='replace') as f:
+            partial = ''
+            while True:
+                finished = done.is_set()  # Checked before reading, so the last lines are never missed
+                partial += f.read()
+                *lines, partial = partial.split('\n')
+                for line in lines:
+                    self._report(line.strip())
+                if finished:
+                    return
+                done.wait(PROGRESS_POLL_SECONDS)
+
+    def _report(self, line):
+        """Turn one `key=value` line of ffmpeg -progress output into a percentage"""
+        if self.on_progress is None:
+            return
+        match = re.fullmatch(r'out_time_(?:us|ms)=(\d+)', line)  # Both are microseconds
+        if match:
+            self.on_progress(int(match.group(1)) / 1_000_000)
+        elif line == 'progress=end':
+            self.on_progress(None)
@@ -0,0 +1,213 @@
+"""
+Junay Post-Processing Stage
+Download workers hand finished streams here instead of merging them inline,
+so CPU-bound ffmpeg work never holds up a network slot (and vice versa)
+"""
+
+import functools
+import os
+import queue
+import threading
+import time
+
+# Key yt-dlp's info dict carries when its merge was left for this stage
+DEFERRED_KEY = '__junay_deferred'
+
+# Per-job options that mean nothing once the download is done
+DOWNLOAD_ONLY_OPTIONS = ('progress_hooks', 'postprocessor_hooks')
+
+# Audio codecs each container holds as-is (prefixes of yt-dlp's acodec values);
+# containers not listed (mkv) take anything
+CONTAINER_AUDIO = {
+    'mp4': ('mp4a', 'aac', 'mp3', 'ac-3', 'ec-3', 'alac'),
+    'm4a': ('mp4a', 'aac', 'mp3', 'ac-3', 'ec-3', 'alac'),
+    'mov': ('mp4a', 'aac', 'mp3', 'ac-3', 'ec-3', 'alac'),
+    'webm': ('opus', 'vorbis'),
+}
+
+# What audio is re-encoded to when it doesn't fit
+TRANSCODE_AUDIO = {'webm': 'libopus'}  # Everything else gets AAC
+
+# yt-dlp's own sort order up to the audio codec, with AAC first among otherwise equal
+# formats - so the merge into mp4 can usually copy the audio instead of re-encoding it
+PREFER_AAC_SORT = ['lang', 'quality', 'res', 'fps', 'hdr:12', 'vcodec', 'channels', 'acodec:aac']
+
+
+class DeferredMergeMixin:
+    """
+    YoutubeDL mixin that stops after downloading the streams of a merged format
+    The merge and everything after it (fixups, moving files) is recorded on the
+    info dict for run_deferred() to finish later
+    """
+    def post_process(self, filename, info, files_to_move=None):
+        from yt_dlp.postprocessor import FFmpegMergerPP
+
+        pps = info.get('__postprocessors') or []
+        if not info.get('__files_to_merge') or not any(isinstance(pp, FFmpegMergerPP) for pp in pps):
+            return super().post_process(filename, info, files_to_move)
+
+        info['filepath'] = filename
+        info[DEFERRED_KEY] = {
+            'filename': filename,
+            'files_to_move': files_to_move,
+            'params': {key: value for key, value in self.params.items() if key not in DOWNLOAD_ONLY_OPTIONS},
+        }
+        return info
+
+
+@functools.lru_cache(maxsize=None)
+def deferring(downloader):
+    """The YoutubeDL class (or subclass such as TurboYoutubeDL) with merging deferred"""
+    return type(f'Deferred{downloader.__name__}', (DeferredMergeMixin, downloader), {})
+
+
+def deferred_merge(info):
+    """The download info dict whose merge was deferred, or None if there is nothing to merge"""
+    for download in info.get('requested_downloads') or [info]:
+        if DEFERRED_KEY in download:
+            return download
+    return None
+
+
+def audio_handling(info):
+    """'copy' if every audio stream of a merge fits its output container as-is, otherwise 'transcode'"""
+    allowed = CONTAINER_AUDIO.get(info.get('ext'))
+    if allowed is None:
+        return 'copy'
+
+    codecs = [
+        (f.get('acodec') or '').lower()
+        for f in info.get('requested_formats') or [] if f.get('acodec') != 'none'
+    ]
+    # Unknown codecs ('' never matches) are re-encoded to be safe
+    return 'copy' if all(codec.startswith(allowed) for codec in codecs) else 'transcode'
+
+
+def run_deferred(info, on_progress=None):
+    """
+    Finish a download whose merge was deferred: merge, fix up and move its files
+    on_progress(percent) is called as ffmpeg works through the video
+    Returns how the audio was handled: 'copy' or 'transcode'
+    """
+    import yt_dlp
+    from yt_dlp.postprocessor import FFmpegMergerPP
+    from merger import ProgressMergerPP
+
+    deferred = info.pop(DEFERRED_KEY)
+    duration = info.get('duration')
+
+    def report(position):
+        if on_progress is None:
+            return
+        if position is None:
+            on_progress(100.0)
+        elif duration:
+            on_progress(min(position / duration * 100, 100.0))
+
+    with yt_dlp.YoutubeDL(deferred['params']) as ydl:
+        merger = ProgressMergerPP(ydl, report)
+        pps = []
+        for pp in info['__postprocessors']:
+            if isinstance(pp, FFmpegMergerPP):
+                pp = merger
+            else:
+                pp.set_downloader(ydl)
+            pps.append(pp)
+        info['__postprocessors'] = pps
+
+        result = ydl.post_process(deferred['filename'], info, deferred['files_to_move'])
+        if result is not info:
+            info.clear()
+            info.update(result)
+        return merger.audio
+
+
+class PostProcessingPool:
+    """
+    Worker threads that run merges (each one an ffmpeg process, so sized to CPU cores)
+    The queue is bounded: when merges back up, submit() blocks the download worker,
+    which stops it picking up more downloads until the merges catch up
+    """
+    def __init__(self, max_workers=None, max_queued=None):
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.max_queued = max_queued or self.max_workers * 2
+
+        self._queue = queue.Queue(maxsize=self.max_queued)
+        self._lock = threading.Lock()
+        self._workers = []
+        self._running = 0
+
+        # Counters for the status endpoint
+        self.completed = 0
+        self.failed = 0
+        self.blocked = 0  # Submits that had to wait for room
+        self.blocked_seconds = 0.0
+        self._merges = {}  # audio handling ('copy'/'transcode') -> [count, seconds]
+
+    def submit(self, func, args=()):
+        """Queue func(*args); blocks while the queue is full"""
+        self._start_workers()
+        try:
+            self._queue.put_nowait((func, args))
+            return
+        except queue.Full:
+            pass
+
+        # Backpressure: wait for room, and record how long download workers were held up
+        started = time.monotonic()
+        self._queue.put((func, args))
+        with self._lock:
+            self.blocked += 1
+            self.blocked_seconds += time.monotonic() - started
+
+    def _start_workers(self):
+        with self._lock:
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(
+                    target=self._work, name=f"junay-merge-{len(self._workers) + 1}", daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            func, args = self._queue.get()
+            with self._lock:
+                self._running += 1
+            try:
+                func(*args)
+                ok = True
+            except Exception:
+                ok = False  # func reports its own errors; keep the worker alive
+            with self._lock:
+                self._running -= 1
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def record_merge(self, audio, seconds):
+        """Count a finished merge by how its audio was handled, to measure what copying saves"""
+        with self._lock:
+            totals = self._merges.setdefault(audio, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def stats(self):
+        """Snapshot of the merge stage for the status endpoint"""
+        with self._lock:
+            merges = {
+                audio: {'count': count, 'avg_seconds': round(seconds / count, 2)}
+                for audio, (count, seconds) in self._merges.items()
+            }
+            return {
+                'workers': self.max_workers,
+                'running': self._running,
+                'queued': self._queue.qsize(),
+                'max_queued': self.max_queued,
+                'completed': self.completed,
+                'failed': self.failed,
+                'blocked': self.blocked,
+                'blocked_seconds': round(self.blocked_seconds, 2),
+                'merges': merges,  # By audio handling: 'copy' vs 'transcode'
+            }
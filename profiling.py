@@ -0,0 +1,199 @@
+"""
+Junay Job Profiling
+Phase timings for every job (queued, extract, download, merge...), plus
+cProfile and tracemalloc capture for jobs that ask for it
+"""
+
+import cProfile
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# How much of a capture the profile endpoint returns
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+
+# Called as hook(download_id, phase, seconds) whenever a phase ends
+_phase_hooks = []
+
+# tracemalloc is process-wide: keep it on while any job is capturing
+_tracing_lock = threading.Lock()
+_tracing_jobs = 0
+
+# One cProfile capture at a time: from Python 3.12 it runs on sys.monitoring, which
+# takes a single profiler per process, and enabling a second one raises ValueError
+_capture_lock = threading.Lock()
+
+
+def add_phase_hook(hook):
+    """Register hook(download_id, phase, seconds), called as every job finishes each phase"""
+    _phase_hooks.append(hook)
+
+
+def _start_tracing():
+    global _tracing_jobs
+    with _tracing_lock:
+        if _tracing_jobs == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_jobs += 1
+        return tracemalloc.take_snapshot()
+
+
+def _stop_tracing():
+    global _tracing_jobs
+    with _tracing_lock:
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        _tracing_jobs -= 1
+        if _tracing_jobs == 0:
+            tracemalloc.stop()
+        return snapshot, peak
+
+
+class JobProfile:
+    """
+    Timeline of one job's phases, and its cProfile/tracemalloc capture when enabled
+    A phase can run more than once (a retried extraction), each run is kept
+    """
+    __slots__ = ('download_id', 'capture', 'phases', 'peak_bytes', 'skipped', '_profiles', '_allocations', '_lock')
+
+    def __init__(self, download_id, capture=False):
+        self.download_id = download_id
+        self.capture = capture  # Run cProfile and tracemalloc around the job's work
+        self.phases = []  # [phase, started, ended] in wall-clock seconds; ended None while running
+        self.peak_bytes = None  # Highest traced memory seen while capturing (whole process)
+        self.skipped = 0  # Blocks not captured because another capture was running
+
+        self._profiles = []  # One cProfile.Profile per thread that worked on the job
+        self._allocations = {}  # 'file:line' -> [bytes, blocks] allocated and still held
+        self._lock = threading.Lock()
+
+    def start(self, phase):
+        with self._lock:
+            self.phases.append([phase, time.time(), None])
+
+    def end(self, phase):
+        with self._lock:
+            for entry in reversed(self.phases):
+                if entry[0] == phase and entry[2] is None:
+                    entry[2] = time.time()
+                    seconds = entry[2] - entry[1]
+                    break
+            else:
+                return
+
+        for hook in _phase_hooks:
+            hook(self.download_id, phase, seconds)
+
+    def record(self, phase, started, ended):
+        """Add a phase timed elsewhere (a distributed worker reports its own)"""
+        with self._lock:
+            self.phases.append([phase, started, ended])
+        for hook in _phase_hooks:
+            hook(self.download_id, phase, ended - started)
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as phase name"""
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    @contextmanager
+    def capturing(self):
+        """
+        cProfile (and trace allocations) for the enclosed block, if the job asked for it
+        Only one block in the process is captured at a time; others get phase timings only.
+        Before Python 3.12 the profile covers this thread; from 3.12 it covers every thread
+        """
+        profiler = self._start_profiler() if self.capture else None
+        if profiler is None:
+            yield
+            return
+
+        try:
+            baseline = _start_tracing()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                snapshot, peak = _stop_tracing()
+                self._record(profiler, snapshot.compare_to(baseline, 'lineno'), peak)
+        finally:
+            _capture_lock.release()
+
+    def _start_profiler(self):
+        """An enabled cProfile.Profile holding _capture_lock, or None if another capture is running"""
+        if _capture_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                return profiler
+            except ValueError:
+                _capture_lock.release()  # Some other profiling tool (a debugger, coverage) is active
+        with self._lock:
+            self.skipped += 1
+        return None
+
+    def _record(self, profiler, differences, peak):
+        with self._lock:
+            self._profiles.append(profiler)
+            self.peak_bytes = max(self.peak_bytes or 0, peak)
+            for stat in differences:
+                if stat.size_diff <= 0:
+                    continue
+                frame = stat.traceback[0]
+                totals = self._allocations.setdefault(f'{frame.filename}:{frame.lineno}', [0, 0])
+                totals[0] += stat.size_diff
+                totals[1] += stat.count_diff
+
+    def report(self):
+        """JSON-ready timeline, per-phase totals and (if captured) the hottest functions and allocations"""
+        now = time.time()
+        with self._lock:
+            phases = [
+                {'phase': phase, 'start': started, 'end': ended, 'seconds': round((ended or now) - started, 3)}
+                for phase, started, ended in self.phases
+            ]
+            profiles = list(self._profiles)
+            allocations = sorted(self._allocations.items(), key=lambda item: item[1][0], reverse=True)
+
+        totals = {}
+        for entry in phases:
+            totals[entry['phase']] = round(totals.get(entry['phase'], 0) + entry['seconds'], 3)
+
+        result = {'download_id': self.download_id, 'phases': phases, 'totals': totals, 'captured': self.capture}
+        if self.skipped:
+            result['capture_skipped'] = self.skipped  # Blocks that ran while another job was being captured
+        if profiles:
+            result['functions'] = _top_functions(profiles)
+            result['allocations'] = {
+                'peak_bytes': self.peak_bytes,
+                'top': [
+                    {'location': location, 'bytes': size, 'blocks': count}
+                    for location, (size, count) in allocations[:TOP_ALLOCATIONS]
+                ],
+            }
+        return result
+
+
+def _top_functions(profiles):
+    """The functions with the most cumulative time across the job's threads"""
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        stats.add(profile)
+
+    entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            'function': f'{filename}:{line}({name})',
+            'calls': calls,
+            'own_seconds': round(own, 4),
+            'cumulative_seconds': round(cumulative, 4),
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _) in entries[:TOP_FUNCTIONS]
+    ]
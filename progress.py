@@ -0,0 +1,170 @@
+"""
+Junay Progress Aggregator
+Turns the flood of yt-dlp progress callbacks into a few useful updates
+Shared by the web app and the desktop apps
+"""
+
+import threading
+import time
+
+
+class ProgressAggregator:
+    """
+    Feed every yt-dlp progress dict to feed(); it returns a snapshot only when
+    the update is worth showing, with speed and ETA smoothed over time
+    """
+    __slots__ = (
+        'min_interval', 'max_interval', 'min_delta', 'smoothing', '_lock',
+        '_streams', '_sample_bytes', '_sample_time', '_speed',
+        '_emit_time', '_emit_percent', '_emit_status'
+    )
+
+    def __init__(self, min_interval=0.25, max_interval=1.0, min_delta=0.1, smoothing=0.3):
+        self.min_interval = min_interval  # Never update more often than this (seconds)
+        self.max_interval = max_interval  # Always refresh speed/ETA at least this often
+        self.min_delta = min_delta  # Percentage points that count as visible movement
+        self.smoothing = smoothing  # Weight of the newest speed sample in the moving average
+
+        self._lock = threading.Lock()  # Hooks may fire from several fragment threads
+
+        # Streams seen so far: filename -> [downloaded, total, finished]
+        # (turbo mode downloads video and audio at the same time)
+        self._streams = {}
+
+        # Speed sampling state
+        self._sample_bytes = None
+        self._sample_time = None
+        self._speed = None
+
+        # Last emitted update
+        self._emit_time = None
+        self._emit_percent = None
+        self._emit_status = None
+
+    def feed(self, d):
+        """Process one progress dict; returns a snapshot dict or None if throttled"""
+        now = time.monotonic()
+
+        with self._lock:
+            self._track_stream(d)
+            if d.get('status') == 'downloading':
+                self._sample_speed(now)
+            snapshot = self._snapshot(d)
+            status = snapshot['status']
+
+            if not self._should_emit(status, snapshot['percent'], now):
+                return None
+
+            self._emit_time = now
+            self._emit_percent = snapshot['percent']
+            self._emit_status = status
+            return snapshot
+
+    def _track_stream(self, d):
+        """Record the byte counts of the stream this update is about"""
+        filename = d.get('filename')
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        if d.get('status') == 'finished':
+            downloaded = total or d.get('downloaded_bytes') or 0
+        else:
+            downloaded = d.get('downloaded_bytes') or 0
+
+        self._streams[filename] = [downloaded, total, d.get('status') == 'finished']
+
+    def _sample_speed(self, now):
+        """Update the smoothed speed from the bytes downloaded (across streams) since the last sample"""
+        downloaded = sum(stream[0] for stream in self._streams.values())
+
+        # First sample, or a stream restarted from scratch
+        if self._sample_bytes is None or downloaded < self._sample_bytes:
+            self._sample_bytes = downloaded
+            self._sample_time = now
+            return
+
+        elapsed = now - self._sample_time
+        if elapsed < 0.05:
+            return  # Too short to measure; keep accumulating
+
+        instant = (downloaded - self._sample_bytes) / elapsed
+        if self._speed is None:
+            self._speed = instant
+        else:
+            self._speed = self.smoothing * instant + (1 - self.smoothing) * self._speed
+
+        self._sample_bytes = downloaded
+        self._sample_time = now
+
+    def _snapshot(self, d):
+        """Build the update handed to the UI, summed over every stream seen so far"""
+        streams = self._streams.values()
+        downloaded = sum(stream[0] for stream in streams)
+        # total_bytes can be missing (livestreams, some videos)
+        totals = [stream[1] for stream in streams]
+        total = sum(totals) if all(totals) else None
+
+        # One stream finishing while another still runs is not the end
+        status = d.get('status')
+        if status == 'finished' and not all(stream[2] for stream in streams):
+            status = 'downloading'
+
+        if status == 'finished':
+            percent = 100.0
+        elif total:
+            percent = min(downloaded / total * 100, 100.0)
+        else:
+            percent = None  # Unknown size
+
+        # Fall back to yt-dlp's instantaneous speed until we have our own sample
+        speed = self._speed if self._speed is not None else (d.get('speed') or 0)
+
+        eta = None
+        if total and speed > 0:
+            eta = int(max(total - downloaded, 0) / speed)
+        elif d.get('eta') is not None:
+            eta = int(d['eta'])
+
+        return {
+            'status': status,
+            'percent': percent,
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'speed': speed,  # Bytes per second
+            'eta': eta,  # Seconds
+            'filename': d.get('filename'),
+        }
+
+    def _should_emit(self, status, percent, now):
+        """Time- and delta-based throttle; status changes always go through"""
+        if status != self._emit_status or self._emit_time is None:
+            return True
+
+        elapsed = now - self._emit_time
+        if elapsed < self.min_interval:
+            return False
+        if elapsed >= self.max_interval:
+            return True
+
+        if percent is None or self._emit_percent is None:
+            return False
+        return abs(percent - self._emit_percent) >= self.min_delta
+
+
+def new_bytes_hook(on_bytes):
+    """yt-dlp progress hook calling on_bytes(amount) with each batch of newly received bytes"""
+    seen = {}  # filename -> bytes already counted
+
+    def hook(d):
+        if d.get('status') != 'downloading':
+            return
+        filename = d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        previous = seen.get(filename)
+        if previous is None:
+            # First report: a resumed file already had its .part on disk, so count only what
+            # this run fetched (yt-dlp's speed covers exactly those bytes)
+            previous = downloaded - min(int((d.get('speed') or 0) * (d.get('elapsed') or 0)), downloaded)
+        seen[filename] = downloaded
+        if downloaded > previous:
+            on_bytes(downloaded - previous)
+
+    return hook
@@ -0,0 +1,130 @@
+"""
+Junay Job Registry
+Holds progress records for active and recently finished jobs,
+reaping old finished ones so a long-running server stays at flat memory
+"""
+
+import os
+import sys
+import threading
+import time
+
+
+def process_memory(pid=None):
+    """Resident memory of this process (or child pid) in bytes, or None if the platform won't say"""
+    try:
+        # Linux: current RSS in pages
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        if pid is not None:
+            return None  # Only our own peak is available elsewhere
+
+    try:
+        # macOS / other Unix: peak RSS (bytes on macOS, KB elsewhere)
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return None  # Windows
+
+
+def record_size(record):
+    """Approximate memory held by one __slots__ record and its field values"""
+    size = sys.getsizeof(record)
+    for name in getattr(type(record), '__slots__', ()):
+        value = getattr(record, name, None)
+        if isinstance(value, (str, int, float)):
+            size += sys.getsizeof(value)
+    return size
+
+
+class JobRegistry:
+    """
+    Dict-like store of job records (download_id -> record)
+    Records expose finished_at (None while the job is still active); finished
+    records are dropped once older than max_age or beyond max_finished
+    """
+    def __init__(self, max_finished=1000, max_age=24 * 3600, reap_interval=60):
+        self.max_finished = max_finished
+        self.max_age = max_age
+        self.reap_interval = reap_interval
+        self.reaped = 0
+
+        self._lock = threading.Lock()
+        self._records = {}
+        self._reaper = None
+
+    def __setitem__(self, job_id, record):
+        with self._lock:
+            self._records[job_id] = record
+            self._start_reaper()
+
+    def __getitem__(self, job_id):
+        return self._records[job_id]
+
+    def __contains__(self, job_id):
+        return job_id in self._records
+
+    def __iter__(self):
+        # Iterate over a snapshot so callers never see "dict changed size"
+        with self._lock:
+            return iter(list(self._records))
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, job_id, default=None):
+        return self._records.get(job_id, default)
+
+    def _start_reaper(self):
+        """Start the background reaper on first use (caller holds the lock)"""
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap_loop, name="junay-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.reap_interval)
+            self.reap()
+
+    def reap(self):
+        """Drop finished records past their retention; returns how many were removed"""
+        cutoff = time.time() - self.max_age
+
+        with self._lock:
+            finished = sorted(
+                (record.finished_at, job_id)
+                for job_id, record in self._records.items()
+                if record.finished_at is not None
+            )
+
+            # Too old, or the oldest beyond the max_finished newest
+            excess = max(len(finished) - self.max_finished, 0)
+            doomed = [
+                job_id for index, (finished_at, job_id) in enumerate(finished)
+                if index < excess or finished_at < cutoff
+            ]
+
+            for job_id in doomed:
+                del self._records[job_id]
+            self.reaped += len(doomed)
+
+        return len(doomed)
+
+    def stats(self):
+        """Counts and approximate memory for the status endpoint"""
+        with self._lock:
+            records = list(self._records.values())
+
+        finished = sum(1 for record in records if record.finished_at is not None)
+        return {
+            'jobs': len(records),
+            'active': len(records) - finished,
+            'finished': finished,
+            'reaped': self.reaped,
+            'max_finished': self.max_finished,
+            'max_age': self.max_age,
+            'registry_bytes': sys.getsizeof(self._records) + sum(record_size(r) for r in records),
+        }
@@ -0,0 +1,134 @@
+"""
+Junay Retry Policy
+Sorts download failures into throttling, transient network trouble, expired
+format URLs and permanent errors, and decides whether and when to try again.
+Jobs wait out their backoff in the queue, not on a worker thread
+"""
+
+import http.client
+import random
+import re
+import socket
+
+THROTTLED = 'throttled'  # The site wants us to slow down (429, bot checks)
+NETWORK = 'network'  # Timeouts, resets, 5xx - likely fine in a moment
+EXPIRED = 'expired'  # Format URLs no longer valid (403/410) - extract again
+PERMANENT = 'permanent'  # Retrying won't help (removed, private, unsupported...)
+
+RETRY_CLASSES = (THROTTLED, NETWORK, EXPIRED, PERMANENT)
+
+
+class Backoff:
+    """Exponential backoff with jitter: attempt n waits about base * factor**(n-1), at most cap"""
+    __slots__ = ('base', 'factor', 'cap', 'max_retries')
+
+    def __init__(self, base, factor=2, cap=600, max_retries=3):
+        self.base = base
+        self.factor = factor
+        self.cap = cap
+        self.max_retries = max_retries
+
+    def delay(self, retry):
+        """Seconds before retry number retry (1 = the first), or None once retries are used up"""
+        if retry > self.max_retries:
+            return None
+        ceiling = min(self.cap, self.base * self.factor ** (retry - 1))
+        # Half fixed, half random: spread out jobs that failed together, but never retry at once
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+# Job-level retries by failure class (in-download retries are yt-dlp's own, see retry_sleep)
+POLICIES = {
+    THROTTLED: Backoff(base=30, factor=2, cap=600, max_retries=5),
+    NETWORK: Backoff(base=5, factor=3, cap=300, max_retries=4),
+    EXPIRED: Backoff(base=1, factor=2, cap=10, max_retries=2),  # Fresh extraction straight away
+}
+
+# Status codes, and message fragments for errors that only carry text
+THROTTLE_STATUSES = (429,)
+EXPIRED_STATUSES = (403, 410)
+NETWORK_STATUSES = (408, 500, 502, 503, 504, 520, 522, 524)
+THROTTLE_MESSAGES = ('too many requests', 'rate limit', 'rate-limit', "confirm you're not a bot", 'confirm you’re not a bot')
+PERMANENT_MESSAGES = (
+    'video unavailable', 'private video', 'has been removed', 'has been terminated', 'not available in your country',
+    'members-only', 'confirm your age', 'unsupported url', 'copyright', 'requested format is not available',
+    'is not a valid url', 'no video formats found',
+)
+NETWORK_MESSAGES = ('timed out', 'connection reset', 'connection refused', 'temporary failure', 'giving up after')
+
+
+def classify(error):
+    """Which RETRY_CLASSES failure error is"""
+    known = getattr(error, 'retry_class', None)  # Classified in a worker process already
+    if known in RETRY_CLASSES:
+        return known
+
+    causes = list(_causes(error))
+    for cause in causes:
+        status = _http_status(cause)
+        if status in THROTTLE_STATUSES:
+            return THROTTLED
+        if status in EXPIRED_STATUSES:
+            return EXPIRED
+        if status in NETWORK_STATUSES:
+            return NETWORK
+
+    message = ' '.join(str(cause) for cause in causes).lower()
+    if any(text in message for text in THROTTLE_MESSAGES):
+        return THROTTLED
+    if any(text in message for text in PERMANENT_MESSAGES):
+        return PERMANENT
+
+    for cause in causes:
+        if _is_network_error(cause):
+            return NETWORK
+    if any(text in message for text in NETWORK_MESSAGES):
+        return NETWORK
+    return PERMANENT
+
+
+def retry_delay(retry_class, retry):
+    """Seconds to wait before retry number retry of a job that failed with retry_class, or None to give up"""
+    policy = POLICIES.get(retry_class)
+    return policy.delay(retry) if policy is not None else None
+
+
+def retry_sleep(n):
+    """
+    yt-dlp retry_sleep_functions entry for its own in-download retries (n counts from 0):
+    a short backoff instead of hammering a struggling server, kept small as it holds the worker
+    """
+    ceiling = min(8, 0.5 * 2 ** n)
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+def _causes(error, limit=5):
+    """error, then what it wraps (yt-dlp nests the real exception a level or two down)"""
+    seen = 0
+    while error is not None and seen < limit:
+        yield error
+        seen += 1
+        exc_info = getattr(error, 'exc_info', None)
+        error = (
+            getattr(error, 'cause', None)
+            or (exc_info[1] if isinstance(exc_info, tuple) and len(exc_info) > 1 else None)
+            or error.__cause__
+            or error.__context__
+        )
+
+
+def _http_status(error):
+    status = getattr(error, 'status', None) or getattr(error, 'code', None)
+    if isinstance(status, int):
+        return status
+    match = re.search(r'HTTP Error (\d{3})', str(error))
+    return int(match.group(1)) if match else None
+
+
+def _is_network_error(error):
+    if isinstance(error, (TimeoutError, ConnectionError, socket.timeout, socket.gaierror, http.client.IncompleteRead)):
+        return True
+
+    from yt_dlp.networking.exceptions import TransportError
+    from yt_dlp.utils import ContentTooShortError
+    return isinstance(error, (TransportError, ContentTooShortError))
@@ -0,0 +1,200 @@
+"""
+Junay Download Scheduler
+Fixed-size worker pool with a priority queue and per-host concurrency limits
+Jobs can be queued with a delay (retries backing off) without holding a worker
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from urllib.parse import urlparse
+
+
+def host_of(url):
+    """Return the origin host of a URL, used to group jobs for per-host limits"""
+    host = (urlparse(url).hostname or '').lower()
+
+    # www.youtube.com, m.youtube.com and youtube.com are the same origin
+    for prefix in ('www.', 'm.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+
+    # Short links resolve to the main site
+    if host == 'youtu.be':
+        host = 'youtube.com'
+
+    return host
+
+
+class ScheduledJob:
+    """A unit of work waiting in (or running from) the scheduler queue"""
+    def __init__(self, job_id, func, args, host, priority, delay=0):
+        self.job_id = job_id
+        self.func = func
+        self.args = args
+        self.host = host
+        self.priority = priority
+        self.submitted_at = time.time()
+        self.not_before = self.submitted_at + delay  # Not eligible to run before this
+        self.started_at = None
+
+
+class DownloadScheduler:
+    """
+    Runs submitted jobs on a fixed number of worker threads
+    Higher priority jobs run first; jobs for a busy host wait their turn
+    """
+    def __init__(self, max_workers=3, max_per_host=2):
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+
+        self._cond = threading.Condition()
+        self._ready = {}  # host -> heap of (-priority, sequence, job), jobs that are due
+        self._delayed = []  # Heap of (not_before, sequence, job), jobs backing off
+        self._sequence = itertools.count()
+        self._running = set()  # ScheduledJobs on a worker (a retried job_id can be queued while its last run ends)
+        self._host_counts = {}  # host -> number of running jobs
+        self._workers = []
+        self._avg_run_time = None  # Smoothed job duration, used for wait estimates
+
+    def submit(self, job_id, func, args=(), url='', priority=0, delay=0):
+        """Queue a job (to run no sooner than delay seconds from now); returns immediately"""
+        job = ScheduledJob(job_id, func, args, host_of(url), priority, delay)
+
+        with self._cond:
+            if delay > 0:
+                heapq.heappush(self._delayed, (job.not_before, next(self._sequence), job))
+            else:
+                heapq.heappush(self._ready.setdefault(job.host, []), (-priority, next(self._sequence), job))
+            self._ensure_workers()
+            self._cond.notify_all()
+
+        return job
+
+    def _ensure_workers(self):
+        """Start worker threads on first use (caller holds the lock)"""
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"junay-worker-{len(self._workers) + 1}",
+                daemon=True
+            )
+            self._workers.append(worker)
+            worker.start()
+
+    def _take_next(self):
+        """Pop the best queued job that is due and whose host has a free slot (caller holds the lock)"""
+        # Delayed jobs whose time has come join their host's queue
+        now = time.time()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, sequence, job = heapq.heappop(self._delayed)
+            heapq.heappush(self._ready.setdefault(job.host, []), (-job.priority, sequence, job))
+
+        # The best head among hosts with a free slot: one look per host, not per job
+        best = None
+        for host, heap in self._ready.items():
+            if self._host_counts.get(host, 0) < self.max_per_host and (best is None or heap[0] < best[0]):
+                best = (heap[0], host)
+        if best is None:
+            return None
+
+        heap = self._ready[best[1]]
+        job = heapq.heappop(heap)[2]
+        if not heap:
+            del self._ready[best[1]]
+        return job
+
+    def _next_due(self):
+        """Seconds until the next delayed job becomes due, None if none is waiting (caller holds the lock)"""
+        return max(self._delayed[0][0] - time.time(), 0) if self._delayed else None
+
+    def _queued(self):
+        """Every queued job as (-priority, sequence, job), due or not (caller holds the lock)"""
+        entries = [entry for heap in self._ready.values() for entry in heap]
+        entries.extend((-job.priority, sequence, job) for _, sequence, job in self._delayed)
+        return entries
+
+    def _worker_loop(self):
+        """Worker thread: take jobs off the queue forever"""
+        while True:
+            with self._cond:
+                job = self._take_next()
+                while job is None:
+                    self._cond.wait(self._next_due())
+                    job = self._take_next()
+
+                job.started_at = time.time()
+                self._running.add(job)
+                self._host_counts[job.host] = self._host_counts.get(job.host, 0) + 1
+
+            try:
+                job.func(*job.args)
+            except Exception:
+                # Jobs report their own errors; never let one kill the worker
+                pass
+            finally:
+                with self._cond:
+                    self._running.discard(job)
+                    self._host_counts[job.host] -= 1
+                    if not self._host_counts[job.host]:
+                        del self._host_counts[job.host]
+
+                    run_time = time.time() - job.started_at
+                    if self._avg_run_time is None:
+                        self._avg_run_time = run_time
+                    else:
+                        self._avg_run_time = 0.8 * self._avg_run_time + 0.2 * run_time
+
+                    # A host slot just freed up - wake workers waiting on it
+                    self._cond.notify_all()
+
+    def queue_info(self, job_id):
+        """Queue position, time spent waiting and estimated remaining wait for a job"""
+        with self._cond:
+            entries = self._queued()
+            avg_run_time = self._avg_run_time
+        # One pass, no sorting: the position is one more than the entries ahead of it
+        for entry in entries:
+            if entry[2].job_id == job_id:
+                position = 1 + sum(1 for other in entries if other[:2] < entry[:2])
+                return self._wait_info(entry[2], position, avg_run_time, time.time())
+        return None
+
+    def queue_positions(self):
+        """queue_info() for every queued job at once (job_id -> info), sorting the queue once"""
+        with self._cond:
+            entries = self._queued()
+            avg_run_time = self._avg_run_time
+        now = time.time()
+        return {
+            job.job_id: self._wait_info(job, position, avg_run_time, now)
+            for position, (_, _, job) in enumerate(sorted(entries), start=1)
+        }
+
+    def _wait_info(self, job, position, avg_run_time, now):
+        estimated_wait = None
+        if avg_run_time is not None:
+            # Every max_workers jobs ahead of us is roughly one job duration
+            rounds = (position - 1) // self.max_workers + 1
+            estimated_wait = rounds * avg_run_time
+        if job.not_before > now:
+            # Backing off: it won't start before its delay is up
+            estimated_wait = max(estimated_wait or 0, job.not_before - now)
+        return {
+            'queue_position': position,
+            'waited': now - job.submitted_at,
+            'estimated_wait': estimated_wait,
+        }
+
+    def stats(self):
+        """Snapshot of the pool for status endpoints"""
+        with self._cond:
+            return {
+                'queued': sum(len(heap) for heap in self._ready.values()) + len(self._delayed),
+                'delayed': len(self._delayed),  # Backing off
+                'running': len(self._running),
+                'max_workers': self.max_workers,
+                'max_per_host': self.max_per_host,
+                'running_per_host': dict(self._host_counts),
+            }
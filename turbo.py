@@ -0,0 +1,115 @@
+"""
+Junay Turbo Mode
+Multi-connection downloading: DASH/HLS fragments fetched concurrently,
+and the video and audio streams of a merged format fetched side by side
+"""
+
+import os
+import threading
+
+import yt_dlp
+from yt_dlp.utils import DownloadCancelled
+
+# Fragments fetched at once per stream (override with JUNAY_TURBO_FRAGMENTS)
+TURBO_FRAGMENTS = int(os.environ.get('JUNAY_TURBO_FRAGMENTS', 8))
+
+# Range size for progressive files; benchmarks/bench_turbo.py sweeps this
+TURBO_CHUNK_MB = int(os.environ.get('JUNAY_TURBO_CHUNK_MB', 5))
+
+
+def turbo_options(fragments=None):
+    """yt-dlp options to layer over the normal ones when turbo mode is on"""
+    return {
+        'concurrent_fragment_downloads': fragments or TURBO_FRAGMENTS,
+        # Every connection starts at 1KB reads and only then grows its buffer;
+        # with many short-lived fragment connections, start big instead
+        'buffersize': 256 * 1024,
+        # Smaller ranges spend less of each request past the host's throttling
+        # threshold, and a stalled range is retried without redoing much
+        'http_chunk_size': TURBO_CHUNK_MB * 1024 * 1024,
+    }
+
+
+class TurboYoutubeDL(yt_dlp.YoutubeDL):
+    """
+    YoutubeDL that downloads all streams of a merged format (video + audio) in parallel
+    yt-dlp fetches them one after the other; when it asks for the first stream we
+    start the others in background threads, and hand back their results when it
+    gets round to asking for them
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._turbo_cancel = None
+        # Every download reports progress often; that is where streams learn to stop
+        self.add_progress_hook(self._check_cancelled)
+
+    def process_info(self, info_dict):
+        self._turbo_info = info_dict
+        self._turbo_streams = None
+        self._turbo_cancel = threading.Event()
+        try:
+            return super().process_info(info_dict)
+        finally:
+            # Never leave a stream downloading behind an aborted job: a failed one stops
+            # the others instead of waiting for them (finished streams are already joined)
+            self._turbo_cancel.set()
+            for thread, _ in (self._turbo_streams or {}).values():
+                thread.join()
+            self._turbo_info = self._turbo_streams = self._turbo_cancel = None
+
+    def _check_cancelled(self, d):
+        if self._turbo_cancel is not None and self._turbo_cancel.is_set():
+            raise DownloadCancelled('Another stream of this download failed')
+
+    def dl(self, name, info, subtitle=False, test=False):
+        parent = getattr(self, '_turbo_info', None)
+        formats = (parent or {}).get('requested_formats') or []
+        if subtitle or test or len(formats) < 2 or name == '-':
+            return super().dl(name, info, subtitle=subtitle, test=test)
+
+        if self._turbo_streams is None:
+            self._turbo_streams = self._start_streams(name, info, parent, formats)
+
+        stream = self._turbo_streams.get(name)
+        if stream is None:
+            return super().dl(name, info, subtitle=subtitle, test=test)
+
+        thread, result = stream
+        thread.join()
+        if 'error' in result:
+            raise result['error']
+        return result['value']
+
+    def _start_streams(self, name, info, parent, formats):
+        """Start every stream except the one being asked for; returns name -> (thread, result)"""
+        # yt-dlp names each stream <base>.f<format_id>.<ext>
+        suffix = f".f{info['format_id']}.{info['ext']}"
+        if not name.endswith(suffix):
+            return {}
+        base = name[:-len(suffix)]
+
+        streams = {}
+        for f in formats:
+            if f['format_id'] == info['format_id']:
+                continue
+
+            stream_info = dict(parent)
+            del stream_info['requested_formats']
+            stream_info.update(f)
+            stream_name = f"{base}.f{f['format_id']}.{f['ext']}"
+
+            result = {}
+            thread = threading.Thread(
+                target=self._download_stream, args=(stream_name, stream_info, result),
+                name="junay-turbo-stream", daemon=True
+            )
+            thread.start()
+            streams[stream_name] = (thread, result)
+
+        return streams
+
+    def _download_stream(self, name, info, result):
+        try:
+            result['value'] = super().dl(name, info)
+        except BaseException as e:
+            result['error'] = e
@@ -0,0 +1,301 @@
+"""
+Junay Worker Processes
+Optional process backend for the download stage: yt-dlp's extraction and download
+loops run in a pool of worker processes, so busy jobs stop competing for the web
+process's GIL. Progress hooks, phase timings and the extraction cache stay in the
+web process; each job talks to it over its worker's pipe
+"""
+
+import multiprocessing
+import queue
+import signal
+import threading
+from contextlib import contextmanager
+
+import hosts
+from engine import downloader_for, unwrap_error
+from info_cache import cached_download, extract_cached
+from postprocess import deferring
+from registry import process_memory
+from retry import classify
+from ydl_pool import YoutubeDLPool
+
+# Progress report fields the web process's hooks read (aggregator, journal, bandwidth, metrics, /api/files)
+PROGRESS_FIELDS = (
+    'status', 'filename', 'tmpfilename', 'downloaded_bytes', 'total_bytes', 'total_bytes_estimate',
+    'speed', 'eta', 'elapsed', 'fragment_index', 'fragment_count'
+)
+PROGRESS_INFO_FIELDS = ('protocol', '_filename', 'format_id')
+
+# Messages a worker waits on a reply for: progress is acknowledged once every hook has
+# run, so a hook that sleeps (bandwidth limits) holds the download back as it does in-process
+REQUESTS = ('progress', 'cache_get')
+
+# How long a job waits on a silent worker before checking the process is still alive
+LIVENESS_SECONDS = 5
+
+
+class WorkerError(Exception):
+    """A job failed in a worker process; error_class names the original exception, retry_class how it failed"""
+    def __init__(self, message, error_class='WorkerError', retry_class=None):
+        super().__init__(message)
+        self.error_class = error_class
+        self.retry_class = retry_class  # Classified where the exception still was (see retry.classify)
+
+
+class WorkerProcess:
+    """One worker process, its pipe, and the jobs it's running"""
+    def __init__(self, context, number):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=worker_main, args=(child_conn,), name=f'junay-worker-{number}', daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+        self.jobs = {}  # job_id -> queue.Queue of messages for the thread waiting on that job
+        self._send_lock = threading.Lock()
+        threading.Thread(target=self._read, name=f'junay-worker-{number}-reader', daemon=True).start()
+
+    def send(self, *message):
+        with self._send_lock:
+            self.conn.send(message)
+
+    def _read(self):
+        """Hand each message to the job it belongs to; wake every job if the process dies"""
+        while True:
+            try:
+                job_id, *message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            messages = self.jobs.get(job_id)
+            if messages is not None:
+                messages.put(message)
+
+        for messages in list(self.jobs.values()):
+            messages.put(('died',))
+
+    def alive(self):
+        return self.process.is_alive()
+
+
+class ProcessWorkerPool:
+    """
+    Runs jobs' yt-dlp work in worker processes, several jobs to a process
+    The calling thread (a scheduler worker) stays with its job: it runs the progress
+    hooks, records phases and answers cache lookups until the worker is done
+    """
+    def __init__(self, processes):
+        self.processes = processes
+        self._context = multiprocessing.get_context('spawn')  # Forking a threaded server isn't safe
+        self._lock = threading.Lock()
+        self._workers = []
+        self._started = 0
+
+        # Counters for the status endpoint
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0  # Worker processes replaced after dying
+
+    def _spawn(self):
+        """Start a worker process (caller holds the lock)"""
+        self._started += 1
+        worker = WorkerProcess(self._context, self._started)
+        self.share_host_ceilings([worker])
+        return worker
+
+    def share_host_ceilings(self, workers=None):
+        """
+        Send worker processes (all by default) their share of this process's host ceilings
+        (hosts.limiter); call again after changing them. Each process adapts its own limits below its share
+        """
+        shares = [
+            (host, max(1, max_connections // self.processes), max_rate / self.processes)
+            for host, max_connections, max_rate in hosts.limiter.ceilings()
+        ]
+        for worker in workers or list(self._workers):
+            try:
+                worker.send(None, 'host_ceilings', shares)
+            except OSError:
+                pass  # Died; its replacement gets them when it starts
+
+    def _pick(self):
+        """The least busy worker, starting (or replacing) processes as needed"""
+        with self._lock:
+            for index, worker in enumerate(self._workers):
+                if not worker.alive():
+                    self.restarts += 1
+                    self._workers[index] = self._spawn()
+            while len(self._workers) < self.processes:
+                self._workers.append(self._spawn())
+            return min(self._workers, key=lambda worker: len(worker.jobs))
+
+    def download(self, job_id, url, opts, turbo, hooks, profile, cache, on_extracted=None):
+        """
+        Download url in a worker process with yt-dlp options opts
+        hooks get every progress report, phases are timed on profile and extraction
+        goes through cache as in-process jobs do; returns the final info dict
+        """
+        worker = self._pick()
+        messages = queue.Queue()
+        worker.jobs[job_id] = messages
+        job = {'url': url, 'opts': {key: value for key, value in opts.items() if key != 'progress_hooks'}, 'turbo': turbo}
+
+        try:
+            worker.send(job_id, 'start', job)
+            while True:
+                try:
+                    kind, *args = messages.get(timeout=LIVENESS_SECONDS)
+                except queue.Empty:
+                    if worker.alive():
+                        continue  # A long extraction, or a stalled server
+                    kind, args = 'died', []
+                if kind == 'done':
+                    self.completed += 1
+                    return args[0]
+                if kind == 'failed':
+                    self.failed += 1
+                    raise WorkerError(*args)
+                if kind == 'died':
+                    self.failed += 1
+                    raise WorkerError('Worker process exited during the download')
+
+                reply = None
+                if kind == 'progress':
+                    for hook in hooks:
+                        hook(args[0])
+                elif kind == 'phase_start':
+                    profile.start(args[0])
+                elif kind == 'phase_end':
+                    profile.end(args[0])
+                elif kind == 'extracted' and on_extracted is not None:
+                    on_extracted(*args)
+                elif kind == 'cache_get':
+                    reply = cache.get(args[0])
+                elif kind == 'cache_put':
+                    cache.put(*args)
+                elif kind == 'cache_invalidate':
+                    cache.invalidate(args[0])
+
+                if kind in REQUESTS:
+                    worker.send(job_id, 'reply', reply)
+        finally:
+            del worker.jobs[job_id]
+
+    def stats(self):
+        """Worker processes and the jobs on each"""
+        with self._lock:
+            workers = [
+                {
+                    'pid': worker.process.pid,
+                    'alive': worker.alive(),
+                    'jobs': len(worker.jobs),
+                    'memory': process_memory(worker.process.pid),  # Resident bytes (None where unavailable)
+                }
+                for worker in self._workers
+            ]
+        return {
+            'processes': self.processes,
+            'workers': workers,
+            'running': sum(worker['jobs'] for worker in workers),
+            'memory': sum(worker['memory'] or 0 for worker in workers),
+            'completed': self.completed,
+            'failed': self.failed,
+            'restarts': self.restarts,
+        }
+
+
+# Worker process side
+
+class JobChannel:
+    """A worker process's end of one job: reports, phases and cache lookups go to the web process"""
+    def __init__(self, job_id, conn, send_lock):
+        self.job_id = job_id
+        self.conn = conn
+        self.send_lock = send_lock
+        self.replies = queue.Queue()
+
+    def send(self, kind, *args):
+        with self.send_lock:
+            self.conn.send((self.job_id, kind) + args)
+
+    def request(self, kind, *args):
+        self.send(kind, *args)
+        return self.replies.get()
+
+    def hook(self, d):
+        report = {key: d[key] for key in PROGRESS_FIELDS if key in d}
+        info = d.get('info_dict') or {}
+        report['info_dict'] = {key: info[key] for key in PROGRESS_INFO_FIELDS if key in info}
+        self.request('progress', report)
+
+    @contextmanager
+    def phase(self, name):
+        self.send('phase_start', name)
+        try:
+            yield
+        finally:
+            self.send('phase_end', name)
+
+    # The web process's extraction cache
+
+    def get(self, key):
+        return self.request('cache_get', key)
+
+    def put(self, key, info):
+        self.send('cache_put', key, info)
+
+    def invalidate(self, key):
+        self.send('cache_invalidate', key)
+
+    def extract(self, ydl, url):
+        return extract_cached(self, ydl, url)
+
+
+def worker_main(conn):
+    """
+    Worker process: run each job the web process sends on a thread of its own
+    Each process adapts its own per-host limits, within the share of the ceilings it is sent
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is for the web process; it stops us
+    send_lock = threading.Lock()
+    ydl_pool = YoutubeDLPool()  # Warm instances for this process's jobs
+    channels = {}  # job_id -> JobChannel
+
+    while True:
+        try:
+            job_id, kind, payload = conn.recv()
+        except (EOFError, OSError):
+            return  # The web process went away
+
+        if kind == 'start':
+            channel = channels[job_id] = JobChannel(job_id, conn, send_lock)
+            threading.Thread(
+                target=_run_job, args=(channel, payload, ydl_pool, channels), name=f'junay-job-{job_id}', daemon=True
+            ).start()
+        elif kind == 'reply' and job_id in channels:
+            channels[job_id].replies.put(payload)
+        elif kind == 'host_ceilings':
+            for host, max_connections, max_rate in payload:
+                hosts.limiter.set_ceilings(host, max_connections, max_rate)
+
+
+def _run_job(channel, job, ydl_pool, channels):
+    downloader = deferring(downloader_for(job['turbo']))
+    opts = dict(job['opts'], progress_hooks=[channel.hook])
+
+    def on_extracted(seconds, cached):
+        channel.send('extracted', seconds, cached)
+
+    try:
+        with ydl_pool.borrow(opts, downloader) as ydl:
+            info = cached_download(ydl, job['url'], channel, channel, on_extracted)
+        # Deferred merges carry their postprocessors; they get the web process's YoutubeDL there
+        for download in info.get('requested_downloads') or [info]:
+            for pp in download.get('__postprocessors') or []:
+                pp.set_downloader(None)
+        channel.send('done', info)
+    except Exception as e:
+        channel.send('failed', str(e), type(unwrap_error(e)).__name__, classify(e))
+    finally:
+        channels.pop(channel.job_id, None)
@@ -0,0 +1,121 @@
+"""
+Junay YoutubeDL Pool
+Keeps warm yt_dlp.YoutubeDL instances around between jobs, so each download
+reuses loaded extractors, the cookie jar and open HTTP connections
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Options that change with every job; everything else defines the profile
+PER_JOB_OPTIONS = ('outtmpl', 'progress_hooks')
+
+
+def profile_key(downloader, opts):
+    """Hashable key for instances that can be shared: same class, same options"""
+    shared = sorted((key, repr(value)) for key, value in opts.items() if key not in PER_JOB_OPTIONS)
+    return downloader.__name__, tuple(shared)
+
+
+class PooledInstance:
+    """A YoutubeDL plus the hook list of whichever job is borrowing it"""
+    __slots__ = ('ydl', 'hooks')
+
+    def __init__(self, downloader, opts):
+        self.hooks = []
+        # One permanent hook that forwards to the current borrower's hooks
+        opts = dict(opts, progress_hooks=[self._dispatch])
+        self.ydl = downloader(opts)
+
+    def _dispatch(self, d):
+        for hook in self.hooks:
+            hook(d)
+
+    def prepare(self, opts):
+        """Point the instance at a new job's output template and progress hooks"""
+        self.hooks = list(opts.get('progress_hooks') or [])
+        outtmpl = opts.get('outtmpl')
+        if isinstance(outtmpl, dict):
+            outtmpl = outtmpl.get('default')  # Already normalized by an earlier YoutubeDL
+        if outtmpl:
+            self.ydl.params['outtmpl']['default'] = outtmpl
+
+
+class YoutubeDLPool:
+    """
+    Borrow/return pool of YoutubeDL instances keyed by option profile
+    Instances that saw an error are closed rather than returned, in case they are left in a bad state
+    """
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle  # Idle instances kept per profile
+
+        self._lock = threading.Lock()
+        self._idle = {}  # profile key -> [PooledInstance]
+
+        # Setup time instrumentation: fresh instances vs reused ones
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self._create_seconds = 0.0
+        self._reuse_seconds = 0.0
+
+    @contextmanager
+    def borrow(self, opts, downloader=None):
+        """Context manager yielding a YoutubeDL (or downloader, a subclass) configured with opts"""
+        if downloader is None:
+            import yt_dlp
+            downloader = yt_dlp.YoutubeDL
+        started = time.perf_counter()
+        key = profile_key(downloader, opts)
+
+        with self._lock:
+            idle = self._idle.get(key)
+            instance = idle.pop() if idle else None
+
+        reused = instance is not None
+        if instance is None:
+            instance = PooledInstance(downloader, opts)
+        instance.prepare(opts)
+
+        setup = time.perf_counter() - started
+        with self._lock:
+            if reused:
+                self.reused += 1
+                self._reuse_seconds += setup
+            else:
+                self.created += 1
+                self._create_seconds += setup
+
+        ok = False
+        try:
+            yield instance.ydl
+            ok = True
+        finally:
+            instance.hooks = []
+            self._give_back(key, instance, ok)
+
+    def _give_back(self, key, instance, ok):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if ok and len(idle) < self.max_idle:
+                idle.append(instance)
+                return
+            self.discarded += 1
+
+        instance.ydl.close()
+
+    def stats(self):
+        """Counts and average setup time per job, for the status endpoint"""
+        with self._lock:
+            return {
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded,
+                'idle': sum(len(idle) for idle in self._idle.values()),
+                'profiles': len(self._idle),
+                # Seconds spent getting a YoutubeDL ready: new instance vs borrowed one
+                'avg_create_seconds': self._create_seconds / self.created if self.created else None,
+                'avg_reuse_seconds': self._reuse_seconds / self.reused if self.reused else None,
+            }